@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# ast_serialization.py
+#
+# Compares loading Setlan ASTs from their binary serialization
+# (lang/ast_format.py) with parsing their programs again, with
+# both parser backends, and the size of the serialized trees
+# with the one of their pickles. With --check, it verifies
+# first that every program under test/ is loaded back as the
+# same tree it was saved from, with the types resolved by its
+# static checks, and that its records are read node by node. With --no-gc, the parsers and the loader run
+# with the cyclic garbage collector disabled, as tools loading
+# large trees may do: they create lots of objects and almost no
+# garbage.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/ast_serialization.py [--shapes flat,nested,set,chain]
+#           [--sizes 0.25,1] [--check] [--no-gc]
+#
+# where sizes are given in megabytes.
+# ------------------------------------------------------------
+import gc
+import os
+import sys
+import glob
+import time
+import types
+import cPickle
+import argparse
+
+from array import array
+from cStringIO import StringIO
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+# Registers how the bound methods of the nodes are pickled.
+from lang import program_cache
+from lang.ast_format import SetlanAstSerializer
+from lang.exceptions import SetlanException, SetlanStaticErrors
+from lang.scanner import SetlanScanner
+
+from frontend import SHAPES, build_parser, count_nodes
+
+
+def same_tree(a, b):
+    """
+    Whether a and b are equal trees: nodes of the same classes, with equal
+    attributes.
+    """
+    if a.__class__ is not b.__class__:
+        return False
+    if isinstance(a, list):
+        return len(a) == len(b) and all(map(same_tree, a, b))
+    if isinstance(a, types.MethodType):
+        return a.im_func is b.im_func
+    if isinstance(a, array):
+        return a.tolist() == b.tolist()
+    if hasattr(a, '__dict__'):
+        if sorted(a.__dict__) != sorted(b.__dict__):
+            return False
+        return all([same_tree(value, b.__dict__[name])
+                    for name, value in a.__dict__.iteritems()])
+    return a == b
+
+
+def count_records(ast):
+    """
+    Number of records of ast: one per node, but for the line breaks added by
+    the constructor of println instructions, which are not serialized.
+    """
+    from lang.ast import Setlan, Output
+    count = 0
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, Output) and node._lnsufix is not None:
+            count -= 1
+        for value in node.__dict__.itervalues():
+            if isinstance(value, Setlan):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend([item for item in value
+                              if isinstance(item, Setlan)])
+    return count
+
+
+def check(serializer, parser):
+    mismatches = 0
+    for path in sorted(glob.glob(os.path.join(ROOT, 'test', '*', '*.stl'))):
+        try:
+            ast = parser.parse(lexer=SetlanScanner(inputString=open(path).read()))
+            ast.staticChecks(SetlanStaticErrors())
+        except SetlanException:
+            continue
+        stream = StringIO()
+        serializer.save(ast, stream)
+        data = stream.getvalue()
+        loaded = serializer.load(StringIO(data))
+        records = list(serializer.records(StringIO(data)))
+        if not same_tree(ast, loaded) or len(records) != count_records(ast):
+            print "MISMATCH: %s" % os.path.relpath(path, ROOT)
+            mismatches += 1
+    return mismatches
+
+
+def timed(function, *args):
+    start = time.time()
+    result = function(*args)
+    return result, time.time() - start
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="ast_serialization")
+    args_parser.add_argument('--shapes', default='flat,nested,set,chain',
+        help="comma separated source shapes: %s" % ", ".join(sorted(SHAPES)))
+    args_parser.add_argument('--sizes', default='0.25,1',
+        help="comma separated source sizes, in megabytes")
+    args_parser.add_argument('--depth', type=int, default=20,
+        help="nesting depth of the nested shape")
+    args_parser.add_argument('--chain', type=int, default=50,
+        help="operators per expression of the chain shape")
+    args_parser.add_argument('--check', action='store_true',
+        help="check that the test programs are loaded as they were saved")
+    args_parser.add_argument('--no-gc', action='store_true',
+        help="disable the cyclic garbage collector")
+    ns = args_parser.parse_args()
+    if ns.no_gc:
+        gc.disable()
+
+    serializer = SetlanAstSerializer()
+    parsers = [(name, build_parser(name)) for name in ('ply', 'pratt')]
+    if ns.check:
+        mismatches = check(serializer, parsers[1][1])
+        print "Trees checked: %d mismatches." % mismatches
+        if mismatches:
+            sys.exit(1)
+
+    print "%-7s %9s %9s %10s %10s %9s %9s %9s %10s" % (
+        "shape", "size (MB)", "nodes", "ply (s)", "pratt (s)", "save (s)",
+        "load (s)", "KB", "pickle KB")
+    for shape in ns.shapes.split(','):
+        for size in [float(s) for s in ns.sizes.split(',')]:
+            source = SHAPES[shape](int(size * 1024 * 1024), ns)
+            parse_times = []
+            for name, parser in parsers:
+                lexer = SetlanScanner(inputString=source)
+                ast, elapsed = timed(lambda: parser.parse(lexer=lexer))
+                parse_times.append(elapsed)
+            stream = StringIO()
+            ignored, save_time = timed(serializer.save, ast, stream)
+            data = stream.getvalue()
+            loaded, load_time = timed(serializer.load, StringIO(data))
+            pickled = cPickle.dumps(ast, cPickle.HIGHEST_PROTOCOL)
+            print "%-7s %9.2f %9d %10.3f %10.3f %9.3f %9.3f %9.0f %10.0f" % (
+                shape, size, count_nodes(ast), parse_times[0], parse_times[1],
+                save_time, load_time, len(data) / 1024.0,
+                len(pickled) / 1024.0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# deep_programs.py
+#
+# Time per node of the static checks, the execution and the
+# dump of programs made of long chains of operators and of
+# deeply nested blocks, as their depth grows. The tree is
+# traversed with explicit stacks (lang/traversal.py), so any
+# depth works. The check and execution times per node of the
+# chains should not grow with it; the ones of nested blocks
+# do, as there are more scopes to look variables up in, and
+# so do the dumps, as their indentation grows. With --check,
+# it verifies first that programs far deeper than the
+# recursion limit are parsed (by both parser backends),
+# checked, run and dumped.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/deep_programs.py [--depths 100,400,800]
+#           [--iterations 200] [--check]
+# ------------------------------------------------------------
+import os
+import sys
+import time
+import argparse
+
+from cStringIO import StringIO
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from lang.exceptions import SetlanStaticErrors
+from lang.lexer import SetlanLexer
+from lang import lexical_specs, syntax_specs
+from lang.parser_cache import SetlanParserCache
+from lang.pratt_parser import SetlanPrattParser
+
+from frontend import count_nodes
+
+
+def chain(depth, iterations):
+    """
+    A loop that evaluates a chain of depth sums, iterations times.
+    """
+    terms = " + ".join(["x"] * depth)
+    return ("program { using int i, x, y; in\n"
+            "x = 1; i = 0;\n"
+            "while (i < %d) do { y = %s; i = i + 1; };\n"
+            "}\n" % (iterations, terms))
+
+
+def nested(depth, iterations):
+    """
+    A loop whose body is made of depth nested blocks and conditionals.
+    """
+    opening = "{ using int a; in a = i; if (a >= 0) "
+    body = opening * depth + "a = a + 1" + ";}" * depth
+    return ("program { using int i; in\n"
+            "i = 0;\n"
+            "while (i < %d) do { %s; i = i + 1; };\n"
+            "}\n" % (iterations, body))
+
+
+def parens(depth, iterations):
+    """
+    A loop that evaluates depth nested parenthesized sums.
+    """
+    terms = "(x + " * depth + "x" + ")" * depth
+    return ("program { using int i, x, y; in\n"
+            "x = 1; i = 0;\n"
+            "while (i < %d) do { y = %s; i = i + 1; };\n"
+            "}\n" % (iterations, terms))
+
+
+def prefix(depth, iterations):
+    """
+    A loop that evaluates a chain of depth prefix operators.
+    """
+    operators = "- " * (depth - depth % 2)
+    return ("program { using int i, x, y; in\n"
+            "x = 1; i = 0;\n"
+            "while (i < %d) do { y = %sx; i = i + 1; };\n"
+            "}\n" % (iterations, operators))
+
+
+SHAPES = {
+    'chain'  : chain,
+    'nested' : nested,
+    'parens' : parens,
+    'prefix' : prefix
+    }
+
+
+def parse(parser, source):
+    lexer = SetlanLexer(module=lexical_specs, inputString=source)
+    return parser.parse(lexer=lexer)
+
+
+def phases(ast):
+    """
+    Times of the static checks, the execution and the dump of ast.
+    """
+    diagnostics = SetlanStaticErrors()
+    start = time.time()
+    ast.staticChecks(diagnostics)
+    check = time.time() - start
+    if diagnostics.has_errors():
+        raise diagnostics
+    start = time.time()
+    ast.execute()
+    execute = time.time() - start
+    start = time.time()
+    ast.dump(StringIO())
+    dump = time.time() - start
+    return check, execute, dump
+
+
+def check(parsers):
+    failures = 0
+    limit = sys.getrecursionlimit()
+    for name, parser in parsers:
+        for shape in sorted(SHAPES):
+            depth = limit * 5
+            try:
+                phases(parse(parser, SHAPES[shape](depth, 1)))
+                print "%s of depth %d, %s parser: ok." % (shape, depth, name)
+            except RuntimeError as e:
+                print "%s of depth %d, %s parser: %s" % (shape, depth, name, e)
+                failures += 1
+    return failures
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="deep_programs")
+    args_parser.add_argument('--depths', default='100,400,800',
+        help="comma separated depths of the chains and nestings")
+    args_parser.add_argument('--iterations', type=int, default=200,
+        help="times the loop of each program runs")
+    args_parser.add_argument('--check', action='store_true',
+        help="check that programs deeper than the recursion limit work")
+    ns = args_parser.parse_args()
+
+    parser = SetlanParserCache(syntax_specs).getParser()
+    if ns.check:
+        if check([('ply', parser), ('pratt', SetlanPrattParser())]):
+            sys.exit(1)
+
+    print "%-7s %6s %8s %12s %12s %12s" % (
+        "shape", "depth", "nodes", "check us/n", "exec us/n", "dump us/n")
+    for shape in sorted(SHAPES):
+        for depth in [int(d) for d in ns.depths.split(',')]:
+            ast = parse(parser, SHAPES[shape](depth, ns.iterations))
+            nodes = count_nodes(ast)
+            check_time, execute_time, dump_time = phases(ast)
+            print "%-7s %6d %8d %12.2f %12.2f %12.2f" % (
+                shape, depth, nodes, check_time * 1e6 / nodes,
+                execute_time * 1e6 / (nodes * ns.iterations),
+                dump_time * 1e6 / nodes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# execution.py
+#
+# Execution time of loop heavy Setlan programs (integer
+# arithmetic, set literals and operations, nested blocks and
+# conditionals), as they are parsed and checked, and once
+# optimized. Only the execution is timed, with the output of the
+# programs discarded. Results are written as JSON, and can be
+# compared with the results of a previous run with --compare.
+# --root benchmarks the interpreter of another checkout, so the
+# execution of two commits can be compared:
+#
+#     $ git worktree add /tmp/before <commit>
+#     $ python bench/execution.py --root /tmp/before --output before.json
+#     $ python bench/execution.py --compare before.json
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/execution.py [--shapes arithmetic,sets,blocks]
+#           [--iterations 100] [--repeat 3] [--root DIR]
+#           [--output execution.json] [--compare old.json]
+# ------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+from cStringIO import StringIO
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MODES = ('original', 'optimized')
+
+################################################################################
+############################### Program shapes #################################
+################################################################################
+
+
+def arithmetic(iterations):
+    """
+    Nested while loops updating integers, with a conditional testing the
+    membership of one of them in a small set built from it.
+    """
+    return ("program { using int i, j, k, total; in\n"
+            "total = 0; i = 0;\n"
+            "while (i < %d) do {\n"
+            "  j = 0;\n"
+            "  while (j < 500) do {\n"
+            "    k = (i * 3 + j) %% 7 - 2;\n"
+            "    total = total + k * 2;\n"
+            "    if (k @ ({1, 2, 3, k} >< {2, 3, 4})) total = total + 1;\n"
+            "    j = j + 1;\n"
+            "  };\n"
+            "  i = i + 1;\n"
+            "};\n"
+            "println total;\n"
+            "}\n" % iterations)
+
+
+def sets(iterations):
+    """
+    Nested while loops testing the membership of an integer in sets built from
+    the counters, with unions, differences and operations of an integer with a
+    set.
+    """
+    return ("program { using int i, j, c; in\n"
+            "c = 0; i = 0;\n"
+            "while (i < %d) do {\n"
+            "  j = 0;\n"
+            "  while (j < 50) do {\n"
+            "    if (j @ (({i, j + 1, i * 2} ++ (i <+> {0, 1, 2, 3})) \\ {1, 3}))\n"
+            "      c = c + j\n"
+            "    else c = c - 1;\n"
+            "    j = j + 1;\n"
+            "  };\n"
+            "  i = i + 1;\n"
+            "};\n"
+            "println c;\n"
+            "}\n" % (iterations * 10))
+
+
+def blocks(iterations):
+    """
+    A repeat-while loop whose body is made of nested blocks with their own
+    declarations and conditionals.
+    """
+    return ("program { using int i, c; in\n"
+            "c = 0; i = 0;\n"
+            "repeat {\n"
+            "  using int a; in\n"
+            "  a = i %% 5;\n"
+            "  if (a > 1) {\n"
+            "    using int b; in\n"
+            "    b = a * 2;\n"
+            "    if (b > 5 or a == 4) c = c + b else { c = c + 1; };\n"
+            "  } else c = c - a;\n"
+            "  i = i + 1;\n"
+            "} while (i < %d);\n"
+            "println c;\n"
+            "}\n" % (iterations * 1000))
+
+
+SHAPES = {
+    'arithmetic' : arithmetic,
+    'sets'       : sets,
+    'blocks'     : blocks
+    }
+
+################################################################################
+################################## Running #####################################
+################################################################################
+
+
+def load(root):
+    """
+    Imports the interpreter of the tree at root. Older trees, to compare
+    with, may have no optimizer, and their programs are only run as parsed.
+    """
+    sys.path.insert(0, root)
+    global SetlanStaticErrors, SetlanLexer, SetlanParserCache, SetlanOptimizer
+    global lexical_specs, syntax_specs
+    from lang.exceptions import SetlanStaticErrors
+    from lang.lexer import SetlanLexer
+    from lang import lexical_specs, syntax_specs
+    from lang.parser_cache import SetlanParserCache
+    try:
+        from lang.optimizer import SetlanOptimizer
+    except ImportError:
+        SetlanOptimizer = None
+
+
+def prepare(parser, source, mode):
+    lexer = SetlanLexer(module=lexical_specs, inputString=source)
+    ast = parser.parse(lexer=lexer)
+    diagnostics = SetlanStaticErrors()
+    ast.staticChecks(diagnostics)
+    if diagnostics.has_errors():
+        raise diagnostics
+    if mode == 'optimized':
+        SetlanOptimizer().optimize(ast)
+    return ast
+
+
+def execute(ast):
+    """
+    Executes ast, returning the time it took and its output.
+    """
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        start = time.time()
+        ast.execute()
+        elapsed = time.time() - start
+        return elapsed, sys.stdout.getvalue()
+    finally:
+        sys.stdout = stdout
+
+
+def run_case(parser, shape, mode, ns):
+    """
+    Best time of --repeat executions of the program of shape, in mode.
+    """
+    ast = prepare(parser, SHAPES[shape](ns.iterations), mode)
+    best = None
+    output = None
+    for n in xrange(ns.repeat):
+        elapsed, output = execute(ast)
+        if best is None or elapsed < best:
+            best = elapsed
+    return {
+        'shape'  : shape,
+        'mode'   : mode,
+        'time'   : best,
+        'output' : output
+        }
+
+################################################################################
+################################## Reports #####################################
+################################################################################
+
+
+def git_revision(root):
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=root,
+                stderr=devnull
+                ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case_key(result):
+    return (result['shape'], result['mode'])
+
+
+def print_result(result, baseline):
+    line = "%-12s %-10s %10.3f" % (result['shape'], result['mode'],
+                                   result['time'])
+    old = baseline.get(case_key(result))
+    if old is not None and result['time'] > 0:
+        line += " %10.3f %8.2fx" % (old['time'], old['time'] / result['time'])
+        if old['output'] != result['output']:
+            line += "  (different output)"
+    print line
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="execution")
+    args_parser.add_argument('--shapes', default='arithmetic,sets,blocks',
+        help="comma separated program shapes, among: %s" %
+             ", ".join(sorted(SHAPES)))
+    args_parser.add_argument('--iterations', type=int, default=100,
+        help="iterations of the outer loop of each program (times 10 for "
+             "sets, and 1000 for blocks)")
+    args_parser.add_argument('--repeat', type=int, default=3,
+        help="executions of each program, of which the best is reported")
+    args_parser.add_argument('--root', default=ROOT,
+        help="tree whose interpreter is benchmarked (this one by default)")
+    args_parser.add_argument('--output', default='execution.json',
+        help="file where the results are written as JSON")
+    args_parser.add_argument('--compare', metavar='FILE', default=None,
+        help="results of a previous run, to report the speedup of each case")
+    ns = args_parser.parse_args()
+
+    shapes = ns.shapes.split(',')
+    for shape in shapes:
+        if shape not in SHAPES:
+            args_parser.error("unknown shape: %s" % shape)
+    baseline = {}
+    if ns.compare is not None:
+        with open(ns.compare) as previous:
+            for result in json.load(previous)['results']:
+                baseline[case_key(result)] = result
+
+    root = os.path.abspath(ns.root)
+    load(root)
+    parser = SetlanParserCache(syntax_specs).getParser()
+    modes = MODES
+    if SetlanOptimizer is None:
+        modes = ('original',)
+
+    header = "%-12s %-10s %10s" % ("shape", "mode", "time (s)")
+    if baseline:
+        header += " %10s %9s" % ("before (s)", "speedup")
+    print header
+    results = []
+    for shape in shapes:
+        for mode in modes:
+            result = run_case(parser, shape, mode, ns)
+            print_result(result, baseline)
+            results.append(result)
+
+    report = {
+        'benchmark'  : 'execution',
+        'revision'   : git_revision(root),
+        'date'       : time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python'     : platform.python_version(),
+        'iterations' : ns.iterations,
+        'results'    : results
+        }
+    with open(ns.output, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+    print "Results written to %s" % ns.output
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# flattening.py
+#
+# Execution time of loops evaluating long chains of sums and
+# unions, optimized with and without flattening their chains
+# (the other passes of the optimizer run in both cases). The
+# operands depend on the counter of the loop, so the chains are
+# neither folded nor hoisted, and the sums keep their overflow
+# checks. With --check, it verifies first that the flattened
+# programs give the same output as the unflattened ones.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/flattening.py [--lengths 10,100,1000]
+#           [--iterations 200] [--check]
+# ------------------------------------------------------------
+import os
+import sys
+import time
+import argparse
+
+from cStringIO import StringIO
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from lang.exceptions import SetlanStaticErrors
+from lang.optimizer import SetlanOptimizer
+from lang.pratt_parser import SetlanPrattParser
+from lang.scanner import SetlanScanner
+
+
+class UnflattenedOptimizer(SetlanOptimizer):
+    """
+    The optimizer without its flattening pass.
+    """
+
+    def _flatten(self, expression):
+        pass
+
+
+def sums(length, iterations):
+    """
+    A loop adding a chain of length terms.
+    """
+    operands = ["i", "j", "(i % 7)"]
+    terms = " + ".join([operands[n % len(operands)] for n in range(length)])
+    return ("program { using int i, j, x; in\n"
+            "i = 0; x = 0;\n"
+            "while (i < %d) do {\n"
+            "  j = i * 2;\n"
+            "  x = (x + %s) %% 1000;\n"
+            "  i = i + 1;\n"
+            "};\n"
+            "println x;\n"
+            "}\n" % (iterations, terms))
+
+
+def unions(length, iterations):
+    """
+    A loop testing the membership of an integer in a chain of unions of
+    length small sets.
+    """
+    operands = ["{i, %d}", "{j, %d}", "{i %% 7, j + %d}"]
+    terms = " ++ ".join([operands[n % len(operands)] % n
+                         for n in range(length)])
+    return ("program { using int i, j, c; in\n"
+            "i = 0; c = 0;\n"
+            "while (i < %d) do {\n"
+            "  j = i * 2;\n"
+            "  if ((i %% 13) @ (%s)) c = c + 1;\n"
+            "  i = i + 1;\n"
+            "};\n"
+            "println c;\n"
+            "}\n" % (iterations, terms))
+
+
+SHAPES = {
+    'sums'   : sums,
+    'unions' : unions
+    }
+
+
+def run(parser, source, optimizer):
+    """
+    Output of source and its execution time, optimized by optimizer.
+    """
+    ast = parser.parse(lexer=SetlanScanner(inputString=source))
+    diagnostics = SetlanStaticErrors()
+    ast.staticChecks(diagnostics)
+    if diagnostics.has_errors():
+        raise diagnostics
+    optimizer.optimize(ast)
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        start = time.time()
+        ast.execute()
+        elapsed = time.time() - start
+        return sys.stdout.getvalue(), elapsed
+    finally:
+        sys.stdout = stdout
+
+
+def check(parser, lengths, iterations):
+    failures = 0
+    for shape in sorted(SHAPES):
+        for length in lengths:
+            source = SHAPES[shape](length, iterations)
+            unflattened = run(parser, source, UnflattenedOptimizer())[0]
+            if unflattened == run(parser, source, SetlanOptimizer())[0]:
+                print "%s of length %d: ok." % (shape, length)
+            else:
+                print "%s of length %d: outputs differ." % (shape, length)
+                failures += 1
+    return failures
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="flattening")
+    args_parser.add_argument('--lengths', default='10,100,1000',
+        help="comma separated numbers of operands of the chains")
+    args_parser.add_argument('--iterations', type=int, default=200,
+        help="times the loop of each program runs")
+    args_parser.add_argument('--check', action='store_true',
+        help="check that the flattened programs give the same output")
+    ns = args_parser.parse_args()
+
+    parser = SetlanPrattParser()
+    lengths = [int(s) for s in ns.lengths.split(',')]
+    if ns.check:
+        if check(parser, lengths, ns.iterations):
+            sys.exit(1)
+
+    print "%-8s %6s %15s %13s %8s" % (
+        "shape", "length", "unflattened (s)", "flattened (s)", "speedup")
+    for shape in sorted(SHAPES):
+        for length in lengths:
+            source = SHAPES[shape](length, ns.iterations)
+            unflattened = run(parser, source, UnflattenedOptimizer())[1]
+            flattened = run(parser, source, SetlanOptimizer())[1]
+            print "%-8s %6d %15.3f %13.3f %7.1fx" % (
+                shape, length, unflattened, flattened, unflattened / flattened)
+
+
+if __name__ == '__main__':
+    main()
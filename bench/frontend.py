@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# frontend.py
+#
+# Throughput of the Setlan front end (lexing, parsing and
+# static checks) on synthetic sources of configurable size and
+# shape. Each phase is timed separately, reporting tokens or
+# AST nodes per second and the peak memory of the process.
+# Every case runs in a child process, so peak memory is not
+# inherited from the previous ones. Results are written as
+# JSON, and can be compared with the results of a previous run
+# (of another commit, for instance) with --compare.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/frontend.py [--shapes flat,nested,set,chain]
+#           [--sizes 0.1,0.5] [--lexer ply] [--parser ply]
+#           [--output frontend.json] [--compare old.json]
+#
+# where sizes are given in megabytes.
+# ------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import platform
+import subprocess
+import multiprocessing
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from lang.config import SetlanConfig
+from lang.exceptions import SetlanStaticErrors
+
+from parser_backends import ListLexer
+
+PHASES = ('lex', 'parse', 'check')
+
+################################################################################
+############################### Source shapes ##################################
+################################################################################
+
+HEADER = "program { using int x, y; set s; in\n"
+
+
+def flat(size, ns):
+    """
+    A single block with a long list of short instructions.
+    """
+    statements = [
+        "x = x + 1;\n",
+        "s = s ++ {x, y};\n",
+        "if (x > y) println \"x\", x else y = y - 1;\n",
+        "for i min s do println i;\n"
+        ]
+    unit = "".join(statements)
+    return HEADER + unit * max(1, size // len(unit)) + "}\n"
+
+
+def nested(size, ns):
+    """
+    Blocks nested --depth levels deep, repeated to fill the source.
+    """
+    opening = "{ using int a; in a = x + 1;\n"
+    closing = "};\n"
+    unit = opening * ns.depth + closing * ns.depth
+    return HEADER + unit * max(1, size // len(unit)) + "}\n"
+
+
+def huge_set(size, ns):
+    """
+    A single set literal with as many elements as fit in the source.
+    """
+    count = max(1, size // 7)
+    elements = ", ".join([str(n) for n in xrange(count)])
+    return HEADER + "s = {%s};\n}\n" % elements
+
+
+def chain(size, ns):
+    """
+    Assignments of --chain long chains of binary operators.
+    """
+    operators = ['+', '-', '*', '+']
+    terms = ["x"]
+    for n in range(ns.chain):
+        terms.append("%s %d" % (operators[n % len(operators)], n % 7 + 1))
+    unit = "y = %s;\n" % " ".join(terms)
+    return HEADER + unit * max(1, size // len(unit)) + "}\n"
+
+
+SHAPES = {
+    'flat'   : flat,
+    'nested' : nested,
+    'set'    : huge_set,
+    'chain'  : chain
+    }
+
+################################################################################
+################################## Phases ######################################
+################################################################################
+
+
+def build_lexer(backend, source):
+    if backend == 'scanner':
+        from lang.scanner import SetlanScanner
+        return SetlanScanner(inputString=source)
+    from lang import lexical_specs
+    from lang.lexer import SetlanLexer
+    return SetlanLexer(module=lexical_specs, inputString=source)
+
+
+def build_parser(backend):
+    if backend == 'pratt':
+        from lang.pratt_parser import SetlanPrattParser
+        return SetlanPrattParser()
+    from lang import syntax_specs
+    from lang.parser_cache import SetlanParserCache
+    return SetlanParserCache(syntax_specs).getParser()
+
+
+def count_nodes(ast):
+    from lang.ast import Setlan
+    count = 0
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        count += 1
+        for value in node.__dict__.itervalues():
+            if isinstance(value, Setlan):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend([item for item in value
+                              if isinstance(item, Setlan)])
+    return count
+
+
+def peak_memory():
+    """
+    Peak resident memory of the process, in kilobytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return peak
+
+
+def run_case(shape, size, ns):
+    """
+    Generates a source and runs the front end phases over it, returning the
+    result record of the case. Failures (like a too deep recursion) are
+    recorded in it instead of being raised.
+    """
+    source = SHAPES[shape](size, ns)
+    result = {
+        'shape'  : shape,
+        'size'   : len(source),
+        'lines'  : source.count('\n'),
+        'tokens' : None,
+        'nodes'  : None,
+        'errors' : None,
+        'phases' : {},
+        'failed' : None
+        }
+    parser = build_parser(ns.parser)
+    phase = 'lex'
+    try:
+        start = time.time()
+        tokens = build_lexer(ns.lexer, source).getTokenList()
+        elapsed = time.time() - start
+        result['tokens'] = len(tokens)
+        record_phase(result, 'lex', elapsed, len(tokens))
+
+        phase = 'parse'
+        start = time.time()
+        ast = parser.parse(lexer=ListLexer(tokens))
+        elapsed = time.time() - start
+        del tokens
+        result['nodes'] = count_nodes(ast)
+        record_phase(result, 'parse', elapsed, result['nodes'])
+
+        phase = 'check'
+        diagnostics = SetlanStaticErrors()
+        start = time.time()
+        ast.staticChecks(diagnostics)
+        elapsed = time.time() - start
+        result['errors'] = len(diagnostics.getErrors())
+        record_phase(result, 'check', elapsed, result['nodes'])
+    except (Exception, RuntimeError) as e:
+        result['failed'] = "%s: %s" % (phase, str(e)[:200])
+    return result
+
+
+def record_phase(result, phase, elapsed, units):
+    result['phases'][phase] = {
+        'time'        : elapsed,
+        'per_second'  : units / elapsed if elapsed > 0 else None,
+        'peak_rss_kb' : peak_memory()
+        }
+
+
+def run_isolated(shape, size, ns):
+    """
+    Runs a case in a child process.
+    """
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(run_case, (shape, size, ns))
+    finally:
+        pool.terminate()
+
+################################################################################
+################################## Reports #####################################
+################################################################################
+
+
+def git_revision():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=ROOT,
+                stderr=devnull
+                ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case_key(result):
+    return (result['shape'], result['size'])
+
+
+def print_result(result, baseline):
+    if result['failed'] is not None:
+        print "%8s %10d %10s  failed in %s" % (result['shape'],
+                                               result['size'], "",
+                                               result['failed'])
+        return
+    for phase in PHASES:
+        data = result['phases'][phase]
+        units = "tokens/s" if phase == 'lex' else "nodes/s"
+        line = "%8s %10d %8s %10.3f %12.0f %-8s %10d" % (
+            result['shape'],
+            result['size'],
+            phase,
+            data['time'],
+            data['per_second'] or 0,
+            units,
+            data['peak_rss_kb']
+            )
+        old = baseline.get(case_key(result))
+        if old is not None and phase in old['phases'] and data['time'] > 0:
+            line += " %8.2fx" % (old['phases'][phase]['time'] / data['time'])
+        print line
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="frontend")
+    args_parser.add_argument('--shapes', default='flat,nested,set,chain',
+        help="comma separated source shapes, among: %s" %
+             ", ".join(sorted(SHAPES)))
+    args_parser.add_argument('--sizes', default='0.1,0.5',
+        help="comma separated source sizes, in megabytes")
+    args_parser.add_argument('--depth', type=int, default=50,
+        help="nesting depth of the blocks of the nested shape")
+    args_parser.add_argument('--chain', type=int, default=100,
+        help="binary operators per expression of the chain shape")
+    args_parser.add_argument('--lexer', choices=SetlanConfig.LEXER_BACKENDS,
+        default=SetlanConfig.LEXER_BACKENDS[0], help="lexer backend")
+    args_parser.add_argument('--parser', choices=SetlanConfig.PARSER_BACKENDS,
+        default=SetlanConfig.PARSER_BACKENDS[0], help="parser backend")
+    args_parser.add_argument('--output', default='frontend.json',
+        help="file where the results are written as JSON")
+    args_parser.add_argument('--compare', metavar='FILE', default=None,
+        help="results of a previous run, to report the speedup of each phase")
+    ns = args_parser.parse_args()
+
+    shapes = ns.shapes.split(',')
+    for shape in shapes:
+        if shape not in SHAPES:
+            args_parser.error("unknown shape: %s" % shape)
+    baseline = {}
+    if ns.compare is not None:
+        with open(ns.compare) as previous:
+            for result in json.load(previous)['results']:
+                baseline[case_key(result)] = result
+
+    # Builds the parsing tables beforehand, so no case times it.
+    build_parser(ns.parser)
+
+    header = "%8s %10s %8s %10s %12s %-8s %10s" % (
+        "shape", "bytes", "phase", "time (s)", "rate", "", "peak (KB)")
+    if baseline:
+        header += " %9s" % "speedup"
+    print header
+    results = []
+    for shape in shapes:
+        for size in [float(s) for s in ns.sizes.split(',')]:
+            result = run_isolated(shape, int(size * 1024 * 1024), ns)
+            print_result(result, baseline)
+            results.append(result)
+
+    report = {
+        'benchmark' : 'frontend',
+        'revision'  : git_revision(),
+        'date'      : time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python'    : platform.python_version(),
+        'lexer'     : ns.lexer,
+        'parser'    : ns.parser,
+        'depth'     : ns.depth,
+        'chain'     : ns.chain,
+        'results'   : results
+        }
+    with open(ns.output, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+    print "Results written to %s" % ns.output
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# incremental_edits.py
+#
+# Latency of the incremental analysis of Setlan programs
+# (lang/incremental.py) on a large synthetic program, for
+# typical editor edits, compared with a full analysis. With
+# --check, the diagnostics after each edit are verified
+# against the ones of a full analysis of the edited source.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/incremental_edits.py [--lines 12000] [--check]
+# ------------------------------------------------------------
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lang.incremental import SetlanIncrementalAnalyzer
+
+UNIT = """  { using int a, b; in
+    a = x + %d;
+    for i min s ++ {a, b} do {
+      b = b + i * 2;
+      println "b = ", b;
+    };
+    if (a > b) { using set t; in t = s <+> a; s = t; } else print a;
+  };
+"""
+
+LINES_PER_UNIT = UNIT.count('\n')
+
+
+def generate(lines):
+    """
+    Returns a Setlan program of about <lines> lines: a block with one nested
+    block per unit, each one with nested blocks and a for loop.
+    """
+    units = [UNIT % n for n in range(max(1, lines // LINES_PER_UNIT))]
+    return "program { using int x, y; set s; in\n%s}\n" % "".join(units)
+
+
+def edits(source):
+    """
+    Pairs of (name, edit) applied to the middle of the program. Each edit is
+    followed by the edit undoing it, so the source is the same afterwards.
+    """
+    middle = source.index("a = x + ", len(source) // 2)
+    number = middle + len("a = x + ")
+    digits = len(source[number:source.index(";", number)])
+    body = source.index("b = b + i", middle)
+    declaration = source.index("using int a, b", middle) + len("using int ")
+    unit = source.index("  {", middle)
+    statement = "  y = x + 1;\n"
+    return [
+        ('digit', (number, number + 1, '7'),
+                  (number, number + 1, source[number])),
+        ('name', (body, body + 1, 'q'), (body, body + 1, 'b')),
+        ('newline', (body, body, '\n      '), (body, body + 7, '')),
+        ('statement', (unit, unit, statement),
+                      (unit, unit + len(statement), '')),
+        ('declaration', (declaration, declaration + 1, 'z'),
+                        (declaration, declaration + 1, 'a')),
+        ('number', (number, number + digits, '1' * digits),
+                   (number, number + digits, source[number:number + digits]))
+        ]
+
+
+def diagnostics(errors):
+    return [str(error) for error in errors]
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="incremental_edits")
+    args_parser.add_argument('--lines', type=int, default=12000,
+        help="approximate number of lines of the program")
+    args_parser.add_argument('--repeat', type=int, default=5,
+        help="times each edit is applied and undone")
+    args_parser.add_argument('--check', action='store_true',
+        help="check the diagnostics against a full analysis after each edit")
+    ns = args_parser.parse_args()
+
+    source = generate(ns.lines)
+    start = time.time()
+    analyzer = SetlanIncrementalAnalyzer(source)
+    full = time.time() - start
+    print "%d lines, %d diagnostics. Full analysis: %.3f s" % (
+        source.count('\n'), len(analyzer.getDiagnostics()), full)
+    print "%12s %14s %14s %10s" % (
+        "edit", "edit (ms)", "undo (ms)", "speedup")
+    for name, edit, undo in edits(source):
+        times = [[], []]
+        for n in range(ns.repeat):
+            for index, change in enumerate((edit, undo)):
+                start = time.time()
+                errors = analyzer.edit(*change)
+                times[index].append(time.time() - start)
+                if ns.check:
+                    expected = SetlanIncrementalAnalyzer(
+                        analyzer.getSource()).getDiagnostics()
+                    if diagnostics(errors) != diagnostics(expected):
+                        print "MISMATCH after %s" % name
+                        sys.exit(1)
+        best = [min(elapsed) for elapsed in times]
+        print "%12s %14.2f %14.2f %9.0fx" % (
+            name, 1000 * best[0], 1000 * best[1], full / max(best))
+    if analyzer.getSource() != source:
+        print "The source was not restored by the undo edits."
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# lexer_scaling.py
+#
+# Benchmark for the Setlan lexer over synthetic sources of
+# growing size. Sources are generated as a single long line,
+# which is the worst case for column tracking, so lexing time
+# should grow linearly with the size of the input.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/lexer_scaling.py [--sizes 1,2,4,8] [--lines N]
+#
+# where sizes are given in megabytes.
+# ------------------------------------------------------------
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ply import lex
+
+from lang import lexical_specs
+
+STATEMENT = "x = x + {1, 2, 3} <+> 42 * y; println \"x\", x; "
+
+
+def generate(size, lines):
+    """
+    Returns a Setlan program of about <size> bytes split into <lines> lines.
+    Every line holds at least one statement, so fewer lines are generated
+    when the size does not allow that many.
+    """
+    statements = max(size // len(STATEMENT), 1)
+    lines = max(min(lines, statements), 1)
+    per_line, extra = divmod(statements, lines)
+    body = [STATEMENT * (per_line + (i < extra)) for i in xrange(lines)]
+    return "program { using int x, y; in\n%s\n}" % ("\n".join(body))
+
+
+def lex_all(source):
+    lexer = lex.lex(module=lexical_specs)
+    lexer.input(source)
+    count = 0
+    for token in iter(lexer.token, None):
+        count += 1
+    return count
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="lexer_scaling")
+    args_parser.add_argument('--sizes', default='1,2,4,8',
+        help="comma separated source sizes, in megabytes")
+    args_parser.add_argument('--lines', type=int, default=1,
+        help="number of lines the source is split into")
+    ns = args_parser.parse_args()
+
+    print "%10s %10s %10s %14s %14s" % (
+        "size (MB)", "tokens", "time (s)", "tokens/s", "us/token")
+    for size in [float(s) for s in ns.sizes.split(',')]:
+        source = generate(int(size * 1024 * 1024), ns.lines)
+        # The size actually generated is reported, not the requested one.
+        size = len(source) / (1024.0 * 1024)
+        start = time.time()
+        count = lex_all(source)
+        elapsed = time.time() - start
+        print "%10.2f %10d %10.3f %14.0f %14.3f" % (
+            size, count, elapsed, count / elapsed, 1e6 * elapsed / count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# list_scaling.py
+#
+# Parsing time of Setlan programs made of long lists, as the
+# ones generated from data: a set literal with N numbers and a
+# block with N instructions. Lists are built in linear time, so
+# the time per element should not grow with N. The size of the
+# pickled AST shows the effect of packing constant sets.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/list_scaling.py [--counts 25000,50000,100000]
+#           [--parser ply]
+# ------------------------------------------------------------
+import os
+import sys
+import time
+import cPickle
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lang.config import SetlanConfig
+from lang.scanner import SetlanScanner
+# Registers how to pickle the AST, as the program cache does.
+import lang.program_cache
+
+from parser_backends import ListLexer
+from frontend import build_parser
+
+
+def set_literal(count):
+    elements = ", ".join([str(n) for n in xrange(count)])
+    return "program { using set s; in s = {%s}; }" % elements
+
+
+def instructions(count):
+    return "program { using int x; in\n%s}" % ("x = x + 1;\n" * count)
+
+
+LISTS = [
+    ('set', set_literal),
+    ('block', instructions)
+    ]
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="list_scaling")
+    args_parser.add_argument('--counts', default='25000,50000,100000',
+        help="comma separated numbers of elements")
+    args_parser.add_argument('--parser', choices=SetlanConfig.PARSER_BACKENDS,
+        default=SetlanConfig.PARSER_BACKENDS[0], help="parser backend")
+    ns = args_parser.parse_args()
+
+    parser = build_parser(ns.parser)
+    print "%8s %10s %10s %14s %14s" % (
+        "list", "elements", "parse (s)", "us/element", "AST (bytes)")
+    for name, generate in LISTS:
+        for count in [int(c) for c in ns.counts.split(',')]:
+            # Tokens are materialized first so only parsing is timed.
+            tokens = SetlanScanner(inputString=generate(count)).getTokenList()
+            start = time.time()
+            ast = parser.parse(lexer=ListLexer(tokens))
+            elapsed = time.time() - start
+            size = len(cPickle.dumps(ast, cPickle.HIGHEST_PROTOCOL))
+            print "%8s %10d %10.3f %14.2f %14d" % (
+                name, count, elapsed, 1e6 * elapsed / count, size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# loop_checks.py
+#
+# Time of the static checks of programs made of nested for
+# loops, as the nesting depth and the size of the loop bodies
+# grow. The modifications of the counters are looked for while
+# the bodies are checked, so the time should grow linearly
+# with the size of the program, whatever its depth.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/loop_checks.py [--depths 5,10,20,40] [--width 50]
+#           [--assignments]
+# ------------------------------------------------------------
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from lang.exceptions import SetlanStaticErrors
+from lang.pratt_parser import SetlanPrattParser
+from lang.scanner import SetlanScanner
+
+
+def generate(depth, width, assignments):
+    """
+    A program with depth nested for loops, whose bodies are blocks declaring
+    a variable and printing it (or assigning it, with assignments) width
+    times.
+    """
+    statement = "v%d = %d;" if assignments else "println v%d, %d;"
+    source = "program {\n"
+    for level in range(depth):
+        source += "for i%d min {1, 2} do { using int v%d; in\n" % (level, level)
+        source += " ".join([statement % (level, n) for n in range(width)])
+        source += "\n"
+    source += "};\n" * depth
+    return source + "}\n"
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="loop_checks")
+    args_parser.add_argument('--depths', default='5,10,20,40',
+        help="comma separated nesting depths")
+    args_parser.add_argument('--width', type=int, default=50,
+        help="statements in the body of each loop")
+    args_parser.add_argument('--assignments', action='store_true',
+        help="assign the variables instead of printing them")
+    ns = args_parser.parse_args()
+
+    parser = SetlanPrattParser()
+    print "%8s %10s %10s %10s %12s" % (
+        "depth", "lines", "errors", "check (s)", "us/statement")
+    for depth in [int(d) for d in ns.depths.split(',')]:
+        source = generate(depth, ns.width, ns.assignments)
+        ast = parser.parse(lexer=SetlanScanner(inputString=source))
+        diagnostics = SetlanStaticErrors()
+        start = time.time()
+        ast.staticChecks(diagnostics)
+        elapsed = time.time() - start
+        print "%8d %10d %10d %10.3f %12.1f" % (
+            depth, source.count('\n'), len(diagnostics.getErrors()), elapsed,
+            elapsed * 1e6 / (depth * ns.width))
+
+
+if __name__ == '__main__':
+    main()
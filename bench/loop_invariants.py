@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# loop_invariants.py
+#
+# Execution time of loop heavy programs with and without the
+# optimizer, as the sets their loops work over grow. Their
+# loops evaluate expressions whose variables are not modified
+# in them: set operations over large sets, arithmetic, and
+# expressions invariant in the outer loop of nested loops,
+# which the optimizer evaluates once each time their loops are
+# entered. With --check, it verifies first that the optimized
+# programs give the same output as the original ones.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/loop_invariants.py [--sizes 10,100,1000]
+#           [--iterations 200] [--check]
+# ------------------------------------------------------------
+import os
+import sys
+import time
+import argparse
+
+from cStringIO import StringIO
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from lang.exceptions import SetlanStaticErrors
+from lang.optimizer import SetlanOptimizer
+from lang.pratt_parser import SetlanPrattParser
+from lang.scanner import SetlanScanner
+
+
+def literal(size, step):
+    return "{" + ", ".join([str(n * step) for n in range(size)]) + "}"
+
+
+def sets(size, iterations):
+    """
+    A loop testing membership in the union of two sets computed from
+    variables that do not change in it.
+    """
+    return ("program { using int i, k, c; in\n"
+            "k = 3; i = 0; c = 0;\n"
+            "while (i < %d) do {\n"
+            "  if (i @ ((k <+> %s) ++ (k <*> %s))) c = c + 1;\n"
+            "  i = i + 1;\n"
+            "};\n"
+            "println c;\n"
+            "}\n" % (iterations, literal(size, 2), literal(size, 5)))
+
+
+def arithmetic(size, iterations):
+    """
+    A loop adding the same terms to an accumulator, size times each
+    iteration.
+    """
+    terms = " + ".join(["(k * k - k / %d) %% 7" % (n + 1) for n in range(size)])
+    return ("program { using int i, k, x; in\n"
+            "k = 41; i = 0; x = 0;\n"
+            "while (i < %d) do {\n"
+            "  x = (x + %s + i) %% 1000;\n"
+            "  i = i + 1;\n"
+            "};\n"
+            "println x;\n"
+            "}\n" % (iterations, terms))
+
+
+def nested(size, iterations):
+    """
+    Nested loops, whose inner loop uses a set that only changes in the outer
+    one.
+    """
+    return ("program { using int i, j, c; in\n"
+            "i = 0; c = 0;\n"
+            "while (i < %d) do {\n"
+            "  j = 0;\n"
+            "  while (j < 20) do {\n"
+            "    if (j @ ((i %% 3) <+> %s)) c = c + 1;\n"
+            "    j = j + 1;\n"
+            "  };\n"
+            "  i = i + 1;\n"
+            "};\n"
+            "println c;\n"
+            "}\n" % (iterations / 20 or 1, literal(size, 1)))
+
+
+SHAPES = {
+    'sets'       : sets,
+    'arithmetic' : arithmetic,
+    'nested'     : nested
+    }
+
+
+def run(parser, source, optimize):
+    """
+    Output of source and its execution time, with or without the optimizer.
+    """
+    ast = parser.parse(lexer=SetlanScanner(inputString=source))
+    diagnostics = SetlanStaticErrors()
+    ast.staticChecks(diagnostics)
+    if diagnostics.has_errors():
+        raise diagnostics
+    if optimize:
+        SetlanOptimizer().optimize(ast)
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        start = time.time()
+        ast.execute()
+        elapsed = time.time() - start
+        return sys.stdout.getvalue(), elapsed
+    finally:
+        sys.stdout = stdout
+
+
+def check(parser, sizes, iterations):
+    failures = 0
+    for shape in sorted(SHAPES):
+        for size in sizes:
+            source = SHAPES[shape](size, iterations)
+            if run(parser, source, False)[0] == run(parser, source, True)[0]:
+                print "%s of size %d: ok." % (shape, size)
+            else:
+                print "%s of size %d: outputs differ." % (shape, size)
+                failures += 1
+    return failures
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="loop_invariants")
+    args_parser.add_argument('--sizes', default='10,100,1000',
+        help="comma separated sizes of the sets and sums of the loops")
+    args_parser.add_argument('--iterations', type=int, default=200,
+        help="times the loop of each program runs")
+    args_parser.add_argument('--check', action='store_true',
+        help="check that the optimized programs give the same output")
+    ns = args_parser.parse_args()
+
+    parser = SetlanPrattParser()
+    sizes = [int(s) for s in ns.sizes.split(',')]
+    if ns.check:
+        if check(parser, sizes, ns.iterations):
+            sys.exit(1)
+
+    print "%-10s %6s %12s %13s %8s" % (
+        "shape", "size", "original (s)", "optimized (s)", "speedup")
+    for shape in sorted(SHAPES):
+        for size in sizes:
+            source = SHAPES[shape](size, ns.iterations)
+            original = run(parser, source, False)[1]
+            optimized = run(parser, source, True)[1]
+            print "%-10s %6d %12.3f %13.3f %7.1fx" % (
+                shape, size, original, optimized, original / optimized)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# parallel_lexing.py
+#
+# Compares PLY's sequential lexer (lang/lexer.py) with the
+# parallel lexer (lang/parallel_lexer.py) over a number of
+# worker processes. With --check, it verifies first that both
+# produce the same tokens and lexical errors for every program
+# under test/, split in chunks of a few lines.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/parallel_lexing.py [--sizes 4,16] [--workers 1,2,4]
+#           [--chunk-size 1] [--check]
+#
+# where sizes are given in megabytes.
+# ------------------------------------------------------------
+import os
+import sys
+import glob
+import time
+import argparse
+import multiprocessing
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from lang import lexical_specs
+from lang.lexer import SetlanLexer
+from lang.parallel_lexer import SetlanParallelLexer
+
+from lexer_scaling import generate
+from scanner_throughput import stream
+
+
+def check():
+    mismatches = 0
+    for path in sorted(glob.glob(os.path.join(ROOT, 'test', '*', '*.stl'))):
+        source = open(path).read()
+        expected = stream(SetlanLexer(module=lexical_specs,
+                                      inputString=source))
+        for chunk_size in (1, 64):
+            lexer = SetlanParallelLexer(module=lexical_specs,
+                                        inputString=source, workers=2,
+                                        chunk_size=chunk_size)
+            if stream(lexer) != expected:
+                print "MISMATCH: %s (chunks of %d bytes)" % (
+                    os.path.relpath(path, ROOT), chunk_size)
+                mismatches += 1
+    return mismatches
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="parallel_lexing")
+    args_parser.add_argument('--sizes', default='4,16',
+        help="comma separated source sizes, in megabytes")
+    args_parser.add_argument('--lines', type=int, default=100000,
+        help="number of lines the source is split into")
+    args_parser.add_argument('--workers', default='1,2,4',
+        help="comma separated numbers of worker processes")
+    args_parser.add_argument('--chunk-size', type=float, default=1,
+        help="size of the chunks lexed by the workers, in megabytes")
+    args_parser.add_argument('--check', action='store_true',
+        help="check that both lexers agree on the test programs")
+    ns = args_parser.parse_args()
+
+    if ns.check:
+        mismatches = check()
+        print "Token streams checked: %d mismatches." % mismatches
+        if mismatches:
+            sys.exit(1)
+
+    print "CPUs: %d" % multiprocessing.cpu_count()
+    print "%10s %10s %10s %10s %14s %8s" % (
+        "size (MB)", "workers", "tokens", "time (s)", "tokens/s", "speedup")
+    chunk_size = int(ns.chunk_size * 1024 * 1024)
+    for size in [float(s) for s in ns.sizes.split(',')]:
+        source = generate(int(size * 1024 * 1024), ns.lines)
+        size = len(source) / (1024.0 * 1024)
+        lexers = [('seq', lambda: SetlanLexer(module=lexical_specs,
+                                              inputString=source))]
+        for workers in [int(w) for w in ns.workers.split(',')]:
+            lexers.append((workers, lambda workers=workers:
+                SetlanParallelLexer(module=lexical_specs, inputString=source,
+                                    workers=workers, chunk_size=chunk_size)))
+        reference = None
+        for name, build in lexers:
+            start = time.time()
+            count = 0
+            for token in build().tokens():
+                count += 1
+            elapsed = time.time() - start
+            if reference is None:
+                reference = elapsed
+            print "%10.2f %10s %10d %10.3f %14.0f %7.1fx" % (
+                size, name, count, elapsed, count / elapsed,
+                reference / elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# parser_backends.py
+#
+# Compares the two Setlan parser backends: PLY's LALR parser
+# (lang/syntax_specs.py), with and without PLY's position
+# tracking, and the hand written precedence climbing parser
+# (lang/pratt_parser.py). With --check, it verifies first that
+# all of them produce the same AST dump, or the same syntax
+# error, for every program under test/.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/parser_backends.py [--sizes 0.25,1] [--check]
+#
+# where sizes are given in megabytes.
+# ------------------------------------------------------------
+import os
+import sys
+import glob
+import time
+import argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from lang import syntax_specs
+from lang.parser_cache import SetlanParserCache
+from lang.pratt_parser import SetlanPrattParser
+from lang.scanner import SetlanScanner
+from lang.exceptions import SetlanException
+
+from lexer_scaling import generate
+
+
+def build_ply():
+    return SetlanParserCache(syntax_specs).getParser()
+
+
+# Name, parser builder and whether PLY's tracking is enabled.
+BACKENDS = [
+    ('ply-track', build_ply, True),
+    ('ply', build_ply, False),
+    ('pratt', SetlanPrattParser, False)
+    ]
+
+
+def dump(parser, tracking, source):
+    """
+    AST dump of a program, or the error found while parsing it.
+    """
+    try:
+        lexer = SetlanScanner(inputString=source)
+        return str(parser.parse(lexer=lexer, tracking=tracking))
+    except SetlanException as e:
+        return str(e)
+
+
+def check(parsers):
+    mismatches = 0
+    for path in sorted(glob.glob(os.path.join(ROOT, 'test', '*', '*.stl'))):
+        source = open(path).read()
+        dumps = [dump(parser, tracking, source)
+                 for name, parser, tracking in parsers]
+        if dumps.count(dumps[0]) != len(dumps):
+            print "MISMATCH: %s" % os.path.relpath(path, ROOT)
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="parser_backends")
+    args_parser.add_argument('--sizes', default='0.25,1',
+        help="comma separated source sizes, in megabytes")
+    args_parser.add_argument('--lines', type=int, default=10000,
+        help="number of lines the source is split into")
+    args_parser.add_argument('--check', action='store_true',
+        help="check that all backends agree on the test programs")
+    ns = args_parser.parse_args()
+
+    parsers = [(name, build(), tracking) for name, build, tracking in BACKENDS]
+    if ns.check:
+        mismatches = check(parsers)
+        print "AST dumps checked: %d mismatches." % mismatches
+        if mismatches:
+            sys.exit(1)
+
+    print "%10s %10s %10s %10s %14s %8s" % (
+        "size (MB)", "backend", "tokens", "time (s)", "tokens/s", "speedup")
+    for size in [float(s) for s in ns.sizes.split(',')]:
+        source = generate(int(size * 1024 * 1024), ns.lines)
+        size = len(source) / (1024.0 * 1024)
+        count = len(SetlanScanner(inputString=source).getTokenList())
+        reference = None
+        for name, parser, tracking in parsers:
+            # Tokens are materialized first so only parsing is timed.
+            lexer = ListLexer(SetlanScanner(inputString=source).getTokenList())
+            start = time.time()
+            parser.parse(lexer=lexer, tracking=tracking)
+            elapsed = time.time() - start
+            if reference is None:
+                reference = elapsed
+            print "%10.2f %10s %10d %10.3f %14.0f %7.1fx" % (
+                size, name, count, elapsed, count / elapsed,
+                reference / elapsed)
+
+
+class ListLexer(object):
+    """
+    Lexer handing out the tokens of a list, as ply.yacc expects them.
+    """
+
+    def __init__(self, tokens):
+        self._next = iter(tokens).next
+        self.lineno = 0
+        self.lexpos = 0
+
+    def token(self):
+        try:
+            return self._next()
+        except StopIteration:
+            return None
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# scanner_throughput.py
+#
+# Compares the throughput of the two Setlan lexer backends:
+# PLY's lexer (lang/lexer.py) and the table driven scanner
+# (lang/scanner.py). With --check, it verifies first that both
+# produce the same tokens for every program under test/.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/scanner_throughput.py [--sizes 1,4] [--check]
+#
+# where sizes are given in megabytes.
+# ------------------------------------------------------------
+import os
+import sys
+import glob
+import time
+import argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from lang import lexical_specs
+from lang.lexer import SetlanLexer
+from lang.scanner import SetlanScanner
+from lang.exceptions import SetlanLexicalErrors
+
+from lexer_scaling import generate
+
+
+def build_ply(source):
+    return SetlanLexer(module=lexical_specs, inputString=source)
+
+
+def build_scanner(source):
+    return SetlanScanner(inputString=source)
+
+
+BACKENDS = [('ply', build_ply), ('scanner', build_scanner)]
+
+
+def stream(lexer):
+    """
+    Comparable form of the tokens of a lexer, plus its lexical errors.
+    """
+    tokens = []
+    try:
+        for token in lexer.tokens():
+            tokens.append((token.type, token.value, token.lineno, token.colno))
+    except SetlanLexicalErrors as e:
+        return tokens, str(e)
+    return tokens, None
+
+
+def check():
+    mismatches = 0
+    for path in sorted(glob.glob(os.path.join(ROOT, 'test', '*', '*.stl'))):
+        source = open(path).read()
+        expected = stream(build_ply(source))
+        if stream(build_scanner(source)) != expected:
+            print "MISMATCH: %s" % os.path.relpath(path, ROOT)
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="scanner_throughput")
+    args_parser.add_argument('--sizes', default='1,4',
+        help="comma separated source sizes, in megabytes")
+    args_parser.add_argument('--lines', type=int, default=10000,
+        help="number of lines the source is split into")
+    args_parser.add_argument('--check', action='store_true',
+        help="check that both backends agree on the test programs")
+    ns = args_parser.parse_args()
+
+    if ns.check:
+        mismatches = check()
+        print "Token streams checked: %d mismatches." % mismatches
+        if mismatches:
+            sys.exit(1)
+
+    print "%10s %10s %10s %10s %14s %8s" % (
+        "size (MB)", "backend", "tokens", "time (s)", "tokens/s", "speedup")
+    for size in [float(s) for s in ns.sizes.split(',')]:
+        source = generate(int(size * 1024 * 1024), ns.lines)
+        size = len(source) / (1024.0 * 1024)
+        reference = None
+        for name, build in BACKENDS:
+            start = time.time()
+            count = 0
+            for token in build(source).tokens():
+                count += 1
+            elapsed = time.time() - start
+            if reference is None:
+                reference = elapsed
+            print "%10.2f %10s %10d %10.3f %14.0f %7.1fx" % (
+                size, name, count, elapsed, count / elapsed,
+                reference / elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# startup_time.py
+#
+# Wall clock time of spawning the setlan interpreter, for the
+# modes used when it is run once per request: printing the
+# version, listing tokens, and running a program with and
+# without the program cache. Use `setlan --import-times` to
+# see which imports each mode spends its time on.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/startup_time.py [--runs 20] [program.stl]
+# ------------------------------------------------------------
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SETLAN = os.path.join(ROOT, 'setlan')
+
+# Name and command line flags of each mode.
+MODES = [
+    ('version', ['-v']),
+    ('tokens', ['-t', '--lexer', 'scanner']),
+    ('execute', ['-e']),
+    ('execute-fast', ['-e', '--lexer', 'scanner', '--parser', 'pratt']),
+    ('execute-cached', ['-e', '--cache'])
+    ]
+
+
+def spawn(args, env):
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        subprocess.call([sys.executable, SETLAN] + args, stdin=devnull,
+                        stdout=devnull, stderr=devnull, env=env)
+        return time.time() - start
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="startup_time")
+    args_parser.add_argument('--runs', type=int, default=20,
+        help="times each mode is spawned")
+    args_parser.add_argument('program', nargs='?',
+        default=os.path.join(ROOT, 'test', 'success', 'success1.stl'),
+        help="program run by the execute modes")
+    ns = args_parser.parse_args()
+
+    # A fresh cache directory, warmed up by a first run of each mode.
+    cache_dir = tempfile.mkdtemp(prefix='setlan-startup-')
+    env = dict(os.environ)
+    env['SETLAN_CACHE_DIR'] = cache_dir
+    try:
+        print "%16s %10s %10s" % ("mode", "best (ms)", "median (ms)")
+        for name, flags in MODES:
+            args = flags + [ns.program]
+            spawn(args, env)
+            times = sorted([spawn(args, env) for n in range(ns.runs)])
+            print "%16s %10.1f %10.1f" % (name, 1000 * times[0],
+                                          1000 * times[len(times) // 2])
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# token_memory.py
+#
+# Memory taken by the tokens of a Setlan program, for each
+# lexer backend: the bytes per token of the token records and
+# of the values they hold (counted once when shared, as the
+# interned identifiers are), and the distinct identifier
+# strings kept alive by the token list.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+#
+# Usage:
+#
+#     $ python bench/token_memory.py [--size 0.5] [--lexer ply]
+#
+# where the size is given in megabytes.
+# ------------------------------------------------------------
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lang.config import SetlanConfig
+
+from frontend import build_lexer
+
+UNIT = ("program { using int total, count; set values; in\n"
+        "total = total + count * 2;\n"
+        "values = values ++ {count, total};\n"
+        "for item min values do println \"item \", item;\n"
+        "}\n")
+
+
+def token_bytes(tokens):
+    """
+    Bytes taken by the token records, their instance dictionaries and the
+    objects they hold, counting each object once.
+    """
+    seen = set()
+    total = 0
+    identifiers = set()
+    for token in tokens:
+        objects = [token]
+        attributes = getattr(token, '__dict__', None)
+        if attributes is not None:
+            objects.append(attributes)
+            objects.extend(attributes.itervalues())
+        else:
+            objects.extend(token)
+        for obj in objects:
+            if id(obj) not in seen:
+                seen.add(id(obj))
+                total += sys.getsizeof(obj)
+        if token.type == 'TkId':
+            identifiers.add(id(token.value))
+    return total, len(identifiers)
+
+
+def main():
+    args_parser = argparse.ArgumentParser(prog="token_memory")
+    args_parser.add_argument('--size', type=float, default=0.5,
+        help="source size, in megabytes")
+    args_parser.add_argument('--lexer', choices=SetlanConfig.LEXER_BACKENDS,
+        default=None, help="lexer backend. Defaults to all of them")
+    ns = args_parser.parse_args()
+
+    source = UNIT * max(1, int(ns.size * 1024 * 1024) // len(UNIT))
+    backends = SetlanConfig.LEXER_BACKENDS
+    if ns.lexer is not None:
+        backends = [ns.lexer]
+    print "%8s %10s %14s %16s" % ("lexer", "tokens", "bytes/token",
+                                  "identifier strs")
+    for backend in backends:
+        tokens = build_lexer(backend, source).getTokenList()
+        total, identifiers = token_bytes(tokens)
+        print "%8s %10d %14.1f %16d" % (backend, len(tokens),
+                                        float(total) / len(tokens),
+                                        identifiers)
+
+
+if __name__ == '__main__':
+    main()
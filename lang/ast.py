@@ -8,12 +8,21 @@
 # Author:
 # Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
 # ------------------------------------------------------------
+from array import array
+from operator import add, sub, mul, neg
+from functools import partial
+from cStringIO import StringIO
+
 from config import SetlanConfig
 
+from ast_writer import SetlanAstWriter
+
 from type import *
 
 from sym_table import SymTable
 
+from traversal import run
+
 from exceptions import (
     SetlanTypeError,
     SetlanSyntaxError,
@@ -28,6 +37,11 @@ from exceptions import (
 
 class Setlan(SetlanConfig):
 
+    # Whether the node checks that the integers it produces fit in 32 bits,
+    # and the operation it uses once the optimizer proved they do.
+    _checked = True
+    _unchecked_op = None
+
     def __init__(self, instruction, *args, **kwargs):
         super(Setlan, self).__init__(args, kwargs)
         self._position = kwargs.get('position', None)
@@ -38,27 +52,109 @@ class Setlan(SetlanConfig):
         return string
 
     def print_ast(self, level):
-        string = "Setlan Program:\n%s" % self._instruction.print_ast(level+1)
-        return string
-
-    def staticChecks(self):
-        st = self._check(None)
+        """
+        Dump of the tree, as a string. Prefer dump() for large trees.
+        """
+        stream = StringIO()
+        self.write_ast(SetlanAstWriter(stream), level)
+        return stream.getvalue()
+
+    def dump(self, stream, max_depth=None, max_nodes=None):
+        """
+        Writes the dump of the tree to stream as it is produced, eliding the
+        nodes nested deeper than max_depth and everything after the first
+        max_nodes nodes. Returns the number of nodes written.
+        """
+        writer = SetlanAstWriter(stream, max_depth=max_depth,
+                                 max_nodes=max_nodes)
+        self.write_ast(writer, 0)
+        return writer.getNodes()
+
+    def write_ast(self, out, level):
+        """
+        Writes the dump of the tree to the writer out. The _write_ast methods
+        of nodes with children are generators that yield (child, level) pairs
+        to write them, which are written here with an explicit stack.
+        """
+        if not out.enter(self, level):
+            return
+        task = self._write_ast(out, level)
+        if task is None:
+            out.leave()
+            return
+        stack = [task]
+        while stack:
+            try:
+                child, child_level = stack[-1].next()
+            except StopIteration:
+                stack.pop()
+                out.leave()
+                continue
+            if out.enter(child, child_level):
+                task = child._write_ast(out, child_level)
+                if task is None:
+                    out.leave()
+                else:
+                    stack.append(task)
+
+    def _elision(self, level):
+        return "%s..." % self._get_indentation(level)
+
+    def _children(self):
+        """
+        Instructions and expressions right under the node, from first to last.
+        """
+        return (self._instruction,)
+
+    def skipOverflowCheck(self):
+        """
+        Makes the node skip the overflow checks of the integers it produces,
+        once the optimizer proved they fit in 32 bits.
+        """
+        self._checked = False
+        if self._unchecked_op is not None:
+            self._op = self._unchecked_op
+
+    def _write_ast(self, out, level):
+        out.write("Setlan Program:\n")
+        yield self._instruction, level+1
+
+    def staticChecks(self, diagnostics):
+        """
+        Runs the static checks of the program, reporting its errors to the
+        given diagnostics context (a SetlanStaticErrors), and returns its
+        symbol table. Each compilation should use its own context, so
+        programs can be checked concurrently; the context is required, as the
+        errors would be lost otherwise.
+        """
+        st = run(self, '_check', None, diagnostics)
         while st.getFather() is not None:
             st = st.getFather()
         return st
 
-    def _check(self, symtable):
-        check = self._instruction._check(symtable)
+    def _check(self, symtable, diagnostics):
+        check = yield self._instruction, symtable
         if isinstance(check, SymTable):
-            return check
+            yield check
         else:
-            return SymTable(father=None)
+            yield SymTable(father=None)
 
     def execute(self):
-        self._execute(None)
-
-    def _execute(self, symtable):
-        self._instruction._execute(symtable)
+        """
+        Runs the program. Instructions are run from a stack of tasks, pairs of
+        a function and the state it is called with: the _execute() of each
+        instruction is called with its symbol table and the stack, and pushes
+        the tasks that run its nested instructions (and whatever they must do
+        after them) instead of running them itself, so programs of any depth
+        use a bounded amount of Python stack.
+        """
+        tasks = [(self._execute, None)]
+        while tasks:
+            task, state = tasks.pop()
+            task(state, tasks)
+
+    def _execute(self, symtable, tasks):
+        tasks.append((self._instruction._execute, symtable))
 
 
 class Printable(Setlan):
@@ -67,8 +163,11 @@ class Printable(Setlan):
         super(Printable, self).__init__(args, kwargs)
         self._position = kwargs.get('position', None)
 
-    def print_ast(self, level):
-        return "%s%s: Not Implemented" % (self.SPACE, self.__class__.__name__)
+    def _write_ast(self, out, level):
+        out.write("%s%s: Not Implemented" % (self.SPACE, self.__class__.__name__))
+
+    def _children(self):
+        return ()
 
     def isSet(self):
         return self._expected_type.isSet()
@@ -82,20 +181,24 @@ class Printable(Setlan):
 
 class Instruction(Setlan):
 
+    # Whether running the instruction runs no other one, so it is run right
+    # away instead of from the stack of tasks (see Setlan.execute).
+    _simple = False
+
     def __init__(self, *args, **kwargs):
         super(Instruction, self).__init__(args, kwargs)
         self._position = kwargs.get('position', None)
 
-    def print_ast(self, level):
-        return "%s%s: Not Implemented" % (self.SPACE, self.__class__.__name__)
+    def _write_ast(self, out, level):
+        out.write("%s%s: Not Implemented" % (self.SPACE, self.__class__.__name__))
 
-    def _check(self, symtable):
-        print "%s: Check function Not Implemented" % (self.__class__.__name__)
+    def _children(self):
+        return ()
 
-    def _check_for_counter_modification(self, name, symtable):
-        print "%s: Check for counter modification Not Implemented" % (self.__class__.__name__)
+    def _check(self, symtable, diagnostics):
+        print "%s: Check function Not Implemented" % (self.__class__.__name__)
 
-    def _execute(self, symtable):
+    def _execute(self, symtable, tasks):
         print "%s: Execute function Not Implemented" % (self.__class__.__name__)
 
     def _evaluate(self, symtable):
@@ -104,21 +207,262 @@ class Instruction(Setlan):
 
 class Declaration(Setlan):
 
-    def print_ast(self, level):
-        return "%s%s: Not Implemented" % (self.SPACE, self.__class__.__name__)
+    def _write_ast(self, out, level):
+        out.write("%s%s: Not Implemented" % (self.SPACE, self.__class__.__name__))
+
+    def _children(self):
+        return ()
 
 
 class Expression(Printable):
 
+    # Number of operands (the elements of set literals are not checked, so
+    # they are not counted).
+    _arity = 0
+
+    # Evaluation steps of the expression, once it has been evaluated.
+    _steps = None
+
+    # Whether the expression is evaluated directly, once it has been evaluated.
+    _direct = None
+
+    # Value of the expression, if it is constant and the optimizer folded it.
+    _folded = None
+
+    # Whether the expression is invariant in a loop, and its value since the
+    # loop was entered, once evaluated.
+    _hoisted = False
+    _cached = None
+
     def __init__(self, *args, **kwargs):
         super(Expression, self).__init__(args, kwargs)
         self._position = kwargs.get('position', None)
-        self._expected_type = Type(position=self._position)
+        self._expected_type = UNDEFINED
+        self._static_type = UNDEFINED
+
+    def getType(self):
+        """
+        Type of the expression, as resolved by its last static check (the
+        undefined type if it has not been checked). Later phases read it here
+        instead of checking the expression again.
+        """
+        return self._static_type
+
+    def _operands(self):
+        """
+        Operands of the expression, from first to last.
+        """
+        return ()
+
+    def _children(self):
+        return self._operands()
+
+    def _program(self):
+        """
+        How the expression is evaluated: a list of operands, which leave their
+        values on the stack of values, and steps, which are called with the
+        stack and the symbol table. By default, the operands and then the step
+        of the expression.
+        """
+        return list(self._operands()) + [self._step]
+
+    def _can_fail(self):
+        """
+        Whether evaluating the expression may raise an error.
+        """
+        return self._folded is None
+
+    def fold(self, value):
+        """
+        Makes the expression evaluate to value, computed once by the optimizer,
+        instead of evaluating its operands. Sets must be given as frozensets,
+        which are shared by every evaluation.
+        """
+        self._folded = value
+        self._steps = None
+        self._direct = None
+        self._compute = self._compute_folded
+
+    def _push_folded(self, values, symtable):
+        values.append(self._folded)
+
+    def _compute_folded(self, symtable):
+        return self._folded
+
+    def hoist(self):
+        """
+        Makes the expression keep its value, once evaluated, until the loop it
+        is invariant in is entered again (see Loop.addInvariant). Errors are
+        not kept, so they are raised when and where they were.
+        """
+        self._hoisted = True
+        self._evaluate = self._evaluate_cached
+        self._compute = self._compute_cached
+
+    def _cache(self, symtable):
+        # The value is computed as the expression would be without being
+        # hoisted. Sets are kept as frozensets, as folded ones.
+        if self._direct is None:
+            self._direct = self._shallow()
+        if self._direct:
+            value = self.__class__._compute(self, symtable)
+        else:
+            value = self._run_steps(symtable)
+        if value.__class__ is set:
+            value = frozenset(value)
+        self._cached = value
+        return value
+
+    def _compute_cached(self, symtable):
+        value = self._cached
+        if value is None:
+            value = self._cache(symtable)
+        return value
+
+    def _evaluate_cached(self, symtable):
+        value = self._cached
+        if value is None:
+            value = self._cache(symtable)
+        if value.__class__ is frozenset:
+            return set(value)
+        return value
+
+    def _push_cached(self, values, symtable):
+        values.append(self._compute_cached(symtable))
+
+    def _check(self, symtable, diagnostics):
+        """
+        Checks the nodes of the expression in postorder, each one with the
+        types of its operands, recording the type of each one, and returns
+        the type of the expression.
+        """
+        arity = self._arity
+        if not arity:
+            self._static_type = self._check_type(symtable, diagnostics)
+            return self._static_type
+        if arity == 2 and not (self._left._arity or self._right._arity):
+            # Operations over leaves, the most common expressions, are checked
+            # directly.
+            type_class = self._check_type(symtable, diagnostics,
+                                          self._left._check(symtable, diagnostics),
+                                          self._right._check(symtable, diagnostics))
+            self._static_type = type_class
+            return type_class
+        # Postorder of the nodes, reversed. The operands are taken directly,
+        # as this runs for every expression.
+        nodes = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            arity = node._arity
+            if arity == 2:
+                stack.append(node._left)
+                stack.append(node._right)
+            elif arity == 1:
+                stack.append(node._expression)
+        types = []
+        for node in reversed(nodes):
+            arity = node._arity
+            if arity == 2:
+                right_type = types.pop()
+                type_class = node._check_type(symtable, diagnostics,
+                                              types[-1], right_type)
+                types[-1] = type_class
+            elif arity == 1:
+                type_class = node._check_type(symtable, diagnostics, types[-1])
+                types[-1] = type_class
+            else:
+                type_class = node._check_type(symtable, diagnostics)
+                types.append(type_class)
+            node._static_type = type_class
+        return types[-1]
+
+    def _check_type(self, symtable, diagnostics, *operand_types):
+        print "%s: Check function Not Implemented" % (self.__class__.__name__)
 
-    def _execute(self, symtable):
+    def _execute(self, symtable, tasks):
         print "%s: Execute function Not Implemented" % (self.__class__.__name__)
 
     def _evaluate(self, symtable):
+        """
+        Evaluates the expression. Expressions of at most
+        DIRECT_EVALUATION_DEPTH levels, the usual ones, are computed directly
+        by their nodes, and deeper ones run the steps of their nodes (see
+        _run_steps()). Which way is decided the first time the expression is
+        evaluated.
+        """
+        if self._direct is None:
+            self._direct = self._shallow()
+            if self._direct and not self._static_type.isSet():
+                # Integers and booleans are not copied, so the expression is
+                # just computed from then on.
+                self._evaluate = self._compute
+        if self._direct:
+            value = self._compute(symtable)
+        else:
+            value = self._run_steps(symtable)
+        # Folded sets are shared, so each evaluation gets its own copy.
+        if value.__class__ is frozenset:
+            return set(value)
+        return value
+
+    def _shallow(self):
+        """
+        Whether the expression has at most DIRECT_EVALUATION_DEPTH levels, as
+        it is evaluated: folded and loop invariant subexpressions count as
+        leaves, and flattened chains of operations as a single level.
+        """
+        stack = [(self, 1)]
+        while stack:
+            node, depth = stack.pop()
+            if depth > self.DIRECT_EVALUATION_DEPTH:
+                return False
+            if node._folded is not None or (node._hoisted and node is not self):
+                continue
+            for item in node._program():
+                if isinstance(item, Expression):
+                    stack.append((item, depth + 1))
+        return True
+
+    def _compute(self, symtable):
+        """
+        Value of the expression, computed from the ones of its operands.
+        """
+        print "%s: Evaluate function Not Implemented" % (self.__class__.__name__)
+
+    def _run_steps(self, symtable):
+        """
+        Runs the steps of the programs of the nodes of the expression on a
+        stack of values: usually, the step of each node replaces the values
+        of its operands by its own. The steps are listed the first time the
+        expression is evaluated.
+        """
+        steps = self._steps
+        if steps is None:
+            steps = []
+            stack = [self]
+            while stack:
+                item = stack.pop()
+                if isinstance(item, Expression):
+                    if item._folded is not None:
+                        steps.append(item._push_folded)
+                        continue
+                    if item._hoisted and item is not self:
+                        steps.append(item._push_cached)
+                        continue
+                    program = item._program()
+                    program.reverse()
+                    stack.extend(program)
+                else:
+                    steps.append(item)
+            self._steps = steps
+        values = []
+        for step in steps:
+            step(values, symtable)
+        return values[-1]
+
+    def _step(self, values, symtable):
         print "%s: Evaluate function Not Implemented" % (self.__class__.__name__)
 
 
@@ -126,16 +470,16 @@ class String(Printable):
 
     def __init__(self, value, *args, **kwargs):
         super(String, self).__init__(args,kwargs)
+        self._position = kwargs.get('position', None)
         self._value = value[1:len(value)-1]
 
-    def print_ast(self, level):
-        string = "%sString: %s" % (
+    def _write_ast(self, out, level):
+        out.write("%sString: %s" % (
             self._get_indentation(level),
             str(self._value)
-            )
-        return string
+            ))
 
-    def _check(self, symtable):
+    def _check(self, symtable, diagnostics):
         return True
 
     def _evaluate(self, symtable):
@@ -159,72 +503,95 @@ class Block(Instruction):
         self._declarations = declarations
         self._instructions = instructions
 
-    def print_ast(self, level):
-        string = "%sBlock Instruction:" % self._get_indentation(level)
+    def _write_ast(self, out, level):
+        out.write("%sBlock Instruction:" % self._get_indentation(level))
         if self._declarations is not None and self._declarations:
-            string += "\n%sVariable Declarations:" % self._get_indentation(level+1)
+            out.write("\n%sVariable Declarations:" % self._get_indentation(level+1))
             for declaration in self._declarations:
-                string += "%s" % declaration.print_ast(level+2)
+                yield declaration, level+2
         if self._instructions is not None and self._instructions:
-            string += "\n%sInstructions:" % self._get_indentation(level+1)
+            out.write("\n%sInstructions:" % self._get_indentation(level+1))
             for instruction in self._instructions:
-                string += "\n%s" % instruction.print_ast(level+2)
-        return string
+                out.write("\n")
+                yield instruction, level+2
+
+    def _children(self):
+        return self._instructions or ()
 
-    def _fill_symtable(self, symtable):
+    def _fill_symtable(self, symtable, diagnostics):
         new_symtable = None
         if self._declarations is not None and self._declarations:
             new_symtable = SymTable(father=symtable)
+            loops = None
+            if diagnostics is not None and symtable is not None:
+                loops = symtable.loopStates()
+            if loops:
+                reported = len(diagnostics.getErrors())
             for declaration in self._declarations:
-                declaration._check(new_symtable)
+                declaration._check(new_symtable, diagnostics)
+            if loops:
+                # Errors in declarations are reported for the body of every
+                # enclosing for loop too.
+                errors = diagnostics.getErrors()[reported:]
+                for loop, read_only in loops:
+                    loop.addLoopErrors(errors)
         else:
             new_symtable = symtable
         return new_symtable
 
-    def _check(self, symtable):
-        new_symtable = self._fill_symtable(symtable)
+    def _check(self, symtable, diagnostics):
+        new_symtable = self._fill_symtable(symtable, diagnostics)
         if self._instructions is not None and self._instructions:
             for instruction in self._instructions:
-                instruction._check(new_symtable)
+                yield instruction, new_symtable
+        if new_symtable is not symtable:
+            new_symtable.releaseLoopStates()
         if symtable is None:
-            return new_symtable
+            yield new_symtable
         else:
-            return True
+            yield True
 
-    def _check_for_counter_modification(self, name, symtable):
-        new_symtable = self._fill_symtable(symtable)
+    def _execute(self, symtable, tasks):
+        new_symtable = self._fill_symtable(symtable, None)
         if self._instructions is not None and self._instructions:
-            for instruction in self._instructions:
-                instruction._check_for_counter_modification(name, new_symtable)
-
-    def _execute(self, symtable):
-        new_symtable = self._fill_symtable(symtable)
-        if self._instructions is not None and self._instructions:
-            for instruction in self._instructions:
-                instruction._execute(new_symtable)
+            # The simple instructions before the first one that runs others are
+            # run right away.
+            instructions = self._instructions
+            first = 0
+            while first < len(instructions) and instructions[first]._simple:
+                instructions[first]._execute(new_symtable, tasks)
+                first += 1
+            for index in xrange(len(instructions) - 1, first - 1, -1):
+                tasks.append((instructions[index]._execute, new_symtable))
 
 
 class Assignment(Instruction):
 
+    _simple = True
+
     def __init__(self, variable, value, *args, **kwargs):
         super(Assignment , self).__init__(args,kwargs)
         self._position = kwargs.get('position', None)
         self._variable = variable
         self._value    = value
 
-    def print_ast(self, level):
-        string = "%sAssignment Instruction:\n%sVariable:\n%s\n%sValue:\n%s" % (
+    def _write_ast(self, out, level):
+        out.write("%sAssignment Instruction:\n%sVariable:\n" % (
             self._get_indentation(level),
-            self._get_indentation(level+1),
-            self._variable.print_ast(level+2),
-            self._get_indentation(level+1),
-            self._value.print_ast(level+2)
-            )
-        return string
-
-    def _check(self, symtable):
-        var_info = symtable.lookup(self._variable.getName(), self._position)
-        val_type_class = self._value._check(symtable)
+            self._get_indentation(level+1)
+            ))
+        yield self._variable, level+2
+        out.write("\n%sValue:\n" % self._get_indentation(level+1))
+        yield self._value, level+2
+
+    def _children(self):
+        return (self._variable, self._value)
+
+    def _check(self, symtable, diagnostics):
+        var_info = symtable.lookup(self._variable.getName(), self._position,
+                                   diagnostics)
+        val_type_class = self._value._check(symtable, diagnostics)
+        self._variable._check_modification(symtable)
         if var_info is None:
             return True
         if not var_info.canAssign(val_type_class):
@@ -233,47 +600,43 @@ class Assignment(Instruction):
                 val_type_class,
                 var_info.getType()
                 )
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanTypeError(error))
+            diagnostics.add_error(SetlanTypeError(error))
         return True
 
-    def _check_for_counter_modification(self, name, symtable):
-        self._variable._check_for_counter_modification(name, symtable)
-
-
-    def _execute(self, symtable):
+    def _execute(self, symtable, tasks):
         value = self._value._evaluate(symtable)
-        symtable.update(self._variable.getName(), value, self._position)
+        symtable.update(self._variable.getName(), value, self._position,
+                        checked=self._checked)
 
 
 class Input(Instruction):
 
+    _simple = True
+
     def __init__(self, variable, *args, **kwargs):
         super(Input, self).__init__(args,kwargs)
         self._position = kwargs.get('position', None)
         self._variable = variable
 
-    def print_ast(self, level):
-        string = "%sScan Instruction:\n%s" % (
-            self._get_indentation(level),
-            self._variable.print_ast(level+1)
-            )
-        return string
+    def _write_ast(self, out, level):
+        out.write("%sScan Instruction:\n" % self._get_indentation(level))
+        yield self._variable, level+1
+
+    def _children(self):
+        return (self._variable,)
 
-    def _check(self, symtable):
-        type_class = self._variable._check(symtable)
+    def _check(self, symtable, diagnostics):
+        type_class = self._variable._check(symtable, diagnostics)
         if not (type_class.isBool() or type_class.isInt()):
             error  = "In line %d, column %d, " % self._position
             error += "cannot read from standard input to a %s " % type_class
             error += "variable."
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanTypeError(error))
+            diagnostics.add_error(SetlanTypeError(error))
+        if symtable is not None:
+            self._variable._check_modification(symtable)
         return True
 
-    def _check_for_counter_modification(self, name, symtable):
-        self._variable._check_for_counter_modification(name, symtable)
-
-    def _execute(self, symtable):
+    def _execute(self, symtable, tasks):
         var = self._variable.getName()
         var_info = symtable.lookup(var, self._position)
         if var_info.isInt():
@@ -297,6 +660,8 @@ class Input(Instruction):
     
 class Output(Instruction):
 
+    _simple = True
+
     def __init__(self, printables, *args, **kwargs):
         super(Output, self).__init__(args,kwargs)
         self._position = kwargs.get('position', None)
@@ -308,28 +673,26 @@ class Output(Instruction):
             self._op_name = 'PrintLn'
             self._printables.append(String('"\n"', position=kwargs.get('position', None)))
 
-    def print_ast(self, level):
-        string = "%s%s Instruction:\n%sExpressions:" % (
+    def _write_ast(self, out, level):
+        out.write("%s%s Instruction:\n%sExpressions:" % (
             self._get_indentation(level),
             self._op_name,
             self._get_indentation(level+1)
-            )
+            ))
         for printable in self._printables:
-            string += "\n%s" % (
-                printable.print_ast(level+2)
-                )
-        return string
+            out.write("\n")
+            yield printable, level+2
+
+    def _children(self):
+        return self._printables or ()
 
-    def _check(self, symtable):
+    def _check(self, symtable, diagnostics):
         if self._printables is not None and self._printables:
             for printable in self._printables:
-                printable._check(symtable)
+                printable._check(symtable, diagnostics)
         return True
 
-    def _check_for_counter_modification(self, name, symtable):
-        pass
-
-    def _execute(self, symtable):
+    def _execute(self, symtable, tasks):
         if self._printables is not None and self._printables:
             string = ''
             for printable in self._printables:
@@ -362,47 +725,67 @@ class Conditional(Instruction):
         self._instruction = instruction
         self._alt_instruction = alt_instruction
 
-    def print_ast(self, level):
-        string = "%sConditional Instruction:\n" % self._get_indentation(level)
-        string += "%sCondition:\n" % self._get_indentation(level+1)
-        string += "%s\n" % self._condition.print_ast(level+2)
-        string += "%sInstruction:\n" % self._get_indentation(level+1)
-        string += "%s" % self._instruction.print_ast(level+2)
+    def _write_ast(self, out, level):
+        out.write("%sConditional Instruction:\n" % self._get_indentation(level))
+        out.write("%sCondition:\n" % self._get_indentation(level+1))
+        yield self._condition, level+2
+        out.write("\n%sInstruction:\n" % self._get_indentation(level+1))
+        yield self._instruction, level+2
         if self._alt_instruction is not None:
-            string += "\n%sAlternative Instruction:\n" % self._get_indentation(level+1)
-            string += "%s" % self._alt_instruction.print_ast(level+2)
-        return string
+            out.write("\n%sAlternative Instruction:\n" % self._get_indentation(level+1))
+            yield self._alt_instruction, level+2
+
+    def _children(self):
+        if self._alt_instruction is None:
+            return (self._condition, self._instruction)
+        return (self._condition, self._instruction, self._alt_instruction)
 
-    def _check(self, symtable):
-        condition_type = self._condition._check(symtable)
-        instruction_check = self._instruction._check(symtable)
+    def _check(self, symtable, diagnostics):
+        condition_type = self._condition._check(symtable, diagnostics)
+        instruction_check = yield self._instruction, symtable
         if self._alt_instruction is not None:
-            alt_instruction_check = self._alt_instruction._check(symtable)
+            alt_instruction_check = yield self._alt_instruction, symtable
         else:
             alt_instruction_check = True
         if not condition_type.isBool():
             error  = "In line %d, column %d, " % self._condition._position
             error += "conditional statement expression must be Boolean. "
             error += "Found '%s' instead." % condition_type
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanTypeError(error))
-        return instruction_check and alt_instruction_check
+            diagnostics.add_error(SetlanTypeError(error))
+        yield instruction_check and alt_instruction_check
 
-    def _check_for_counter_modification(self, name, symtable):
-        if self._instruction is not None:
-            self._instruction._check_for_counter_modification(name, symtable)
-        if self._alt_instruction is not None:
-            self._alt_instruction._check_for_counter_modification(name, symtable)
-
-    def _execute(self, symtable):
+    def _execute(self, symtable, tasks):
         if self._condition._evaluate(symtable):
-            self._instruction._execute(symtable)
+            instruction = self._instruction
         else:
-            if self._alt_instruction is not None:
-                self._alt_instruction._execute(symtable)
+            instruction = self._alt_instruction
+            if instruction is None:
+                return
+        if instruction._simple:
+            instruction._execute(symtable, tasks)
+        else:
+            tasks.append((instruction._execute, symtable))
+
+
+class Loop(Instruction):
 
+    # Expressions of the loop that are invariant in it.
+    _invariants = ()
 
-class ForLoop(Instruction):
+    def addInvariant(self, expression):
+        """
+        Makes expression, whose variables are not modified in the loop, be
+        evaluated at most once each time the loop is entered.
+        """
+        expression.hoist()
+        self._invariants = self._invariants + (expression,)
+
+    def _enter(self):
+        for expression in self._invariants:
+            expression._cached = None
+
+
+class ForLoop(Loop):
 
     def __init__(self, variable, ordering, set_exp, instruction, *args, **kwargs):
         super(ForLoop, self).__init__(args,kwargs)
@@ -412,68 +795,78 @@ class ForLoop(Instruction):
         self._set         = set_exp
         self._instruction = instruction
 
-    def print_ast(self, level):
-        string = "%sFor Loop Instruction:\n" % self._get_indentation(level)
-        string += "%sVariable:\n" % self._get_indentation(level+1)
-        string += "%s\n" % self._variable.print_ast(level+2)
-        string += "%sOrdering: " % self._get_indentation(level+1)
+    def _write_ast(self, out, level):
+        out.write("%sFor Loop Instruction:\n" % self._get_indentation(level))
+        out.write("%sVariable:\n" % self._get_indentation(level+1))
+        yield self._variable, level+2
+        out.write("\n%sOrdering: " % self._get_indentation(level+1))
         if self._ordering:
-            string += "Ascendent"
+            out.write("Ascendent")
         else :
-            string += "Descendent"
-        string += "\n%sIterable Set:\n" % self._get_indentation(level+1)
-        string += "%s\n" % self._set.print_ast(level+2)
-        string += "%sInstruction:\n" % self._get_indentation(level+1)
-        string += "%s" % self._instruction.print_ast(level+2)
-        return string
-
-    def _update_symtable(self, symtable):
+            out.write("Descendent")
+        out.write("\n%sIterable Set:\n" % self._get_indentation(level+1))
+        yield self._set, level+2
+        out.write("\n%sInstruction:\n" % self._get_indentation(level+1))
+        yield self._instruction, level+2
+
+    def _children(self):
+        if self._instruction is None:
+            return (self._variable, self._set)
+        return (self._variable, self._set, self._instruction)
+
+    def _update_symtable(self, symtable, diagnostics):
         new_symtable = SymTable(father=symtable)
         new_symtable.insert(
             self._variable.getName(),
-            IntegerType(position=self._position),
+            INTEGER,
             self._variable._position,
-            read_only=True
+            read_only=True,
+            diagnostics=diagnostics
             )
         return new_symtable
 
-    def _check(self, symtable):
-        # TODO: report error if internal variable is modified in for-loop's body
-        new_symtable = self._update_symtable(symtable)
-        set_type = self._set._check(symtable)
+    def _check(self, symtable, diagnostics):
+        new_symtable = self._update_symtable(symtable, diagnostics)
+        # The modifications of the counter are looked for while the body is
+        # checked, and reported after the errors of the body.
+        new_symtable.openLoop(self._variable.getName())
+        set_type = self._set._check(symtable, diagnostics)
         if not set_type.isSet():
             error  = "In line %d, column %d, " % self._set._position
             error += "For loop expression must be of Set type. "
             error += "Found %s instead." % set_type
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanTypeError(error))
+            diagnostics.add_error(SetlanTypeError(error))
         if self._instruction is not None:
-            self._instruction._check(new_symtable)
-            self._instruction._check_for_counter_modification(self._variable.getName(), new_symtable)
+            yield self._instruction, new_symtable
+        for error in new_symtable.closeLoop():
+            diagnostics.add_error(error)
         if symtable is None:
-            return new_symtable
+            yield new_symtable
         else:
-            return True
-
-    def _check_for_counter_modification(self, name, symtable):
-        new_symtable = self._update_symtable(symtable)
-        if self._instruction is not None:
-            self._instruction._check_for_counter_modification(name, new_symtable)
+            yield True
 
-    def _execute(self, symtable):
+    def _execute(self, symtable, tasks):
+        self._enter()
         iterable = list(self._set._evaluate(symtable))
         iterable.sort()
         if not self._ordering:
             iterable.reverse()
-        new_symtable = self._update_symtable(symtable)
-        for i in iterable:
-            var = self._variable.getName()
-            new_symtable.update(var, i, self._position)
-            self._instruction._execute(new_symtable)
+        new_symtable = self._update_symtable(symtable, None)
+        self._next((iter(iterable), new_symtable), tasks)
 
+    def _next(self, state, tasks):
+        # Runs the body with the next element of the set, and then comes back.
+        iterator, symtable = state
+        for i in iterator:
+            symtable.update(self._variable.getName(), i, self._position,
+                            checked=self._checked)
+            tasks.append((self._next, state))
+            tasks.append((self._instruction._execute, symtable))
+            return
 
 
-class RepeatWhileLoop(Instruction):
+
+class RepeatWhileLoop(Loop):
 
     def __init__(self, prev_instruction, condition, instruction, *args, **kwargs):
         super(RepeatWhileLoop, self).__init__(args,kwargs)
@@ -482,73 +875,62 @@ class RepeatWhileLoop(Instruction):
         self._condition        = condition
         self._instruction      = instruction
 
-    def print_ast(self, level):
-        string = "%sRepeate While Loop Instruction:\n" % self._get_indentation(level)
+    def _write_ast(self, out, level):
+        out.write("%sRepeate While Loop Instruction:\n" % self._get_indentation(level))
         if self._prev_instruction is not None:
-            string += "%sPrevious Instruction:\n" % self._get_indentation(level+1)
-            string += "%s\n" % self._prev_instruction.print_ast(level+2)
-        string += "%sCondition:\n" % self._get_indentation(level+1)
-        string += "%s" % self._condition.print_ast(level+2)
+            out.write("%sPrevious Instruction:\n" % self._get_indentation(level+1))
+            yield self._prev_instruction, level+2
+            out.write("\n")
+        out.write("%sCondition:\n" % self._get_indentation(level+1))
+        yield self._condition, level+2
         if self._instruction is not None:
-            string += "\n%sInstruction:\n" % self._get_indentation(level+1)
-            string += "%s" % self._instruction.print_ast(level+2)
-        return string
+            out.write("\n%sInstruction:\n" % self._get_indentation(level+1))
+            yield self._instruction, level+2
 
-    def _check(self, symtable):
+    def _children(self):
+        return [child for child in (self._prev_instruction, self._condition,
+                                    self._instruction)
+                if child is not None]
+
+    def _check(self, symtable, diagnostics):
         if self._prev_instruction is None and self._instruction is None:
             error  = "In line %d, column %d, " % self._position
             error += "Repeat-While-Loop must have at least one instruction."
-            raise SetlanSyntaxError(error)
+            raise SetlanSyntaxError(error, position=self._position)
         if self._prev_instruction is not None:
-            prev_inst_check = self._prev_instruction._check(symtable)
+            prev_inst_check = yield self._prev_instruction, symtable
         else:
             prev_inst_check = True
         if self._instruction is not None:
-            instruction_check = self._instruction._check(symtable)
+            instruction_check = yield self._instruction, symtable
         else:
             instruction_check = True
-        condition_type = self._condition._check(symtable)
+        condition_type = self._condition._check(symtable, diagnostics)
         if not condition_type.isBool():
             error  = "In line %d, column %d, " % self._condition._position
             error += "conditional expression of the repeat-while-do loop "
             error += "statement must be Boolean. "
             error += "Found '%s' instead." % condition_type
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanTypeError(error))
-        return prev_inst_check and instruction_check
+            diagnostics.add_error(SetlanTypeError(error))
+        yield prev_inst_check and instruction_check
 
-    def _check_for_counter_modification(self, name, symtable):
+    def _execute(self, symtable, tasks):
+        self._enter()
         if self._prev_instruction is not None:
-            self._prev_instruction._check_for_counter_modification(name, symtable)
-        if self._instruction is not None:
-            self._instruction._check_for_counter_modification(name, symtable)
-
-    def _first_case(self, symtable):
-        not_done = True
-        while not_done:
-            self._prev_instruction._execute(symtable)
-            not_done = self._condition._evaluate(symtable)
-            if not not_done:
-                break
-            else:
-                self._instruction._execute(symtable)
-
-    def _second_case(self, symtable):
-        while self._condition._evaluate(symtable):
-            self._instruction._execute(symtable)
-
-    def _third_case(self, symtable):
-        self._prev_instruction._execute(symtable)
-        while self._condition._evaluate(symtable):
-            self._prev_instruction._execute(symtable)
+            tasks.append((self._test, symtable))
+            tasks.append((self._prev_instruction._execute, symtable))
+        else:
+            self._test(symtable, tasks)
 
-    def _execute(self, symtable):
-        if self._prev_instruction is not None and self._instruction is not None:
-            self._first_case(symtable)
-        elif self._prev_instruction is None and self._instruction is not None:
-            self._second_case(symtable)
-        if self._prev_instruction is not None and self._instruction is None:
-            self._third_case(symtable)
+    def _test(self, symtable, tasks):
+        # While the condition holds, runs the instruction and the previous
+        # one, and then comes back.
+        if self._condition._evaluate(symtable):
+            tasks.append((self._test, symtable))
+            if self._prev_instruction is not None:
+                tasks.append((self._prev_instruction._execute, symtable))
+            if self._instruction is not None:
+                tasks.append((self._instruction._execute, symtable))
 
 
 
@@ -560,23 +942,27 @@ class VariableDeclaration(Declaration):
         self._type      = type_class
         self._variables = variables
 
-    def print_ast(self, level):
-        string = "\n%sVariable Declaration:\n" % self._get_indentation(level+1)
-        string += "%sType:\n" % self._get_indentation(level+2)
-        string += "%s" % self._type.print_ast(level+3)
-        string += "%sVariables:" % self._get_indentation(level+2)
+    def _elision(self, level):
+        return "\n%s..." % self._get_indentation(level+1)
+
+    def _write_ast(self, out, level):
+        out.write("\n%sVariable Declaration:\n" % self._get_indentation(level+1))
+        out.write("%sType:\n" % self._get_indentation(level+2))
+        out.write(self._type.print_ast(level+3))
+        out.write("%sVariables:" % self._get_indentation(level+2))
         for variable in self._variables:
-            string += "\n%s" % variable.print_ast(level+3)
-        return string
+            out.write("\n")
+            yield variable, level+3
 
-    def _check(self, symtable):
+    def _check(self, symtable, diagnostics):
         if self._variables is not None and self._variables:
             for variable in self._variables:
-                symtable.insert(variable.getName(), self._type, variable._position)
+                symtable.insert(variable.getName(), self._type, variable._position,
+                                diagnostics=diagnostics)
         else:
             error  = "In line %d, column %d, " % self._position
             error += "there must be at least one variable declared."
-            raise SetlanSyntaxError(error)
+            raise SetlanSyntaxError(error, position=self._position)
         return True
 
 
@@ -587,39 +973,49 @@ class Variable(Expression):
         self._position = kwargs.get('position', None)
         self._id = tkid
 
-    def print_ast(self, level):
-        string = "%sVariable: %s" % (self._get_indentation(level), self._id)
-        return string
+    def _write_ast(self, out, level):
+        out.write("%sVariable: %s" % (self._get_indentation(level), self._id))
 
     def getName(self):
         return self._id
 
-    def _check(self, symtable):
+    def _check_type(self, symtable, diagnostics):
         var_info = None
         if symtable is not None:
-            var_info = symtable.lookup(self.getName(),self._position)
+            var_info = symtable.lookup(self.getName(), self._position,
+                                       diagnostics)
         if var_info is not None:
             return var_info.getType()
         else:
             error  = "In line %d, column %d, " % self._position
             error += "trying to use variable '%s', " % self._id
             error += "but it has not been defined in current scope."
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanScopeError(error))
-            return Type(position=self._position)
+            diagnostics.add_error(SetlanScopeError(error))
+            return UNDEFINED
+
+    def _check_modification(self, symtable):
+        """
+        Reports the modification of this variable to the for loops being
+        checked around it, if their counter is read only in symtable.
+        """
+        for loop, read_only in symtable.loopStates():
+            if read_only:
+                error  = "In line %d, column %d, " % self._position
+                error += "trying to modify variable '%s', " % self._id
+                error += "but it is a read only variable in this scope."
+                loop.addLoopErrors([SetlanScopeError(error)])
+
+    def _can_fail(self):
+        return False
 
-    def _check_for_counter_modification(self, name, symtable):
-        var_info = symtable.lookup(name, self._position)
-        if var_info.isReadOnly():
-            error  = "In line %d, column %d, " % self._position
-            error += "trying to modify variable '%s', " % self._id
-            error += "but it is a read only variable in this scope."
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanScopeError(error))
+    def _evaluate(self, symtable):
+        return symtable.lookup(self._id, self._position).getValue()
 
+    def _compute(self, symtable):
+        return symtable.lookup(self._id, self._position).getValue()
 
-    def _evaluate(self, symtable):
-        return symtable.lookup(self.getName(), self._position).getValue()
+    def _step(self, values, symtable):
+        values.append(symtable.lookup(self._id, self._position).getValue())
 
 
 class BinaryExpression(Expression):
@@ -632,33 +1028,47 @@ class BinaryExpression(Expression):
         self._right = right
         self._operation = ""
 
-    def print_ast(self, level):
-        string = "%s%s:\n%sLeft Operand:\n%s\n%sRight Operand:\n%s" % (
+    def _write_ast(self, out, level):
+        out.write("%s%s:\n%sLeft Operand:\n" % (
             self._get_indentation(level),
             self._operation,
-            self._get_indentation(level+1),
-            self._left.print_ast(level+2),
-            self._get_indentation(level+1),
-            self._right.print_ast(level+2)
-            )
-        return string
+            self._get_indentation(level+1)
+            ))
+        yield self._left, level+2
+        out.write("\n%sRight Operand:\n" % self._get_indentation(level+1))
+        yield self._right, level+2
+
+    _arity = 2
+
+    def _operands(self):
+        return (self._left, self._right)
 
-    def _check(self, symtable):
+    def _check_type(self, symtable, diagnostics, left_type, right_type):
         return "%s%s: Not Implemented" % (self.SPACE, self.__class__.__name__)
 
-    def _evaluate(self, symtable):
-        return self._op(self._left._evaluate(symtable), self._right._evaluate(symtable))
+    def _compute(self, symtable):
+        return self._op(self._left._compute(symtable),
+                        self._right._compute(symtable))
+
+    def _step(self, values, symtable):
+        right = values.pop()
+        values[-1] = self._op(values[-1], right)
 
 
 class SameTypeBinaryExpression(BinaryExpression):
 
+    # Whether chains of the operation can be flattened (see flatten()).
+    _associative = False
+
+    # Operands of the flattened chain of operations ending in this one, and
+    # the positions of those operations.
+    _chain = None
+
     def __init__(self, left, op, right, *args, **kwargs):
         super(SameTypeBinaryExpression, self).__init__(left,op,right,args,kwargs)
         self._position = kwargs.get('position', None)
     
-    def _check(self, symtable):
-        left_type = self._left._check(symtable)
-        right_type = self._right._check(symtable)
+    def _check_type(self, symtable, diagnostics, left_type, right_type):
         if ((not isinstance(left_type, self._expected_type.__class__)) or
             left_type != right_type):
             error  = "In line %d, column %d, " % self._position
@@ -667,11 +1077,93 @@ class SameTypeBinaryExpression(BinaryExpression):
                 left_type,
                 right_type
                 )
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanTypeError(error))
+            diagnostics.add_error(SetlanTypeError(error))
             return self._expected_type
         return left_type
 
+    def flatten(self):
+        """
+        Makes the chain of operations of the same associative class ending in
+        this one (as the sums of a + b + c + d, parsed as ((a + b) + c) + d)
+        be evaluated in one step over all of its operands, and returns them.
+        The tree is left as it is, so it is dumped the same.
+        """
+        if (not self._associative or self._left.__class__ is not self.__class__
+            or self._left._folded is not None or self._left._hoisted):
+            return self._operands()
+        operands = []
+        positions = []
+        checked = False
+        node = self
+        while True:
+            operands.append(node._right)
+            positions.append(node._position)
+            checked = checked or node._checked
+            node = node._left
+            if (node.__class__ is not self.__class__
+                or node._folded is not None or node._hoisted):
+                break
+        operands.append(node)
+        operands.reverse()
+        positions.reverse()
+        self._chain = (operands, positions, checked)
+        return operands
+
+    def _program(self):
+        if self._chain is None:
+            return super(SameTypeBinaryExpression, self)._program()
+        operands = self._chain[0]
+        if self._expected_type is not INTEGER or not self._chain[2]:
+            return operands + [self._combine]
+        # Integer operations check overflow after each operand, as they did in
+        # the chain, so the operands are added to the total before evaluating
+        # one that could fail. Chains only run these steps when their operands
+        # are too deep to be computed directly (see _compute()).
+        program = [operands[0]]
+        first = 1
+        for index in xrange(1, len(operands)):
+            program.append(operands[index])
+            if index + 1 == len(operands) or operands[index + 1]._can_fail():
+                program.append(partial(self._accumulate, first, index + 1))
+                first = index + 1
+        return program
+
+    def _compute(self, symtable):
+        if self._chain is None:
+            return self._op(self._left._compute(symtable),
+                            self._right._compute(symtable))
+        operands, positions, checked = self._chain
+        if self._expected_type is not INTEGER or not checked:
+            return self._op_all([operand._compute(symtable)
+                                 for operand in operands])
+        # Each operand is evaluated once the total before it was checked.
+        operator = self._operator
+        total = operands[0]._compute(symtable)
+        for index in xrange(1, len(operands)):
+            total = operator(total, operands[index]._compute(symtable))
+            if not -2147483648 <= total <= 2147483647:
+                self.checkOverflow(total, positions[index - 1])
+        return total
+
+    def _combine(self, values, symtable):
+        count = len(self._chain[0])
+        operands = values[-count:]
+        del values[-count:]
+        values.append(self._op_all(operands))
+
+    def _accumulate(self, first, end, values, symtable):
+        # Operands first to end - 1 of the chain, over the total so far.
+        operands = values[first - end:]
+        del values[first - end:]
+        total = values[-1]
+        operator = self._operator
+        positions = self._chain[1]
+        for index in xrange(end - first):
+            total = operator(total, operands[index])
+            if not -2147483648 <= total <= 2147483647:
+                self.checkOverflow(total, positions[first + index - 1])
+        values[-1] = total
+
 
 class ComparationBinaryExpression(BinaryExpression):
 
@@ -679,9 +1171,7 @@ class ComparationBinaryExpression(BinaryExpression):
         super(ComparationBinaryExpression, self).__init__(left,op,right,args,kwargs)
         self._position = kwargs.get('position', None)
     
-    def _check(self, symtable):
-        left_type = self._left._check(symtable)
-        right_type = self._right._check(symtable)
+    def _check_type(self, symtable, diagnostics, left_type, right_type):
         if left_type != right_type:
             error  = "In line %d, column %d, " % self._position
             error += "cannot apply '%s' operation over %s and %s expressions." % (
@@ -689,9 +1179,8 @@ class ComparationBinaryExpression(BinaryExpression):
                 left_type,
                 right_type
                 )
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanTypeError(error)) 
-        return BooleanType(position=self._position)
+            diagnostics.add_error(SetlanTypeError(error)) 
+        return BOOLEAN
 
 
 class IntSetSetExpression(BinaryExpression):
@@ -700,9 +1189,7 @@ class IntSetSetExpression(BinaryExpression):
         super(IntSetSetExpression, self).__init__(left,op,right,args,kwargs)
         self._position = kwargs.get('position', None)
     
-    def _check(self, symtable):
-        left_type = self._left._check(symtable)
-        right_type = self._right._check(symtable)
+    def _check_type(self, symtable, diagnostics, left_type, right_type):
         if ((not isinstance(left_type, IntegerType)) or
            (not isinstance(right_type, SetType))):
             error  = "In line %d, column %d, " % self._position
@@ -712,8 +1199,7 @@ class IntSetSetExpression(BinaryExpression):
                 right_type
                 )
             error += "Expected: Integer and Set, in this order."
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanTypeError(error))
+            diagnostics.add_error(SetlanTypeError(error))
             return self._expected_type
         return right_type
 
@@ -724,9 +1210,7 @@ class IntSetBooleanExpression(BinaryExpression):
         super(IntSetBooleanExpression, self).__init__(left,op,right,args,kwargs)
         self._position = kwargs.get('position', None)
     
-    def _check(self, symtable):
-        left_type = self._left._check(symtable)
-        right_type = self._right._check(symtable)
+    def _check_type(self, symtable, diagnostics, left_type, right_type):
         if ((not isinstance(left_type, IntegerType)) or
            (not isinstance(right_type, SetType))):
             error  = "In line %d, column %d, " % self._position
@@ -736,10 +1220,9 @@ class IntSetBooleanExpression(BinaryExpression):
                 right_type
                 )
             error += "Expected: Integer and Set, in this order."
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanTypeError(error))
+            diagnostics.add_error(SetlanTypeError(error))
             return self._expected_type
-        return BooleanType(position=self._position)
+        return BOOLEAN
 
 
 class UnaryExpression(Expression):
@@ -752,17 +1235,24 @@ class UnaryExpression(Expression):
         self._function = op
         self._operation = ""
 
-    def print_ast(self, level):
-        string = "%s%s:\n%sOperand:\n%s" % (
+    def _write_ast(self, out, level):
+        out.write("%s%s:\n%sOperand:\n" % (
             self._get_indentation(level),
             self._operation,
-            self._get_indentation(level+1),
-            self._expression.print_ast(level+2)
-            )
-        return string
+            self._get_indentation(level+1)
+            ))
+        yield self._expression, level+2
 
-    def _evaluate(self, symtable):
-        return self._op(self._expression._evaluate(symtable))
+    _arity = 1
+
+    def _operands(self):
+        return (self._expression,)
+
+    def _compute(self, symtable):
+        return self._op(self._expression._compute(symtable))
+
+    def _step(self, values, symtable):
+        values[-1] = self._op(values[-1])
 
 
 class IntUnaryExpression(UnaryExpression):
@@ -770,10 +1260,9 @@ class IntUnaryExpression(UnaryExpression):
     def __init__(self, op, expression, *args, **kwargs):
         super(IntUnaryExpression, self).__init__(op,expression,args,kwargs)
         self._position = kwargs.get('position', None)
-        self._expected_type = IntegerType(position=self._position)
+        self._expected_type = INTEGER
     
-    def _check(self, symtable):
-        type_class = self._expression._check(symtable)
+    def _check_type(self, symtable, diagnostics, type_class):
         if not isinstance(type_class, IntegerType):
             error  = "In line %d, column %d, " % self._position
             error += "cannot apply '%s' operation over %s expression. " % (
@@ -781,24 +1270,19 @@ class IntUnaryExpression(UnaryExpression):
                 type_class
                 )
             error += "Expected: Integer."
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanTypeError(error))
+            diagnostics.add_error(SetlanTypeError(error))
             return self._expected_type
         return type_class
 
-    def _evaluate(self, symtable):
-        return self.checkOverflow(self._op(self._expression._evaluate(symtable)), self._position)
-
 
 class SetUnaryExpression(UnaryExpression):
 
     def __init__(self, op, expression, *args, **kwargs):
         super(SetUnaryExpression, self).__init__(op,expression,args,kwargs)
         self._position = kwargs.get('position', None)
-        self._expected_type = SetType(position=self._position)
+        self._expected_type = SET
     
-    def _check(self, symtable):
-        type_class = self._expression._check(symtable)
+    def _check_type(self, symtable, diagnostics, type_class):
         if not isinstance(type_class, SetType):
             error  = "In line %d, column %d, " % self._position
             error += "cannot apply '%s' operation over %s expression. " % (
@@ -806,8 +1290,7 @@ class SetUnaryExpression(UnaryExpression):
                 type_class
                 )
             error += "Expected: Set."
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanTypeError(error))
+            diagnostics.add_error(SetlanTypeError(error))
             return self._expected_type
         return type_class
 
@@ -817,10 +1300,9 @@ class BoolUnaryExpression(UnaryExpression):
     def __init__(self, op, expression, *args, **kwargs):
         super(BoolUnaryExpression, self).__init__(op,expression,args,kwargs)
         self._position = kwargs.get('position', None)
-        self._expected_type = BooleanType(position=self._position)
+        self._expected_type = BOOLEAN
     
-    def _check(self, symtable):
-        type_class = self._expression._check(symtable)
+    def _check_type(self, symtable, diagnostics, type_class):
         if not isinstance(type_class, BooleanType):
             error  = "In line %d, column %d, " % self._position
             error += "cannot apply '%s' operation over %s expression. " % (
@@ -828,8 +1310,7 @@ class BoolUnaryExpression(UnaryExpression):
                 type_class
                 )
             error += "Expected: Boolean."
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanTypeError(error))
+            diagnostics.add_error(SetlanTypeError(error))
             return self._expected_type
         return type_class
 
@@ -841,12 +1322,19 @@ class Sum(SameTypeBinaryExpression):
         self._position = kwargs.get('position', None)
         self._operation = "Sum"
         self._symbol = '+'
-        self._expected_type = IntegerType(position=self._position)
+        self._expected_type = INTEGER
         self._op = self._sum
 
+    _associative = True
+    _operator = add
+    _unchecked_op = add
+
     def _sum(self, left, right):
         return self.checkOverflow(left + right, self._position)
 
+    def _op_all(self, operands):
+        return sum(operands)
+
 
 class Subtraction(SameTypeBinaryExpression):
 
@@ -855,9 +1343,11 @@ class Subtraction(SameTypeBinaryExpression):
         self._position = kwargs.get('position', None)
         self._operation = "Subtraction"
         self._symbol = '-'
-        self._expected_type = IntegerType(position=self._position)
+        self._expected_type = INTEGER
         self._op = self._subtraction
 
+    _unchecked_op = sub
+
     def _subtraction(self, left, right):
         return self.checkOverflow(left - right, self._position)
 
@@ -869,12 +1359,19 @@ class Times(SameTypeBinaryExpression):
         self._position = kwargs.get('position', None)
         self._operation = "Times"
         self._symbol = '*'
-        self._expected_type = IntegerType(position=self._position)
+        self._expected_type = INTEGER
         self._op = self._times
 
+    _associative = True
+    _operator = mul
+    _unchecked_op = mul
+
     def _times(self, left, right):
         return self.checkOverflow(left * right, self._position)
 
+    def _op_all(self, operands):
+        return reduce(mul, operands)
+
 
 class Division(SameTypeBinaryExpression):
 
@@ -883,15 +1380,20 @@ class Division(SameTypeBinaryExpression):
         self._position = kwargs.get('position', None)
         self._operation = "Division"
         self._symbol = '/'
-        self._expected_type = IntegerType(position=self._position)
+        self._expected_type = INTEGER
         self._op = self._division
 
     def _division(self, left, right):
+        return self.checkOverflow(self._divide(left, right), self._position)
+
+    def _divide(self, left, right):
         if right == 0:
             error  = "In line %d, column %d, " % self._position
             error += "cannot divide by zero value."
             raise SetlanZeroDivisionError(error)
-        return self.checkOverflow(left / right, self._position)
+        return left / right
+
+    _unchecked_op = _divide
 
 
 class Modulus(SameTypeBinaryExpression):
@@ -901,15 +1403,20 @@ class Modulus(SameTypeBinaryExpression):
         self._position = kwargs.get('position', None)
         self._operation = "Modulus"
         self._symbol = '%'
-        self._expected_type = IntegerType(position=self._position)
+        self._expected_type = INTEGER
         self._op = self._modulus
 
     def _modulus(self, left, right):
+        return self.checkOverflow(self._remainder(left, right), self._position)
+
+    def _remainder(self, left, right):
         if right == 0:
             error  = "In line %d, column %d, " % self._position
             error += "cannot calculate modulus by zero value."
             raise SetlanZeroDivisionError(error)
-        return self.checkOverflow(left % right, self._position)
+        return left % right
+
+    _unchecked_op = _remainder
 
 
 class Union(SameTypeBinaryExpression):
@@ -919,12 +1426,17 @@ class Union(SameTypeBinaryExpression):
         self._position = kwargs.get('position', None)
         self._operation = "Union"
         self._symbol = '++'
-        self._expected_type = SetType(position=self._position)
+        self._expected_type = SET
         self._op = self._union
 
+    _associative = True
+
     def _union(self, left, right):
         return left.union(right)
 
+    def _op_all(self, operands):
+        return operands[0].union(*operands[1:])
+
 
 class Difference(SameTypeBinaryExpression):
 
@@ -933,7 +1445,7 @@ class Difference(SameTypeBinaryExpression):
         self._position = kwargs.get('position', None)
         self._operation = "Difference"
         self._symbol = '\\'
-        self._expected_type = SetType(position=self._position)
+        self._expected_type = SET
         self._op = self._difference
 
     def _difference(self, left, right):
@@ -947,12 +1459,17 @@ class Intersection(SameTypeBinaryExpression):
         self._position = kwargs.get('position', None)
         self._operation = "Intersection"
         self._symbol = '><'
-        self._expected_type = SetType(position=self._position)
+        self._expected_type = SET
         self._op = self._intersection
 
+    _associative = True
+
     def _intersection(self, left, right):
         return left.intersection(right)
 
+    def _op_all(self, operands):
+        return operands[0].intersection(*operands[1:])
+
 
 class SetSum(IntSetSetExpression):
 
@@ -966,6 +1483,11 @@ class SetSum(IntSetSetExpression):
     def _setsum(self, integer, setval):
         return set(map(lambda e: self.checkOverflow(integer + e, self._position), setval))
 
+    def _setsum_unchecked(self, integer, setval):
+        return set([integer + e for e in setval])
+
+    _unchecked_op = _setsum_unchecked
+
 
 
 class SetSubtraction(IntSetSetExpression):
@@ -980,6 +1502,11 @@ class SetSubtraction(IntSetSetExpression):
     def _setsubtraction(self, integer, setval):
         return set(map(lambda e: self.checkOverflow(integer - e, self._position), setval))
 
+    def _setsubtraction_unchecked(self, integer, setval):
+        return set([integer - e for e in setval])
+
+    _unchecked_op = _setsubtraction_unchecked
+
 
 class SetTimes(IntSetSetExpression):
 
@@ -993,6 +1520,11 @@ class SetTimes(IntSetSetExpression):
     def _settimes(self, integer, setval):
         return set(map(lambda e: self.checkOverflow(integer * e, self._position), setval))
 
+    def _settimes_unchecked(self, integer, setval):
+        return set([integer * e for e in setval])
+
+    _unchecked_op = _settimes_unchecked
+
 
 class SetDivision(IntSetSetExpression):
 
@@ -1004,11 +1536,14 @@ class SetDivision(IntSetSetExpression):
         self._op = self._setdivision
 
     def _division(self, left, right):
+        return self.checkOverflow(self._divide(left, right), self._position)
+
+    def _divide(self, left, right):
         if right == 0:
             error  = "In line %d, column %d, " % self._position
             error += "cannot divide by zero value."
-            raise SetlanZeroDivisionError()
-        return self.checkOverflow(left / right, self._position)
+            raise SetlanZeroDivisionError(error)
+        return left / right
 
     def _division_wrapper(self, constant):
         return lambda elem: self._division(constant, elem)
@@ -1016,6 +1551,11 @@ class SetDivision(IntSetSetExpression):
     def _setdivision(self, integer, setval):
         return set(map(self._division_wrapper(integer), setval))
 
+    def _setdivision_unchecked(self, integer, setval):
+        return set([self._divide(integer, e) for e in setval])
+
+    _unchecked_op = _setdivision_unchecked
+
 
 class SetModulus(IntSetSetExpression):
 
@@ -1027,11 +1567,14 @@ class SetModulus(IntSetSetExpression):
         self._op = self._setmodulus
 
     def _modulus(self, left, right):
+        return self.checkOverflow(self._remainder(left, right), self._position)
+
+    def _remainder(self, left, right):
         if right == 0:
             error  = "In line %d, column %d, " % self._position
             error += "cannot divide by zero value."
-            raise SetlanZeroDivisionError()
-        return self.checkOverflow(left % right, self._position)
+            raise SetlanZeroDivisionError(error)
+        return left % right
 
     def _modulus_wrapper(self, constant):
         return lambda elem: self._modulus(constant, elem)
@@ -1039,6 +1582,11 @@ class SetModulus(IntSetSetExpression):
     def _setmodulus(self, integer, setval):
         return set(map(self._modulus_wrapper(integer), setval))
 
+    def _setmodulus_unchecked(self, integer, setval):
+        return set([self._remainder(integer, e) for e in setval])
+
+    _unchecked_op = _setmodulus_unchecked
+
 
 class GreaterThan(ComparationBinaryExpression):
 
@@ -1126,12 +1674,17 @@ class And(SameTypeBinaryExpression):
         self._position = kwargs.get('position', None)
         self._operation = "And"
         self._symbol = 'and'
-        self._expected_type = BooleanType(position=self._position)
+        self._expected_type = BOOLEAN
         self._op = self._and
 
+    _associative = True
+
     def _and(self, left, right):
         return left and right
 
+    def _op_all(self, operands):
+        return all(operands)
+
 
 class Or(SameTypeBinaryExpression):
 
@@ -1140,12 +1693,17 @@ class Or(SameTypeBinaryExpression):
         self._position = kwargs.get('position', None)
         self._operation = "Or"
         self._symbol = 'or'
-        self._expected_type = BooleanType(position=self._position)
+        self._expected_type = BOOLEAN
         self._op = self._or
 
+    _associative = True
+
     def _or(self, left, right):
         return left or right
 
+    def _op_all(self, operands):
+        return any(operands)
+
 
 class IsIn(IntSetBooleanExpression):
 
@@ -1169,6 +1727,8 @@ class Minus(IntUnaryExpression):
         self._symbol = '-'
         self._op = self._minus
 
+    _unchecked_op = neg
+
     def _minus(self, value):
         return self.checkOverflow(- value, self._position)
 
@@ -1227,7 +1787,10 @@ class Not(BoolUnaryExpression):
         self._position = kwargs.get('position', None)
         self._operation = "Not"
         self._symbol = 'not'
-        self._op = lambda x: not x
+        self._op = self._not
+
+    def _not(self, value):
+        return not value
 
 
 class TrueValue(Expression):
@@ -1237,16 +1800,24 @@ class TrueValue(Expression):
         self._position = kwargs.get('position', None)
         self._value = True
 
-    def print_ast(self, level):
-        string = "%sBoolean: True" % self._get_indentation(level)
-        return string
+    def _write_ast(self, out, level):
+        out.write("%sBoolean: True" % self._get_indentation(level))
+
+    def _check_type(self, symtable, diagnostics):
+        return BOOLEAN
 
-    def _check(self, symtable):
-        return BooleanType(position=self._position)
+    def _can_fail(self):
+        return False
 
     def _evaluate(self, symtable):
         return True
 
+    def _compute(self, symtable):
+        return True
+
+    def _step(self, values, symtable):
+        values.append(True)
+
 
 class FalseValue(Expression):
 
@@ -1255,16 +1826,24 @@ class FalseValue(Expression):
         self._position = kwargs.get('position', None)
         self._value = False
 
-    def print_ast(self, level):
-        string = "%sBoolean: False" % self._get_indentation(level)
-        return string
+    def _write_ast(self, out, level):
+        out.write("%sBoolean: False" % self._get_indentation(level))
+
+    def _check_type(self, symtable, diagnostics):
+        return BOOLEAN
 
-    def _check(self, symtable):
-        return BooleanType(position=self._position)
+    def _can_fail(self):
+        return False
 
     def _evaluate(self, symtable):
         return False
 
+    def _compute(self, symtable):
+        return False
+
+    def _step(self, values, symtable):
+        values.append(False)
+
 
 class Number(Expression):
 
@@ -1273,50 +1852,112 @@ class Number(Expression):
         self._position = kwargs.get('position', None)
         self._value = value
 
-    def print_ast(self, level):
-        string = "%sNumber: %s" % (self._get_indentation(level), str(self._value))
-        return string
+    def _write_ast(self, out, level):
+        out.write("%sNumber: %s" % (self._get_indentation(level), str(self._value)))
 
-    def _check(self, symtable):
-        return IntegerType(position=self._position)
+    def _check_type(self, symtable, diagnostics):
+        return INTEGER
 
     def _evaluate(self, symtable):
-        return self.checkOverflow(self._value, self._position)
+        if self._folded is not None:
+            return self._folded
+        return self._compute(symtable)
+
+    def _compute(self, symtable):
+        value = self._value
+        if not -2147483648 <= value <= 2147483647:
+            self.checkOverflow(value, self._position)
+        return value
+
+    def _step(self, values, symtable):
+        values.append(self._compute(symtable))
 
 
 class Set(Expression):
 
+    # Indexes of the elements whose values are checked when the set is built,
+    # once it has been evaluated.
+    _unchecked = None
+
     def __init__(self, elements, *args, **kwargs):
         super(Set, self).__init__(args, kwargs)
         self._position = kwargs.get('position', None)
         self._input = elements
-
-    def print_ast(self, level):
-        string = "%sSet:\n%s{" % (
-            self._get_indentation(level), self._get_indentation(level+1))
+        # Large literals made only of numbers (as the ones generated from data)
+        # are kept packed as an array of 32 bit integers, instead of as Number
+        # nodes. Their values can not overflow when evaluated.
+        self._packed = self._pack(elements)
+        if self._packed is not None:
+            self._input = []
+
+    def _pack(self, elements):
+        if elements is None or len(elements) < self.PACKED_SET_SIZE:
+            return None
+        for element in elements:
+            if element.__class__ is not Number:
+                return None
+            if not -2147483648 <= element._value <= 2147483647:
+                return None
+        return array('i', [element._value for element in elements])
+
+    def _write_ast(self, out, level):
+        out.write("%sSet:\n%s{" % (
+            self._get_indentation(level), self._get_indentation(level+1)))
+        if self._packed is not None:
+            # Packed elements are written as the Number nodes they stand for.
+            element = "\n%sElement[%%d]:\n" % self._get_indentation(level+2)
+            number = "%sNumber: %%d" % self._get_indentation(level+3)
+            for index, value in enumerate(self._packed):
+                out.write(element % index)
+                if not out.enter(self, level+3):
+                    break
+                out.write(number % value)
+                out.leave()
         for index, element in enumerate(self._input):
-            string += "\n%sElement[%d]:" % (
+            out.write("\n%sElement[%d]:\n" % (
                 self._get_indentation(level+2),
                 index
-                )
-            string += "\n%s" % element.print_ast(level+3)
-        string += "\n%s}" % self._get_indentation(level+1)
-        return string
-
-    def _check(self, symtable):
-        return SetType(position=self._position)
-
-    def _unpack(self, elems, symtable):
-        list_of_elems = []
-        for elem in elems:
-            value = self.checkOverflow(elem._evaluate(symtable), self._position)
-            list_of_elems.append(value)
-        return list_of_elems
-
-    def _evaluate(self, symtable):
-        if self._input is not None and self._input:
-            return set(self._unpack(self._input, symtable))
-        elif self._input is not None and not self._input:
-            return set()
+                ))
+            yield element, level+3
+        out.write("\n%s}" % self._get_indentation(level+1))
+
+    def _operands(self):
+        if self._input is None:
+            return ()
+        return self._input
+
+    def _check_type(self, symtable, diagnostics):
+        return SET
+
+    def _unpack(self, elems):
+        # Numbers and folded elements were checked when they were evaluated.
+        unchecked = self._unchecked
+        if unchecked is None:
+            unchecked = [index for index, element in enumerate(self._operands())
+                         if element.__class__ is not Number
+                         and element._folded is None]
+            self._unchecked = unchecked
+        for index in unchecked:
+            self.checkOverflow(elems[index], self._position)
+        return elems
+
+    def _compute(self, symtable):
+        if self._packed is not None:
+            return set(self._packed)
+        elements = [element._compute(symtable) for element in self._operands()]
+        if self._checked:
+            elements = self._unpack(elements)
+        return set(elements)
+
+    def _step(self, values, symtable):
+        count = len(self._operands())
+        if self._packed is not None:
+            values.append(set(self._packed))
+        elif count:
+            elements = values[-count:]
+            del values[-count:]
+            if self._checked:
+                elements = self._unpack(elements)
+            values.append(set(elements))
         else:
-            return set()
\ No newline at end of file
+            values.append(set())
@@ -0,0 +1,642 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# ast_format.py
+#
+# Compact binary serialization of Setlan ASTs, for tools that
+# need the tree of a program (with its positions, declared
+# types and the types resolved by the static checks) without
+# lexing, parsing and checking it again, nor scraping the
+# text dump of -a. Trees are written node by node, in preorder,
+# and can be read back the same way, so even very large trees
+# are streamed in both directions.
+#
+# Format (version 3): the magic string 'STLA', the version
+# byte, and then one record per node:
+#
+#     node code, position, [type code], fields, children
+#
+# where the node code is the index of its class in NODE_CLASSES,
+# positions are a varint line number (0 for no position)
+# followed by a varint column, expressions have the code of
+# their resolved type in TYPE_CLASSES (the undefined type if
+# they were not checked), and integers are (zigzag) varints.
+# Strings are written once, and referred to by their index
+# after that.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+import sys
+
+from array import array
+
+from config import SetlanConfig
+
+from exceptions import SetlanValueError
+
+from ast import (
+    Setlan,
+    Expression,
+    Block,
+    Assignment,
+    Input,
+    Output,
+    Conditional,
+    ForLoop,
+    RepeatWhileLoop,
+    VariableDeclaration,
+    Variable,
+    BinaryExpression,
+    UnaryExpression,
+    Sum,
+    Subtraction,
+    Times,
+    Division,
+    Modulus,
+    Union,
+    Difference,
+    Intersection,
+    SetSum,
+    SetSubtraction,
+    SetTimes,
+    SetDivision,
+    SetModulus,
+    GreaterThan,
+    GreaterOrEqual,
+    LessThan,
+    LessOrEqual,
+    Equals,
+    NotEquals,
+    And,
+    Or,
+    IsIn,
+    Minus,
+    GetMax,
+    GetMin,
+    GetSize,
+    Not,
+    TrueValue,
+    FalseValue,
+    Number,
+    String,
+    Set
+    )
+
+from type import Type, IntegerType, BooleanType, SetType
+
+# Classes of the nodes, by node code. New classes must be added at the end, and
+# any change to the record of an existing one needs a new FORMAT_VERSION.
+NODE_CLASSES = [
+    Setlan,
+    Block,
+    Assignment,
+    Input,
+    Output,
+    Conditional,
+    ForLoop,
+    RepeatWhileLoop,
+    VariableDeclaration,
+    Variable,
+    Sum,
+    Subtraction,
+    Times,
+    Division,
+    Modulus,
+    Union,
+    Difference,
+    Intersection,
+    SetSum,
+    SetSubtraction,
+    SetTimes,
+    SetDivision,
+    SetModulus,
+    GreaterThan,
+    GreaterOrEqual,
+    LessThan,
+    LessOrEqual,
+    Equals,
+    NotEquals,
+    And,
+    Or,
+    IsIn,
+    Minus,
+    GetMax,
+    GetMin,
+    GetSize,
+    Not,
+    TrueValue,
+    FalseValue,
+    Number,
+    String,
+    Set
+    ]
+
+# Classes of the declared and resolved types, by type code.
+TYPE_CLASSES = [Type, IntegerType, BooleanType, SetType]
+
+################################################################################
+############################## Buffered streams ################################
+################################################################################
+
+
+class _Output(object):
+    """
+    Encoder of the primitive values of the format, which writes them to a
+    stream in blocks.
+    """
+
+    BLOCK_SIZE = 64 * 1024
+
+    # Encodings of the integers under 128, which take a single byte.
+    _SMALL = [chr(n) for n in range(128)]
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._pieces = []
+        self._size = 0
+        self._strings = {}
+
+    def write(self, data):
+        self._pieces.append(data)
+        self._size += len(data)
+        if self._size >= self.BLOCK_SIZE:
+            self.flush()
+
+    def flush(self):
+        self._stream.write("".join(self._pieces))
+        self._pieces = []
+        self._size = 0
+
+    def uint(self, n):
+        if n < 128:
+            self._pieces.append(self._SMALL[n])
+            self._size += 1
+            return
+        data = []
+        while n >= 128:
+            data.append(chr((n & 127) | 128))
+            n >>= 7
+        data.append(chr(n))
+        self.write("".join(data))
+
+    def int(self, n):
+        # Zigzag encoding, so small negative numbers take few bytes too.
+        if n >= 0:
+            self.uint(n << 1)
+        else:
+            self.uint(((-n) << 1) - 1)
+
+    def string(self, value):
+        index = self._strings.get(value)
+        if index is not None:
+            self.uint(index + 1)
+            return
+        self._strings[value] = len(self._strings)
+        self.uint(0)
+        self.uint(len(value))
+        self.write(value)
+
+    def position(self, position):
+        if position is None:
+            self.uint(0)
+        else:
+            self.uint(position[0])
+            self.uint(position[1])
+
+
+class _Input(object):
+    """
+    Decoder of the primitive values of the format, which reads them from a
+    stream in blocks.
+    """
+
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._data = ""
+        self._offset = 0
+        self._strings = []
+
+    def _fill(self, size):
+        # Makes at least size bytes available from the offset on.
+        data = self._data[self._offset:]
+        while len(data) < size:
+            block = self._stream.read(max(self.BLOCK_SIZE, size - len(data)))
+            if not block:
+                raise SetlanValueError("Truncated Setlan AST stream.")
+            data += block
+        self._data = data
+        self._offset = 0
+
+    def atEnd(self):
+        if self._offset < len(self._data):
+            return False
+        self._data = self._stream.read(self.BLOCK_SIZE)
+        self._offset = 0
+        return not self._data
+
+    def read(self, size):
+        if self._offset + size > len(self._data):
+            self._fill(size)
+        offset = self._offset
+        self._offset = offset + size
+        return self._data[offset:offset + size]
+
+    def uint(self, ord=ord, len=len):
+        data = self._data
+        offset = self._offset
+        n = 0
+        shift = 0
+        while offset < len(data):
+            byte = ord(data[offset])
+            offset += 1
+            n |= (byte & 127) << shift
+            if byte < 128:
+                self._offset = offset
+                return n
+            shift += 7
+        # The number continues in the next block.
+        self._offset = offset
+        while True:
+            byte = ord(self.read(1))
+            n |= (byte & 127) << shift
+            if byte < 128:
+                return n
+            shift += 7
+
+    def int(self):
+        n = self.uint()
+        if n & 1:
+            return -((n + 1) >> 1)
+        return n >> 1
+
+    def string(self):
+        index = self.uint()
+        if index:
+            return self._strings[index - 1]
+        value = intern(self.read(self.uint()))
+        self._strings.append(value)
+        return value
+
+    def position(self):
+        line = self.uint()
+        if not line:
+            return None
+        return (line, self.uint())
+
+################################################################################
+############################## AST serializer ##################################
+################################################################################
+
+
+class SetlanAstSerializer(SetlanConfig):
+    """
+    Saves Setlan ASTs to binary streams and loads them back. Loaded trees are
+    built with the constructors of their nodes, so they are the same as the
+    ones produced by the parsers, and can be checked and executed.
+
+    records() reads a stream node by node, without building the tree, as
+    (depth, node class, position, fields) tuples, where fields are the
+    values of the node that are not nodes (names, numbers, flags and types).
+    The lengths of its lists of nodes are given as in the stream: plus one,
+    and 0 for no list. The fields of expressions end with their resolved
+    type, which loaded expressions get back as their getType().
+    """
+
+    FORMAT_MAGIC = 'STLA'
+    FORMAT_VERSION = 3
+
+    def __init__(self, *args, **kwargs):
+        super(SetlanAstSerializer, self).__init__()
+        self._codes = dict([(cls, code)
+                            for code, cls in enumerate(NODE_CLASSES)])
+        self._type_codes = dict([(cls, code)
+                                 for code, cls in enumerate(TYPE_CLASSES)])
+
+    def __unicode__(self):
+        return "SetlanAstSerializer(version %d)" % self.FORMAT_VERSION
+
+    ############################################################################
+    ################################# Saving ###################################
+    ############################################################################
+
+    def save(self, ast, stream):
+        """
+        Writes ast to stream, which must be opened in binary mode.
+        """
+        out = _Output(stream)
+        out.write(self.FORMAT_MAGIC)
+        out.uint(self.FORMAT_VERSION)
+        self._save(ast, out)
+        out.flush()
+
+    def _save(self, node, out):
+        cls = node.__class__
+        code = self._codes.get(cls)
+        if code is None:
+            raise SetlanValueError(
+                "Cannot serialize AST nodes of class %s." % cls.__name__)
+        out.uint(code)
+        out.position(node._position)
+        if isinstance(node, Expression):
+            out.uint(self._type_codes[node._static_type.__class__])
+        if isinstance(node, BinaryExpression):
+            self._save(node._left, out)
+            self._save(node._right, out)
+        elif isinstance(node, UnaryExpression):
+            self._save(node._expression, out)
+        elif cls is Variable:
+            out.string(node._id)
+        elif cls is Number:
+            out.int(node._value)
+        elif cls is Set:
+            self._save_set(node, out)
+        elif cls is Block:
+            self._save_length(node._declarations, out)
+            self._save_length(node._instructions, out)
+            self._save_nodes(node._declarations, out)
+            self._save_nodes(node._instructions, out)
+        elif cls is Assignment:
+            self._save(node._variable, out)
+            self._save(node._value, out)
+        elif cls is Output:
+            printables = node._printables
+            if node._lnsufix is None:
+                out.uint(0)
+            else:
+                # The line break is added back by the constructor.
+                out.uint(1)
+                out.string(node._lnsufix)
+                printables = printables[:-1]
+            self._save_list(printables, out)
+        elif cls is String:
+            out.string(node._value)
+        elif cls is Conditional:
+            out.uint(node._alt_instruction is not None)
+            self._save(node._condition, out)
+            self._save(node._instruction, out)
+            if node._alt_instruction is not None:
+                self._save(node._alt_instruction, out)
+        elif cls is ForLoop:
+            out.uint(bool(node._ordering))
+            self._save(node._variable, out)
+            self._save(node._set, out)
+            self._save(node._instruction, out)
+        elif cls is RepeatWhileLoop:
+            out.uint((node._prev_instruction is not None) |
+                     (node._instruction is not None) << 1)
+            if node._prev_instruction is not None:
+                self._save(node._prev_instruction, out)
+            self._save(node._condition, out)
+            if node._instruction is not None:
+                self._save(node._instruction, out)
+        elif cls is VariableDeclaration:
+            out.uint(self._type_codes[node._type.__class__])
+            self._save_list(node._variables, out)
+        elif cls is Input or cls is Setlan:
+            child = node._variable if cls is Input else node._instruction
+            self._save(child, out)
+
+    def _save_length(self, nodes, out):
+        # Lists are written as their length plus one, and None as 0.
+        if nodes is None:
+            out.uint(0)
+        else:
+            out.uint(len(nodes) + 1)
+
+    def _save_nodes(self, nodes, out):
+        if nodes is not None:
+            for node in nodes:
+                self._save(node, out)
+
+    def _save_list(self, nodes, out):
+        self._save_length(nodes, out)
+        self._save_nodes(nodes, out)
+
+    def _save_set(self, node, out):
+        if node._packed is None:
+            out.uint(0)
+            self._save_list(node._input, out)
+            return
+        # Packed elements are written as little endian 32 bit integers.
+        packed = node._packed
+        if sys.byteorder != 'little':
+            packed = array('i', packed)
+            packed.byteswap()
+        out.uint(1)
+        out.uint(len(packed))
+        out.write(packed.tostring())
+
+    ############################################################################
+    ################################# Loading ##################################
+    ############################################################################
+
+    def load(self, stream):
+        """
+        Reads a tree written by save() from stream, and returns it.
+
+        Loading creates lots of objects and almost no garbage, so the cyclic
+        garbage collector only slows it down: callers loading large trees can
+        disable it around the call (1 MB programs load about 3 times faster).
+        """
+        # Each frame is the record of a node waiting for its children: its
+        # class, position, fields, number of children and children.
+        stack = []
+        root = None
+        for record in self._records(stream):
+            if record[3]:
+                record[4] = []
+                stack.append(record)
+                continue
+            node = self._build(record)
+            while stack:
+                frame = stack[-1]
+                frame[4].append(node)
+                if len(frame[4]) < frame[3]:
+                    break
+                stack.pop()
+                node = self._build(frame)
+            else:
+                root = node
+        if root is None or stack:
+            raise SetlanValueError("Truncated Setlan AST stream.")
+        return root
+
+    def records(self, stream):
+        """
+        Generator of the (depth, node class, position, fields) records of the
+        nodes of the tree in stream, in preorder.
+        """
+        # Number of children left to read of each node being read.
+        pending = []
+        for record in self._records(stream):
+            yield (len(pending), record[0], record[1], record[2])
+            if record[3]:
+                pending.append(record[3])
+                continue
+            while pending:
+                pending[-1] -= 1
+                if pending[-1]:
+                    break
+                pending.pop()
+
+    def _header(self, data):
+        if data.read(len(self.FORMAT_MAGIC)) != self.FORMAT_MAGIC:
+            raise SetlanValueError("Not a Setlan AST stream.")
+        version = data.uint()
+        if version != self.FORMAT_VERSION:
+            raise SetlanValueError(
+                "Unsupported Setlan AST format version %d (expected %d)." % (
+                    version, self.FORMAT_VERSION))
+
+    def _records(self, stream):
+        """
+        Generator of [node class, position, fields, number of children, None]
+        records of the nodes in stream, in preorder. Records whose node has
+        children are completed with them by load().
+        """
+        data = self._input(stream)
+        uint = data.uint
+        position = data.position
+        classes = NODE_CLASSES
+        types = [type_class() for type_class in TYPE_CLASSES]
+        pending = 1
+        while pending:
+            code = uint()
+            if code >= len(classes):
+                raise SetlanValueError("Unknown AST node code %d." % code)
+            cls = classes[code]
+            pending -= 1
+            node_position = position()
+            if not issubclass(cls, Expression):
+                record = self._read_fields(cls, node_position, data)
+            else:
+                type_code = uint()
+                if type_code >= len(types):
+                    raise SetlanValueError("Unknown type code %d." % type_code)
+                resolved = types[type_code]
+                if issubclass(cls, BinaryExpression):
+                    record = [cls, node_position, (resolved,), 2, None]
+                elif issubclass(cls, UnaryExpression):
+                    record = [cls, node_position, (resolved,), 1, None]
+                elif cls is Variable:
+                    record = [cls, node_position, (data.string(), resolved),
+                              0, None]
+                elif cls is Number:
+                    record = [cls, node_position, (data.int(), resolved),
+                              0, None]
+                else:
+                    record = self._read_fields(cls, node_position, data)
+                    record[2] = record[2] + (resolved,)
+            pending += record[3]
+            yield record
+        if not data.atEnd():
+            raise SetlanValueError("Trailing data after the Setlan AST.")
+
+    def _input(self, stream):
+        data = _Input(stream)
+        self._header(data)
+        return data
+
+    def _read_fields(self, cls, position, data):
+        uint = data.uint
+        if cls is Set:
+            if uint():
+                packed = array('i')
+                packed.fromstring(data.read(uint() * packed.itemsize))
+                if sys.byteorder != 'little':
+                    packed.byteswap()
+                return [cls, position, (None, packed), 0, None]
+            count = uint()
+            return [cls, position, (count,), max(count - 1, 0), None]
+        if cls is Block:
+            declarations = uint()
+            instructions = uint()
+            return [cls, position, (declarations, instructions),
+                    max(declarations - 1, 0) + max(instructions - 1, 0), None]
+        if cls is Output:
+            sufix = data.string() if uint() else None
+            count = uint()
+            return [cls, position, (sufix, count), max(count - 1, 0), None]
+        if cls is String:
+            return [cls, position, (data.string(),), 0, None]
+        if cls is Conditional:
+            alternative = uint()
+            return [cls, position, (bool(alternative),), 2 + alternative, None]
+        if cls is ForLoop:
+            return [cls, position, (bool(uint()),), 3, None]
+        if cls is RepeatWhileLoop:
+            parts = uint()
+            return [cls, position, (bool(parts & 1), bool(parts & 2)),
+                    1 + (parts & 1) + (parts >> 1 & 1), None]
+        if cls is VariableDeclaration:
+            type_class = TYPE_CLASSES[uint()]
+            count = uint()
+            return [cls, position, (type_class, count),
+                    max(count - 1, 0), None]
+        if cls is TrueValue or cls is FalseValue:
+            return [cls, position, (), 0, None]
+        if cls is Assignment:
+            return [cls, position, (), 2, None]
+        return [cls, position, (), 1, None]
+
+    def _list(self, length, children):
+        # Takes the list written as length (see _save_length) from the start
+        # of children.
+        if not length:
+            return None
+        nodes = children[:length - 1]
+        del children[:length - 1]
+        return nodes
+
+    def _build(self, record):
+        node = self._construct(record)
+        if isinstance(node, Expression):
+            node._static_type = record[2][-1]
+        return node
+
+    def _construct(self, record):
+        cls, position, fields, count, children = record
+        if children is None:
+            children = []
+        if issubclass(cls, BinaryExpression):
+            return cls(children[0], children[1], position=position)
+        if issubclass(cls, UnaryExpression):
+            return cls(children[0], position=position)
+        if cls is Variable or cls is Number:
+            return cls(fields[0], position=position)
+        if cls is String:
+            # The constructor strips the quotes of the literal.
+            return cls('"%s"' % fields[0], position=position)
+        if cls is Set:
+            if fields[0] is None:
+                node = cls([], position=position)
+                node._packed = fields[1]
+                return node
+            return cls(self._list(fields[0], children), position=position)
+        if cls is Block:
+            declarations = self._list(fields[0], children)
+            instructions = self._list(fields[1], children)
+            return cls(declarations, instructions, position=position)
+        if cls is Output:
+            printables = self._list(fields[1], children)
+            if fields[0] is None:
+                return cls(printables, position=position)
+            return cls(printables, position=position, sufix=fields[0])
+        if cls is TrueValue or cls is FalseValue:
+            return cls(position=position)
+        if cls is Conditional or cls is Assignment:
+            return cls(*children, position=position)
+        if cls is ForLoop:
+            return cls(children[0], fields[0], children[1], children[2],
+                       position=position)
+        if cls is RepeatWhileLoop:
+            prev_instruction = children.pop(0) if fields[0] else None
+            instruction = children[1] if fields[1] else None
+            return cls(prev_instruction, children[0], instruction,
+                       position=position)
+        if cls is VariableDeclaration:
+            return cls(fields[0](), self._list(fields[1], children),
+                       position=position)
+        return cls(children[0], position=position)
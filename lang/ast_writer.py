@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# ast_writer.py
+#
+# Streaming writer of Setlan AST dumps. The nodes write their
+# dump piece by piece to an output stream through it, instead
+# of building it as a string, so it is shown as it is produced
+# and its memory does not grow with the size of the tree. The
+# depth and the number of nodes dumped can be limited, for
+# huge trees.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+from config import SetlanConfig
+
+
+class SetlanAstWriter(SetlanConfig):
+    """
+    Output of an AST dump. Nodes are written with write_ast(writer, level),
+    calling enter() before writing themselves and leave() after, so the
+    writer can elide them:
+
+        - Nodes nested deeper than max_depth nodes are replaced by '...'.
+        - After max_nodes nodes, the node reached is replaced by '...' and
+          nothing else is written.
+    """
+
+    def __init__(self, stream, max_depth=None, max_nodes=None,
+                 *args, **kwargs):
+        super(SetlanAstWriter, self).__init__()
+        self._stream = stream
+        self._max_depth = max_depth
+        self._max_nodes = max_nodes
+        self._depth = 0
+        self._nodes = 0
+        self._stopped = False
+        self._truncated = False
+
+    def __unicode__(self):
+        return "SetlanAstWriter(%d nodes)" % self._nodes
+
+    def write(self, text):
+        if not self._stopped:
+            self._stream.write(text)
+
+    def enter(self, node, level):
+        """
+        Whether node, at the given indentation level, must be written. If it
+        must not, its elision is written instead.
+        """
+        if self._stopped:
+            return False
+        if self._max_nodes is not None and self._nodes >= self._max_nodes:
+            self.write(node._elision(level))
+            self._stopped = True
+            self._truncated = True
+            return False
+        if self._max_depth is not None and self._depth >= self._max_depth:
+            self.write(node._elision(level))
+            self._truncated = True
+            return False
+        self._depth += 1
+        self._nodes += 1
+        return True
+
+    def leave(self):
+        self._depth -= 1
+
+    def getNodes(self):
+        """
+        Number of nodes written.
+        """
+        return self._nodes
+
+    def isTruncated(self):
+        return self._truncated
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# batch.py
+#
+# Batch static checks of many Setlan programs. The lexer and
+# the parser are built once, and the programs are checked by a
+# pool of worker processes that inherit them, reporting the
+# diagnostics and the exit category (one of the ERR_* codes of
+# SetlanConfig) of each program, plus a summary.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+import os
+import sys
+import time
+import multiprocessing
+
+from config import SetlanConfig
+
+from exceptions import (
+    SetlanInputNotDefinedException,
+    SetlanTokensNotDefinedException,
+    SetlanLexicalErrors,
+    SetlanValueError,
+    SetlanSyntaxError,
+    SetlanStaticErrors,
+    SetlanScopeError,
+    SetlanTypeError,
+    SetlanZeroDivisionError,
+    SetlanOverflowError,
+    SetlanEmptySetError
+    )
+
+# Exit category of each exception, in the order they are caught by setlan.
+ERROR_CATEGORIES = [
+    (SetlanInputNotDefinedException, SetlanConfig.ERR_INPUT_NOT_PROVIDED),
+    (SetlanTokensNotDefinedException,
+     SetlanConfig.ERR_LANG_LEX_MODULE_NOT_PROVIDED),
+    (SetlanLexicalErrors, SetlanConfig.ERR_LEXICOGRAPHICAL_ERROR),
+    (SetlanValueError, SetlanConfig.ERR_VALUE_ERROR),
+    (SetlanSyntaxError, SetlanConfig.ERR_SYNTAX_ERROR),
+    (SetlanScopeError, SetlanConfig.ERR_SCOPE_ERROR),
+    (SetlanTypeError, SetlanConfig.ERR_TYPE_ERROR),
+    (SetlanZeroDivisionError, SetlanConfig.ERR_ZERO_DIVISION),
+    (SetlanOverflowError, SetlanConfig.ERR_OVERFLOW),
+    (SetlanEmptySetError, SetlanConfig.ERR_EMPTY_SET)
+    ]
+
+################################################################################
+################################ Pool workers ##################################
+################################################################################
+
+# Lexer and parser of each worker process, set once when the pool starts.
+# Forked workers inherit the ones built by the parent, tables included.
+_worker = {}
+
+
+def _init_worker(lexer, parser):
+    _worker['lexer'] = lexer
+    _worker['parser'] = parser
+
+
+def _check_program(path):
+    """
+    Runs the static checks of the program in path, and returns its path, exit
+    category, diagnostics (None when there are none), size and check time.
+    """
+    start = time.time()
+    try:
+        with open(path, 'r') as program:
+            source = program.read()
+    except IOError as e:
+        return (path, SetlanConfig.ERR_BAD_FILENAME, "IOError: %s" % str(e),
+                0, time.time() - start)
+    diagnostics = SetlanStaticErrors()
+    lexer = _worker['lexer']
+    status = SetlanConfig.SUCCESS
+    report = None
+    try:
+        lexer.input(source)
+        ast = _worker['parser'].parse(lexer=lexer)
+        ast.staticChecks(diagnostics)
+        if diagnostics.has_errors():
+            status = SetlanConfig.ERR_STATIC_ERROR
+            report = str(diagnostics)
+    except Exception as e:
+        for exception_class, category in ERROR_CATEGORIES:
+            if isinstance(e, exception_class):
+                status = category
+                report = str(e)
+                break
+        else:
+            # A crash of the interpreter, which would end setlan with an
+            # uncaught exception, must not end the whole batch.
+            status = SetlanConfig.ERR_BAD_USAGE
+            report = "%s: %s" % (e.__class__.__name__, str(e))
+    return (path, status, report, len(source), time.time() - start)
+
+################################################################################
+############################### Batch checker ##################################
+################################################################################
+
+
+class SetlanBatchChecker(SetlanConfig):
+    """
+    Checks every Setlan program found in the given paths, with the given lexer
+    and parser, which are built once and shared by the worker processes.
+    """
+
+    PROGRAM_EXTENSION = '.stl'
+
+    def __init__(self, lexer, parser, workers=None, *args, **kwargs):
+        super(SetlanBatchChecker, self).__init__()
+        self._lexer = lexer
+        self._parser = parser
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self._workers = workers
+
+    def __unicode__(self):
+        return "SetlanBatchChecker(%d workers)" % self._workers
+
+    def findPrograms(self, paths):
+        """
+        Sorted list of the programs in paths: the files given explicitly, and
+        the .stl files found walking the directories given.
+        """
+        programs = set()
+        for path in paths:
+            if not os.path.isdir(path):
+                programs.add(path)
+                continue
+            for directory, subdirectories, files in os.walk(path):
+                for name in files:
+                    if name.endswith(self.PROGRAM_EXTENSION):
+                        programs.add(os.path.join(directory, name))
+        return sorted(programs)
+
+    def categoryName(self, status):
+        for name in dir(SetlanConfig):
+            if (name.startswith('ERR_') or name == 'SUCCESS') and \
+               getattr(SetlanConfig, name) == status:
+                return name
+        return str(status)
+
+    def check(self, paths, stream=None):
+        """
+        Checks the programs in paths, writing the diagnostics of each one and
+        a summary to stream (stdout by default), in the order of the programs.
+        Returns SUCCESS if every program passed, or the exit category of the
+        first one that did not.
+        """
+        if stream is None:
+            stream = sys.stdout
+        programs = self.findPrograms(paths)
+        start = time.time()
+        counts = {}
+        first_failure = None
+        size = 0
+        pool = multiprocessing.Pool(self._workers, _init_worker,
+                                    (self._lexer, self._parser))
+        try:
+            results = pool.imap(_check_program, programs)
+            for path, status, diagnostics, length, elapsed in results:
+                size += length
+                counts[status] = counts.get(status, 0) + 1
+                if status == self.SUCCESS:
+                    stream.write("%s: OK (%.3fs)\n" % (path, elapsed))
+                    continue
+                if first_failure is None:
+                    first_failure = status
+                stream.write("%s: %s (%d)\n" % (path, self.categoryName(status),
+                                                status))
+                for line in diagnostics.splitlines():
+                    stream.write("    %s\n" % line)
+        finally:
+            pool.terminate()
+        elapsed = time.time() - start
+        self._summary(stream, len(programs), counts, size, elapsed)
+        if first_failure is None:
+            return self.SUCCESS
+        return first_failure
+
+    def _summary(self, stream, total, counts, size, elapsed):
+        passed = counts.get(self.SUCCESS, 0)
+        stream.write("Checked %d programs (%.1f KB) in %.3fs with %d workers: "
+                     "%d passed, %d failed.\n" % (total, size / 1024.0, elapsed,
+                                                  self._workers, passed,
+                                                  total - passed))
+        for status in sorted(counts):
+            if status != self.SUCCESS:
+                stream.write("    %s (%d): %d\n" % (self.categoryName(status),
+                                                    status, counts[status]))
+        if elapsed > 0:
+            stream.write("Throughput: %.1f programs/s, %.1f KB/s.\n" % (
+                total / elapsed, size / 1024.0 / elapsed))
@@ -9,6 +9,8 @@
 # Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
 # ------------------------------------------------------------
 
+import os
+
 from exceptions import (SetlanValueError, SetlanOverflowError)
 
 class SetlanConfig(object):
@@ -37,6 +39,30 @@ class SetlanConfig(object):
 
     SPACE = "    "
 
+    LEXER_BACKENDS = ('ply', 'scanner')
+    PARSER_BACKENDS = ('ply', 'pratt')
+
+    PARSER_CACHE_ENV = 'SETLAN_CACHE_DIR'
+    PARSER_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'setlan')
+    PARSER_CACHE_MODE = 0700
+
+    PROGRAM_CACHE_SUBDIR = 'programs'
+    PROGRAM_CACHE_MODE = 0700
+    PROGRAM_CACHE_SIZE_ENV = 'SETLAN_PROGRAM_CACHE_SIZE'
+    PROGRAM_CACHE_SIZE = 64 * 1024 * 1024
+
+    # Minimum number of elements of the set literals packed as arrays.
+    PACKED_SET_SIZE = 16
+
+    # Expressions of at most this many levels are evaluated by recursion over
+    # their nodes, and deeper ones with an explicit stack.
+    DIRECT_EVALUATION_DEPTH = 64
+
+    # Inputs of at least this size are lexed in parallel, in chunks of
+    # PARALLEL_LEX_CHUNK_SIZE bytes, when there is more than one CPU.
+    PARALLEL_LEX_SIZE = 8 * 1024 * 1024
+    PARALLEL_LEX_CHUNK_SIZE = 1024 * 1024
+
     def __init__(self, *args, **kwargs):
         super(SetlanConfig, self).__init__()
 
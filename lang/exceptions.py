@@ -7,7 +7,17 @@
 # Author:
 # Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
 # ------------------------------------------------------------
-from lib.singleton import Singleton
+
+
+def quote_line(line, colno):
+    """
+    The given line of a program, with a caret under the given column, to be
+    appended to an error message.
+    """
+    # Tabs are kept, so the caret lines up however they are displayed.
+    margin = "".join([char if char == '\t' else ' '
+                      for char in line[:colno - 1]])
+    return "\n\t    %s\n\t    %s^" % (line, margin)
 
 
 class SetlanException(Exception):
@@ -50,12 +60,55 @@ class SetlanLexicalErrors(SetlanException):
             string += "\n\t%s" % error
         return string
 
+    def quoteSource(self, source):
+        """
+        Makes each error show its offending line, taken from the given
+        SetlanSource, which is scanned only once for all of them.
+        """
+        positions = [error.getPosition() for error in self._errors]
+        lines = source.getLines([position[0] for position in positions
+                                 if position is not None])
+        for error, position in zip(self._errors, positions):
+            if position is not None:
+                error.setLine(lines.get(position[0]))
+
+
+class SetlanPositionedError(SetlanException):
+    """
+    Error found at a (line, column) position of the program, given as the
+    position keyword. It shows the offending line once it is set.
+    """
+
+    def __init__(self, error, *args, **kwargs):
+        super(SetlanPositionedError, self).__init__(error, *args, **kwargs)
+        self._position = kwargs.get('position', None)
+        self._line = None
+
+    def getPosition(self):
+        return self._position
+
+    def setLine(self, line):
+        self._line = line
 
-class SetlanLexicalError(SetlanException):
+    def quoteSource(self, source):
+        """
+        Makes the error show its offending line, taken from the given
+        SetlanSource.
+        """
+        if self._position is not None:
+            self._line = source.getLine(self._position[0])
+
+    def _quote(self):
+        if self._line is None:
+            return ""
+        return quote_line(self._line, self._position[1])
+
+
+class SetlanLexicalError(SetlanPositionedError):
 
     def __unicode__(self):
         string = "SetlanLexicalError: %s" % self._error
-        return string
+        return string + self._quote()
 
 
 class SetlanValueError(SetlanException):
@@ -65,11 +118,11 @@ class SetlanValueError(SetlanException):
         return string
 
 
-class SetlanSyntaxError(SetlanException):
+class SetlanSyntaxError(SetlanPositionedError):
 
     def __unicode__(self):
         string = "SetlanSyntaxError: %s" % self._error
-        return string
+        return string + self._quote()
 
 
 class SetlanScopeError(SetlanException):
@@ -96,8 +149,13 @@ class SetlanReadOnlyModificationError(SetlanException):
         return string
 
 
-@Singleton
 class SetlanStaticErrors(SetlanException):
+    """
+    Diagnostics context of a compilation: the static errors found while
+    checking a program, raised as a whole once the checks are done. Each
+    compilation creates its own and passes it down the static checks, so
+    programs can be checked concurrently without their errors mixing.
+    """
 
     def __init__(self):
         self._error = "Static check time errors were found:"
@@ -116,6 +174,9 @@ class SetlanStaticErrors(SetlanException):
     def has_errors(self):
         return (self._errors is not None) and self._errors
 
+    def getErrors(self):
+        return self._errors
+
 
 class SetlanZeroDivisionError(SetlanException):
 
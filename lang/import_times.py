@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# import_times.py
+#
+# Measurement of the time spent importing each module, used
+# by `setlan --import-times` to find what slows down the
+# interpreter's startup. It does not import anything from the
+# setlan package itself, so it can be installed before them.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+import sys
+import time
+import __builtin__
+
+
+class SetlanImportTimer(object):
+    """
+    Replaces the builtin __import__ with a version timing the imports that
+    load new modules. Each one is recorded with its own time (without the
+    modules it imported in turn), its cumulative time and its nesting depth,
+    in the order they finish, like python 3's -X importtime.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(SetlanImportTimer, self).__init__()
+        self._import = None
+        self._claimed = set()
+        self._stack = []
+        self._imports = []
+
+    def __unicode__(self):
+        return "SetlanImportTimer"
+
+    def __str__(self):
+        return self.__unicode__()
+
+    def install(self):
+        if self._import is None:
+            self._import = __builtin__.__import__
+            __builtin__.__import__ = self._timed_import
+
+    def uninstall(self):
+        if self._import is not None:
+            __builtin__.__import__ = self._import
+            self._import = None
+
+    def getImports(self):
+        """
+        List of (module names, self time, cumulative time, depth), in
+        seconds.
+        """
+        return list(self._imports)
+
+    def report(self, stream=None):
+        if stream is None:
+            stream = sys.stderr
+        stream.write("import time: self [us] | cumulative | imported module\n")
+        total = 0.0
+        for names, own, cumulative, depth in self._imports:
+            stream.write("import time: %9d | %10d | %s%s\n" % (
+                own * 1000000,
+                cumulative * 1000000,
+                "  " * depth,
+                names
+                ))
+            if depth == 0:
+                total += cumulative
+        stream.write("import time: %9s | %10d | total\n" % ("",
+                                                           total * 1000000))
+
+    def _timed_import(self, name, *args, **kwargs):
+        # The time of the nested imports is accumulated in the entry of the
+        # stack of the import that triggered them.
+        known = set(sys.modules)
+        self._stack.append(0.0)
+        start = time.time()
+        try:
+            return self._import(name, *args, **kwargs)
+        finally:
+            cumulative = time.time() - start
+            nested = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += cumulative
+            # Modules loaded by the nested imports were already claimed by
+            # them. Python 2 records failed implicit relative imports as None.
+            loaded = [module for module, value in sys.modules.items()
+                      if module not in known and module not in self._claimed
+                      and value is not None]
+            if loaded:
+                self._claimed.update(loaded)
+                self._imports.append((
+                    ", ".join(sorted(loaded)),
+                    cumulative - nested,
+                    cumulative,
+                    len(self._stack)
+                    ))
@@ -0,0 +1,637 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# incremental.py
+#
+# Incremental analysis of Setlan programs for editors. After
+# a text edit, only the smallest region enclosing it (a run
+# of instructions of a block, or a whole block) is lexed,
+# parsed and checked again; the rest of the AST, and the
+# diagnostics found in it, are reused with their positions
+# shifted.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+import re
+
+from bisect import bisect_left, bisect_right
+from operator import attrgetter, itemgetter
+
+from config import SetlanConfig
+
+from exceptions import (
+    SetlanException,
+    SetlanLexicalErrors,
+    SetlanStaticErrors,
+    SetlanValueError
+    )
+
+from ast import Instruction, Block, ForLoop
+
+from traversal import run
+
+from scanner import SetlanScanner
+
+from pratt_parser import SetlanPrattParser
+
+newline = re.compile(r'\n')
+
+# Position reported at the beginning of static and lexical error messages.
+error_position = re.compile(r'In line (\d+), column (\d+)')
+
+
+class BlockRecord(object):
+    """
+    A block of the analyzed program: its node, the offsets of its braces in
+    the current source, the nodes enclosing it (from the program down to its
+    parent) and the records of the blocks nested in it. Blocks that do not
+    parse after an edit keep their previous node, and the errors found in
+    damage.
+
+    The positions of the nodes of the block, down to its nested blocks, are
+    moved after an edit only when they are needed: synced is the number of
+    edits of the analyzer's log already applied to them.
+    """
+    def __init__(self, node, open, close, path, synced):
+        super(BlockRecord, self).__init__()
+        self.node = node
+        self.open = open
+        self.close = close
+        self.path = path
+        self.synced = synced
+        self.children = []
+        self.damage = None
+
+
+class TokenRecorder(object):
+    """
+    Lexer wrapper that keeps the tokens pulled from it by the parser, and
+    whether they were all pulled.
+    """
+    def __init__(self, lexer):
+        super(TokenRecorder, self).__init__()
+        self._lexer = lexer
+        self.tokens = []
+        self.exhausted = False
+
+    def input(self, *args, **kwargs):
+        self._lexer.input(*args, **kwargs)
+
+    def token(self):
+        token = self._lexer.token()
+        if token is None:
+            self.exhausted = True
+        else:
+            self.tokens.append(token)
+        return token
+
+
+class SetlanIncrementalAnalyzer(SetlanConfig):
+    """
+    Keeps the source, AST and diagnostics of a program up to date with the
+    edits applied to it through edit(). Diagnostics are the errors a full
+    analysis would report, ordered by position; while the program does not
+    parse, only the lexical and syntax errors are reported.
+    """
+
+    def __init__(self, inputString, *args, **kwargs):
+        super(SetlanIncrementalAnalyzer, self).__init__()
+        self._parser = SetlanPrattParser()
+        self._analyze(inputString, [0] + [
+            match.end() for match in newline.finditer(inputString)
+            ])
+
+    def __unicode__(self):
+        return "SetlanIncrementalAnalyzer"
+
+    def getSource(self):
+        return self._source
+
+    def getAst(self):
+        """
+        Returns the AST of the program, or None if it does not parse.
+        """
+        if self._ast is None or self._damaged:
+            return None
+        self._sync_all()
+        return self._ast
+
+    def getDiagnostics(self):
+        diagnostics = self._errors
+        if self._ast is not None and self._damaged:
+            # A full analysis stops at the first syntax error, so only the
+            # errors of the first damaged block are reported.
+            diagnostics = []
+            for record in self._damaged:
+                diagnostics.extend(record.damage)
+            diagnostics = [min(diagnostics, key=itemgetter(0))]
+        return [error for position, error in sorted(diagnostics,
+                                                    key=itemgetter(0))]
+
+    def getOffset(self, line, column):
+        """
+        Offset in the source of the given line and column, both starting at 1.
+        """
+        return self._offset((line, column), self._line_starts)
+
+    def edit(self, start, end, text):
+        """
+        Replaces the characters of the source from offset start to end (not
+        included) with text, and returns the updated diagnostics.
+        """
+        source = self._source
+        if not 0 <= start <= end <= len(source):
+            error = "Edit range (%d, %d) is out of the source." % (start, end)
+            raise SetlanValueError(error)
+        new_source = source[:start] + text + source[end:]
+        line_starts = self._edit_line_starts(start, end, text)
+        record = None
+        if self._ast is not None:
+            record = self._innermost(start, end)
+        if record is None:
+            self._analyze(new_source, line_starts)
+        else:
+            self._update(record, start, end, text, new_source, line_starts)
+        return self.getDiagnostics()
+
+    ############################################################################
+    ################################ Positions #################################
+    ############################################################################
+
+    def _edit_line_starts(self, start, end, text):
+        """
+        Offsets where the lines of the source begin after the edit.
+        """
+        line_starts = self._line_starts
+        delta = len(text) - (end - start)
+        following = bisect_right(line_starts, end)
+        added = [start + match.end() for match in newline.finditer(text)]
+        if delta == 0:
+            moved = line_starts[following:]
+        else:
+            moved = [offset + delta for offset in line_starts[following:]]
+        return line_starts[:bisect_right(line_starts, start)] + added + moved
+
+    def _offset(self, position, line_starts):
+        return line_starts[position[0] - 1] + position[1] - 1
+
+    def _position(self, offset, line_starts):
+        line = bisect_right(line_starts, offset)
+        return (line, offset - line_starts[line - 1] + 1)
+
+    def _shift_position(self, position, shift):
+        """
+        Moves a position found after an edit. shift holds the position where
+        the replaced text ended, and the lines and columns it moved.
+        """
+        after, lines, columns = shift
+        if position < after:
+            return position
+        if position[0] == after[0]:
+            return (position[0] + lines, position[1] + columns)
+        return (position[0] + lines, position[1])
+
+    def _shift_error(self, error, shift):
+        match = error_position.search(error._error)
+        if match is None:
+            return error
+        position = (int(match.group(1)), int(match.group(2)))
+        line, column = self._shift_position(position, shift)
+        message = "%sIn line %d, column %d%s" % (
+            error._error[:match.start()],
+            line,
+            column,
+            error._error[match.end():]
+            )
+        return error.__class__(message)
+
+    def _diagnostic(self, error, position=None):
+        if position is None:
+            match = error_position.search(str(error))
+            if match is None:
+                position = (0, 0)
+            else:
+                position = (int(match.group(1)), int(match.group(2)))
+        return (position, error)
+
+    def _sync(self, node, shifts):
+        """
+        Applies the shifts to the positions of node and of its descendants,
+        down to the nested blocks.
+        """
+        visited = set()
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if id(current) in visited:
+                continue
+            visited.add(id(current))
+            position = getattr(current, '_position', None)
+            if position is not None:
+                for shift in shifts:
+                    position = self._shift_position(position, shift)
+                current._position = position
+            for value in current.__dict__.itervalues():
+                if isinstance(value, SetlanConfig):
+                    if not isinstance(value, Block):
+                        stack.append(value)
+                elif isinstance(value, list):
+                    stack.extend([item for item in value
+                                  if isinstance(item, SetlanConfig) and
+                                  not isinstance(item, Block)])
+
+    def _sync_record(self, record):
+        if record.synced < len(self._shifts):
+            self._sync(record.node, self._shifts[record.synced:])
+            record.synced = len(self._shifts)
+
+    def _sync_all(self):
+        """
+        Brings the positions of every node of the AST up to date, emptying the
+        log of edits.
+        """
+        if self._synced < len(self._shifts):
+            self._sync(self._ast, self._shifts[self._synced:])
+        stack = list(self._records)
+        while stack:
+            record = stack.pop()
+            self._sync_record(record)
+            record.synced = 0
+            stack.extend(record.children)
+        self._shifts = []
+        self._synced = 0
+
+    ############################################################################
+    ################################ Analysis ##################################
+    ############################################################################
+
+    def _analyze(self, source, line_starts):
+        """
+        Analyzes the whole program.
+        """
+        self._source = source
+        self._line_starts = line_starts
+        self._ast = None
+        self._records = []
+        self._damaged = []
+        self._errors = []
+        # Moves of the edits applied since the analysis, and how many of them
+        # were applied to the nodes outside every block.
+        self._shifts = []
+        self._synced = 0
+        recorder = TokenRecorder(SetlanScanner(inputString=source))
+        try:
+            ast = self._parser.parse(lexer=recorder)
+            diagnostics = SetlanStaticErrors()
+            ast.staticChecks(diagnostics)
+        except SetlanException as error:
+            self._errors = [self._diagnostic(error)]
+            return
+        self._ast = ast
+        self._errors = [self._diagnostic(error)
+                        for error in diagnostics.getErrors()]
+        closes = self._closes(recorder.tokens, line_starts)
+        self._records = self._find_blocks([ast._instruction], [ast], closes)
+
+    def _closes(self, tokens, line_starts):
+        """
+        Maps the offset of each opening brace in tokens to the offset of the
+        brace closing it.
+        """
+        closes = {}
+        opened = []
+        for token in tokens:
+            if token.type == 'TkOBrace':
+                opened.append(self._offset((token.lineno, token.colno),
+                                           line_starts))
+            elif token.type == 'TkCBrace':
+                closes[opened.pop()] = self._offset((token.lineno,
+                                                     token.colno),
+                                                    line_starts)
+        return closes
+
+    def _nested_instructions(self, node):
+        nested = []
+        for value in node.__dict__.itervalues():
+            if isinstance(value, Instruction):
+                nested.append(value)
+            elif isinstance(value, list):
+                nested.extend([item for item in value
+                               if isinstance(item, Instruction)])
+        return nested
+
+    def _find_blocks(self, nodes, path, closes):
+        """
+        Records of the outermost blocks found in nodes, whose ancestors are
+        the nodes in path. Their positions must be up to date.
+        """
+        records = []
+        for node in nodes:
+            nested = self._nested_instructions(node)
+            if isinstance(node, Block):
+                open = self._offset(node._position, self._line_starts)
+                record = BlockRecord(node, open, closes[open], path,
+                                     len(self._shifts))
+                record.children = self._find_blocks(nested, path + [node],
+                                                    closes)
+                records.append(record)
+            elif nested:
+                records.extend(self._find_blocks(nested, path + [node],
+                                                 closes))
+        records.sort(key=attrgetter('open'))
+        return records
+
+    def _innermost(self, start, end):
+        """
+        Record of the innermost block whose braces enclose the edited range.
+        """
+        found = None
+        records = self._records
+        while records:
+            for record in records:
+                if record.open < start and end <= record.close:
+                    found = record
+                    records = record.children
+                    break
+            else:
+                break
+        return found
+
+    def _scope(self, path):
+        """
+        Symbol table seen by the children of the last node in path. Errors in
+        the declarations of the enclosing blocks were already reported when
+        they were checked, so they are dropped (no diagnostics context is
+        given).
+        """
+        scope = None
+        for node in path:
+            if isinstance(node, Block):
+                scope = node._fill_symtable(scope, None)
+            elif isinstance(node, ForLoop):
+                scope = node._update_symtable(scope, None)
+                scope.openLoop(node._variable.getName())
+        return scope
+
+    def _check(self, nodes, path, diagnostics):
+        """
+        Checks nodes as their ancestors in path would: in the scope they see,
+        and looking for modifications of the enclosing for loops' counters.
+        """
+        scope = self._scope(path)
+        loops = []
+        if scope is not None:
+            loops = [loop for loop, read_only in scope.loopStates()]
+        for node in nodes:
+            run(node, '_check', scope, diagnostics)
+            for loop in loops:
+                for error in loop.takeLoopErrors():
+                    diagnostics.add_error(error)
+
+    ############################################################################
+    ################################# Updates ##################################
+    ############################################################################
+
+    def _region(self, record, start, end, line_starts):
+        """
+        Indexes of the first and last instructions of the block in record
+        enclosing the edited range, and the offsets where the region they
+        span starts and ends. None if the whole block must be parsed again (it
+        is damaged, or its declarations were edited).
+        """
+        instructions = record.node._instructions
+        if record.damage is not None or not instructions:
+            return None
+        self._sync_record(record)
+        # The positions of nested blocks are kept by their own records, their
+        # offsets are always up to date.
+        nested = dict([(id(child.node), child.open)
+                       for child in record.children])
+        offsets = []
+        for instruction in instructions:
+            offset = nested.get(id(instruction))
+            if offset is None:
+                offset = self._offset(instruction._position, line_starts)
+            offsets.append(offset)
+        if start < offsets[0]:
+            return None
+        first = bisect_right(offsets, start) - 1
+        last = max(first, bisect_left(offsets, end) - 1)
+        if last + 1 < len(offsets):
+            return (first, last, offsets[first], offsets[last + 1])
+        return (first, last, offsets[first], record.close)
+
+    def _update(self, record, start, end, text, source, line_starts,
+                refresh=True, whole=False):
+        old_line_starts = self._line_starts
+        delta = len(text) - (end - start)
+        after = self._position(end, old_line_starts)
+        new_end = self._position(start + len(text), line_starts)
+        shift = (after, new_end[0] - after[0], new_end[1] - after[1])
+
+        # Region of the source parsed again, in the old source.
+        region = None
+        if not whole:
+            region = self._region(record, start, end, old_line_starts)
+        instructions = record.node._instructions
+        if region is None:
+            region_start = record.open
+            region_end = record.close + 1
+        else:
+            first, last, region_start, region_end = region
+
+        # Parsing and checking the region does not modify the analyzer, so it
+        # is left untouched if they fail.
+        recorder = TokenRecorder(SetlanScanner())
+        recorder.input(source, region_start, region_end + delta)
+        nodes = None
+        errors = []
+        try:
+            if region is None:
+                nodes = [self._parser.parseBlock(recorder)]
+                path = record.path
+            else:
+                nodes = self._parser.parseInstructions(recorder)
+                path = record.path + [record.node]
+        except SetlanException as error:
+            if region is not None:
+                # The instructions may go on after the region (like an else
+                # clause), so the block is parsed as a whole.
+                return self._update(record, start, end, text, source,
+                                    line_starts, refresh, whole=True)
+            if recorder.exhausted or self._closes_early(recorder.tokens):
+                # The closing brace was lost, or another one closes the block
+                # before it, so the block can end anywhere.
+                return self._analyze(source, line_starts)
+            if isinstance(error, SetlanLexicalErrors):
+                # Lexical errors are reported for the whole source, and strings
+                # may run past the end of the block.
+                return self._analyze(source, line_starts)
+            position = None
+            if recorder.tokens:
+                token = recorder.tokens[-1]
+                position = (token.lineno, token.colno)
+            damage = [self._diagnostic(error, position)]
+        else:
+            if region is not None and not self._ends_cleanly(
+                recorder.tokens, source, region_start, region_end + delta,
+                line_starts):
+                return self._update(record, start, end, text, source,
+                                    line_starts, refresh, whole=True)
+            diagnostics = SetlanStaticErrors()
+            self._check(nodes, path, diagnostics)
+            errors = diagnostics.getErrors()
+            closes = self._closes(recorder.tokens, line_starts)
+
+        # Errors found in the region are replaced, the following ones moved.
+        old_region_start = self._position(region_start, old_line_starts)
+        old_region_end = self._position(region_end, old_line_starts)
+        moved = shift[1] != 0 or shift[2] != 0
+        kept = []
+        for position, error in self._errors:
+            if old_region_start <= position < old_region_end:
+                continue
+            if position >= after and moved and (shift[1] != 0 or
+                                                position[0] == after[0]):
+                kept.append((self._shift_position(position, shift),
+                             self._shift_error(error, shift)))
+            else:
+                kept.append((position, error))
+        self._errors = kept
+
+        # Damaged blocks inside the region are parsed again with it.
+        self._damaged = [damaged for damaged in self._damaged
+                         if damaged is not record and
+                         not region_start <= damaged.open < region_end]
+
+        # Block records following the edit are moved. The positions of the
+        # AST nodes are moved when they are needed, the edit is only logged.
+        if region is None:
+            record.children = []
+        else:
+            record.children = [child for child in record.children
+                               if not region_start <= child.open < region_end]
+        self._shift_records(record, end, delta)
+        record.close += delta
+        if moved:
+            self._shifts.append(shift)
+
+        self._source = source
+        self._line_starts = line_starts
+        if nodes is None:
+            record.damage = damage
+            record.children = []
+            self._damaged.append(record)
+        else:
+            record.damage = None
+            self._errors.extend([self._diagnostic(error) for error in errors])
+            if region is None:
+                self._replace(record.path[-1], record.node, nodes[0])
+                record.node = nodes[0]
+                record.synced = len(self._shifts)
+                nested = self._nested_instructions(nodes[0])
+                record.children = self._find_blocks(
+                    nested,
+                    record.path + [nodes[0]],
+                    closes
+                    )
+            else:
+                self._sync_record(record)
+                instructions[first:last + 1] = nodes
+                record.children.extend(self._find_blocks(
+                    nodes,
+                    record.path + [record.node],
+                    closes
+                    ))
+                record.children.sort(key=attrgetter('open'))
+
+        # Errors of other damaged blocks moved by the edit are regenerated.
+        if refresh and moved:
+            edit_end = start + len(text)
+            for damaged in list(self._damaged):
+                if damaged is not record and damaged.open >= edit_end:
+                    self._update(damaged, damaged.close, damaged.close, '',
+                                 source, line_starts, refresh=False)
+
+    def _closes_early(self, tokens):
+        """
+        Tells if the brace opening tokens is closed before their last token.
+        """
+        depth = 0
+        for index, token in enumerate(tokens):
+            if token.type == 'TkOBrace':
+                depth += 1
+            elif token.type == 'TkCBrace':
+                depth -= 1
+                if depth == 0:
+                    return index < len(tokens) - 1
+        return False
+
+    def _ends_cleanly(self, tokens, source, start, end, line_starts):
+        """
+        Tells if the region of source from start to end is lexed as it would
+        be in the whole source: into the given tokens, followed by a token
+        starting at end. Comments, strings and names may run past the end of
+        the region otherwise.
+        """
+        line_end = source.find('\n', end)
+        if line_end == -1:
+            line_end = len(source)
+        scanner = SetlanScanner()
+        scanner.input(source, start, line_end)
+        following = None
+        count = 0
+        try:
+            for token in scanner.tokens():
+                if count == len(tokens):
+                    following = token
+                    break
+                if token != tokens[count]:
+                    return False
+                count += 1
+        except SetlanException:
+            pass
+        if following is None:
+            return False
+        return (following.lineno, following.colno) == self._position(
+            end, line_starts)
+
+    def _shift_records(self, record, end, delta):
+        """
+        Moves the offsets of the block records found after the edit, except
+        for the edited one.
+        """
+        if delta == 0:
+            return
+        stack = list(self._records)
+        while stack:
+            current = stack.pop()
+            if current is record:
+                continue
+            if current.open >= end:
+                current.open += delta
+            if current.close >= end:
+                current.close += delta
+            stack.extend(current.children)
+        if record.open >= end:
+            record.open += delta
+        stack = list(record.children)
+        while stack:
+            current = stack.pop()
+            if current.open >= end:
+                current.open += delta
+            if current.close >= end:
+                current.close += delta
+            stack.extend(current.children)
+
+    def _replace(self, parent, old, new):
+        for name, value in parent.__dict__.iteritems():
+            if value is old:
+                setattr(parent, name, new)
+                return
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    if item is old:
+                        value[index] = new
+                        return
+
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# lexer.py
+#
+# Streaming lexer for the language Setlan. Wraps PLY's lexer
+# so tokens are produced on demand, one at a time, and never
+# kept by the lexer itself.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+from ply import lex
+
+from config import SetlanConfig
+
+from exceptions import (
+    SetlanInputNotDefinedException,
+    SetlanTokensNotDefinedException,
+    SetlanLexicalErrors
+    )
+
+
+class SetlanLexer(SetlanConfig):
+    """
+    Lexer to be used by ply.yacc (through token()) or iterated directly.
+    Lexical errors are accumulated while lexing and raised as a whole, in a
+    SetlanLexicalErrors exception, when the end of the input is reached.
+    """
+
+    def __init__(self, module=None, inputString=None, *args, **kwargs):
+        super(SetlanLexer, self).__init__()
+        if module is None or not hasattr(module, 'tokens'):
+            error = "A module with the lexical specifications must be provided."
+            raise SetlanTokensNotDefinedException(error)
+        self._module = module
+        self._lexer = lex.lex(module=module)
+        self._input = None
+        if inputString is not None:
+            self.input(inputString)
+
+    def __unicode__(self):
+        return "SetlanLexer(%s)" % self._module.__name__
+
+    def __iter__(self):
+        return self.tokens()
+
+    @property
+    def lineno(self):
+        return self._lexer.lineno
+
+    @property
+    def lexpos(self):
+        return self._lexer.lexpos
+
+    def _reset(self, lexer):
+        lexer.lineno = 1
+        lexer.line_start = 0
+        lexer.errors = []
+        lexer.input(self._input)
+
+    def input(self, inputString):
+        self._input = inputString
+        self._reset(self._lexer)
+
+    def token(self):
+        """
+        Returns the next token, or None at the end of the input.
+        """
+        if self._input is None:
+            raise SetlanInputNotDefinedException("No input was provided.")
+        token = self._lexer.token()
+        if token is None and self._lexer.errors:
+            raise SetlanLexicalErrors(self._lexer.errors)
+        return token
+
+    def tokens(self):
+        """
+        Generator of the tokens of the whole input. It lexes on its own copy
+        of the lexer, so it does not interfere with calls to token().
+        """
+        if self._input is None:
+            raise SetlanInputNotDefinedException("No input was provided.")
+        lexer = self._lexer.clone()
+        self._reset(lexer)
+        token = lexer.token()
+        while token is not None:
+            yield token
+            token = lexer.token()
+        if lexer.errors:
+            raise SetlanLexicalErrors(lexer.errors)
+
+    def getTokenList(self):
+        """
+        Materializes every token of the input in a list. Only for callers that
+        explicitly need them all at once; prefer tokens() otherwise.
+        """
+        return list(self.tokens())
@@ -9,7 +9,8 @@
 # ------------------------------------------------------------
 from exceptions import SetlanLexicalError, SetlanValueError
 
-from lib.LexerWrapper import Token
+# PLY's lexer takes the token names from this module.
+from token_specs import reserved, tokens, SetlanToken
 
 ################################################################################
 ############################# Tokens specification #############################
@@ -18,80 +19,26 @@ from lib.LexerWrapper import Token
 # A string containing ignored characters (spaces and tabs)
 t_ignore  = ' \t'
 
-reserved = {
-    'program' : 'TkProgram',
-    'int'     : 'TkInt',
-    'bool'    : 'TkBool',
-    'set'     : 'TkSet',
-    'using'   : 'TkUsing',
-    'in'      : 'TkIn',
-    'scan'    : 'TkScan',
-    'print'   : 'TkPrint',
-    'println' : 'TkPrintLn',
-    'if'      : 'TkIf',
-    'else'    : 'TkElse',
-    'for'     : 'TkFor',
-    'do'      : 'TkDo',
-    'min'     : 'TkMin',
-    'max'     : 'TkMax',
-    'repeat'  : 'TkRepeat',
-    'while'   : 'TkWhile',
-    'or'      : 'TkOr',
-    'and'     : 'TkAnd',
-    'not'     : 'TkNot',
-    'true'    : 'TkTrue',
-    'false'   : 'TkFalse'
-}
-
-tokens = [
-    'TkId',            # Variable Identifier
-    'TkNum',           # Integer inmediate numbers
-    'TkString',        # Strings: "This is a string"
-    'TkOBrace',        # {
-    'TkCBrace',        # }
-    'TkComma',         # ,
-    'TkAssign',        # =
-    'TkSColon',        # ;
-    'TkOPar',          # (
-    'TkCPar',          # )
-    'TkPlus',          # +
-    'TkMinus',         # - and unary minus (as in -42)
-    'TkTimes',         # *
-    'TkDiv',           # /
-    'TkMod',           # %
-    'TkUnion',         # ++
-    'TkDiff',          # \
-    'TkInter',         # ><
-    'TkSPlus',         # <+>
-    'TkSMinus',        # <->
-    'TkSTimes',        # <*>
-    'TkSDiv',          # </>
-    'TkSMod',          # <%>
-    'TkGetMin',        # <?
-    'TkGetMax',        # >?
-    'TkSize',          # $?
-    'TkGreat',         # >
-    'TkGreatOrEq',     # >=
-    'TkLess',          # <
-    'TkLessOrEq',      # <=
-    'TkEquals',        # ==
-    'TkNotEq',         # /=
-    'TkIsIn'           # @
-] + list(reserved.values())
-
-# Some helpers for traking line and column numbers
+# Some helpers for traking line and column numbers. The lexer keeps the offset
+# where the current line starts (line_start), so columns are found without
+# scanning the input backwards. Every token record carries its column, so it
+# is computed eagerly, rather than lazily from a table of every line start.
 def t_newline(t):
     r'\n+'
     t.lexer.lineno += len(t.value)
+    t.lexer.line_start = t.lexpos + len(t.value)
 
-def find_column(input,token):
-    last_cr = input.rfind('\n',0,token.lexpos)
-    if last_cr < 0:
-        last_cr = 0
-    plus = 0
-    if token.lineno == 1: plus += 1
-    column = (token.lexpos - last_cr) + plus
-    return column
+def current_column(token):
+    """
+    Column of a token in the line currently being lexed. O(1).
+    """
+    return token.lexpos - getattr(token.lexer, 'line_start', 0) + 1
+
+def new_token(t):
+    """
+    Compact record of a matched token, the same the scanner produces.
+    """
+    return SetlanToken(t.type, t.value, t.lineno, t.colno)
 
 # Comments specifications which are ignored
 def t_COMMENT(t):
@@ -102,18 +49,19 @@ def t_COMMENT(t):
 
 def t_TkId(t):
     r'[a-zA-Z][a-zA-Z0-9_]*'
-    t.colno = find_column(t.lexer.lexdata,t)
+    t.colno = current_column(t)
+    t.value = intern(t.value)                # Shared by every occurrence
     t.type = reserved.get(t.value,'TkId')    # Check for reserved words
-    return Token(t)
+    return new_token(t)
 
 def t_TkString(t):
     r'"([^"\\\n\r]|\\.)*"'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkNum(t):
     r'[0-9]+'
-    t.colno = find_column(t.lexer.lexdata,t)
+    t.colno = current_column(t)
     try:
         t.value = int(t.value)
     except ValueError:
@@ -123,165 +71,166 @@ def t_TkNum(t):
         t.lexer.errors.append(SetlanValueError(message))
         import sys
         t.value = sys.maxint
-    return Token(t)
+    return new_token(t)
 
 def t_TkOBrace(t):
     r'\{'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkCBrace(t):
     r'\}'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkOPar(t):
     r'\('
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkCPar(t):
     r'\)'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkComma(t):
     r','
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkSColon(t):
     r';'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkSPlus(t):
     r'<\+>'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkSMinus(t):
     r'<->'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkSTimes(t):
     r'<\*>'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkSDiv(t):
     r'</>'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkSMod(t):
     r'<%>'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkUnion(t):
     r'\+\+'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkPlus(t):
     r'\+'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkMinus(t):
     r'-'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkTimes(t):
     r'\*'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkNotEq(t):
     r'/='
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkDiv(t):
     r'/'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkMod(t):
     r'%'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkDiff(t):
     r'\\'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkInter(t):
     r'><'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkGetMax(t):
     r'>\?'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkGetMin(t):
     r'<\?'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkSize(t):
     r'\$\?'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkEquals(t):
     r'=='
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkGreatOrEq(t):
     r'>='
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkLessOrEq(t):
     r'<='
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkGreat(t):
     r'>'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkLess(t):
     r'<'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkAssign(t):
     r'='
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 def t_TkIsIn(t):
     r'@'
-    t.colno = find_column(t.lexer.lexdata,t)
-    return Token(t)
+    t.colno = current_column(t)
+    return new_token(t)
 
 # Error handling rule
 def t_error(t):
-    t.colno = find_column(t.lexer.lexdata,t)
+    t.colno = current_column(t)
     if not hasattr(t.lexer, 'errors'):
         t.lexer.errors = []
     message = "In line %d, column %d: Unexpected character '%s'." % (t.lineno, t.colno, t.value[0])
-    t.lexer.errors.append(SetlanLexicalError(message))
+    t.lexer.errors.append(SetlanLexicalError(message,
+                                             position=(t.lineno, t.colno)))
     t.lexer.skip(1)
 ################################################################################
 ######################### End of Tokens specification ##########################
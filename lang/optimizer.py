@@ -0,0 +1,498 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# optimizer.py
+#
+# Optimization passes over statically checked Setlan ASTs, run
+# before they are executed. The passes only annotate the nodes
+# with faster ways to evaluate them, so the trees are dumped,
+# serialized and cached as they were parsed, and programs give
+# the same output and report the same errors, at the same
+# positions.
+#
+# The range analysis bounds the integers that expressions and
+# for loop counters can take, and the nodes whose results are
+# proven to fit in 32 bits skip their overflow checks. The
+# expressions of loops whose variables are not modified in them
+# are evaluated at most once each time their loops are entered.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+from config import SetlanConfig
+
+from exceptions import SetlanException
+
+from ast import Expression, SameTypeBinaryExpression, Variable, Block, \
+                Loop, ForLoop, Assignment, Input, Number, Set, Sum, Subtraction, \
+                Times, Division, Modulus, Minus, Union, Intersection, \
+                Difference, SetSum, SetSubtraction, SetTimes, SetDivision, \
+                SetModulus
+
+# Range of the integers of Setlan.
+MIN_INT = -2147483648
+MAX_INT = 2147483647
+FULL = (MIN_INT, MAX_INT)
+
+
+# Bounds of the results of the operations, given the bounds of their
+# operands.
+
+def _sum_range(left, right):
+    return (left[0] + right[0], left[1] + right[1])
+
+
+def _subtraction_range(left, right):
+    return (left[0] - right[1], left[1] - right[0])
+
+
+def _times_range(left, right):
+    corners = [a * b for a in left for b in right]
+    return (min(corners), max(corners))
+
+
+def _division_range(left, right):
+    if right[0] > 0 or right[1] < 0:
+        corners = [a / b for a in left for b in right]
+        return (min(corners), max(corners))
+    # Dividing by zero fails, and by any other integer does not grow the
+    # dividend.
+    bound = max(abs(left[0]), abs(left[1]))
+    return (-bound, bound)
+
+
+def _modulus_range(left, right):
+    # The remainders take the sign of the divisor, and are smaller.
+    if right[0] > 0:
+        if left[0] >= 0:
+            return (0, min(right[1] - 1, left[1]))
+        return (0, right[1] - 1)
+    if right[1] < 0:
+        return (right[0] + 1, 0)
+    # Dividing by zero fails.
+    bound = max(abs(right[0]), abs(right[1]), 1) - 1
+    return (-bound, bound)
+
+
+def _minus_range(operand):
+    return (-operand[1], -operand[0])
+
+
+def _union_range(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return (min(left[0], right[0]), max(left[1], right[1]))
+
+
+def _intersection_range(left, right):
+    if left is None or right is None:
+        return None
+    low, high = max(left[0], right[0]), min(left[1], right[1])
+    if low > high:
+        return None
+    return (low, high)
+
+
+def _difference_range(left, right):
+    return left
+
+
+# Operations over integers.
+INTEGER_OPERATIONS = {
+    Sum         : _sum_range,
+    Subtraction : _subtraction_range,
+    Times       : _times_range,
+    Division    : _division_range,
+    Modulus     : _modulus_range,
+    Minus       : _minus_range
+    }
+
+# Operations of an integer with each element of a set.
+ELEMENT_OPERATIONS = {
+    SetSum         : _sum_range,
+    SetSubtraction : _subtraction_range,
+    SetTimes       : _times_range,
+    SetDivision    : _division_range,
+    SetModulus     : _modulus_range
+    }
+
+# Operations over sets.
+SET_OPERATIONS = {
+    Union        : _union_range,
+    Intersection : _intersection_range,
+    Difference   : _difference_range
+    }
+
+
+class SetlanOptimizer(SetlanConfig):
+    """
+    Runs the optimization passes over checked trees. Trees with static errors
+    must not be optimized.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(SetlanOptimizer, self).__init__()
+        self._errors = []
+        self._checks = 0
+        self._removed = 0
+        self._hoisted = 0
+
+    def __unicode__(self):
+        return "SetlanOptimizer"
+
+    def optimize(self, ast):
+        """
+        Optimizes ast, in place, and returns it.
+        """
+        expressions = list(self._expressions(ast))
+        for expression in expressions:
+            self._fold(expression)
+        self._check_ranges(ast)
+        self._hoist(ast)
+        for expression in expressions:
+            self._flatten(expression)
+        return ast
+
+    def getErrors(self):
+        """
+        Errors that evaluating the constant expressions of the optimized
+        programs raises (overflows, divisions by zero, empty sets), found while
+        folding them. They are still raised if and when the expressions are
+        evaluated.
+        """
+        return self._errors
+
+    def getCheckCounts(self):
+        """
+        Number of overflow checks the range analysis removed, and number of
+        overflow checks left in the optimized programs before it, as a pair.
+        """
+        return self._removed, self._checks
+
+    def getHoistedCount(self):
+        """
+        Number of loop invariant expressions of the optimized programs.
+        """
+        return self._hoisted
+
+    def _expressions(self, ast):
+        """
+        The outermost expressions of ast, in the order they appear.
+        """
+        stack = [ast]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Expression):
+                yield node
+            else:
+                stack.extend(reversed(node._children()))
+
+    ############################################################################
+    ############################### Folding ####################################
+    ############################################################################
+
+    def _fold(self, expression):
+        # The nodes are folded in postorder, each one with the values of its
+        # operands, computed by its own evaluation step. Nodes whose evaluation
+        # fails are left to fail when evaluated, as well as the ones above.
+        nodes = []
+        stack = [expression]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(node._operands())
+        for node in reversed(nodes):
+            if node.__class__ is Variable:
+                continue
+            values = []
+            for operand in node._operands():
+                if operand._folded is None:
+                    break
+                values.append(operand._folded)
+            else:
+                try:
+                    node._step(values, None)
+                except SetlanException as error:
+                    self._errors.append(error)
+                    continue
+                value = values[-1]
+                if value.__class__ is set:
+                    value = frozenset(value)
+                node.fold(value)
+
+    ############################################################################
+    ######################## Loop invariant expressions ########################
+    ############################################################################
+
+    def _hoist(self, ast):
+        # The expressions are visited with the loops around them, from the
+        # outermost one, and the variables modified in each one.
+        variables = self._loop_variables(ast)
+        stack = [(ast, ())]
+        while stack:
+            node, loops = stack.pop()
+            if isinstance(node, Expression):
+                if loops:
+                    self._hoist_expression(node, loops)
+                continue
+            children = node._children()
+            if isinstance(node, Loop):
+                inner = loops + ((node, variables[id(node)]),)
+                if node.__class__ is ForLoop:
+                    # The set is evaluated once, when the loop is entered.
+                    stack.append((node._set, loops))
+                    children = ()
+                    if node._instruction is not None:
+                        children = (node._instruction,)
+                loops = inner
+            for child in reversed(children):
+                stack.append((child, loops))
+
+    def _loop_variables(self, ast):
+        """
+        Names of the variables modified in each loop of ast (assigned, read,
+        or declared in it, as they are declared again in each iteration, and
+        the counters of for loops), by the id of the loop.
+        """
+        variables = {}
+        names = [set()]
+        stack = [ast]
+        while stack:
+            node = stack.pop()
+            if node.__class__ is tuple:
+                # Every node of the loop was visited.
+                loop_names = names.pop()
+                variables[id(node[0])] = loop_names
+                names[-1].update(loop_names)
+                continue
+            node_class = node.__class__
+            if node_class is Assignment or node_class is Input:
+                names[-1].add(node._variable.getName())
+                continue
+            if node_class is Block:
+                for declaration in node._declarations or ():
+                    for variable in declaration._variables:
+                        names[-1].add(variable.getName())
+            elif isinstance(node, Loop):
+                names.append(set())
+                if node_class is ForLoop:
+                    names[-1].add(node._variable.getName())
+                stack.append((node,))
+            for child in reversed(node._children()):
+                if not isinstance(child, Expression):
+                    stack.append(child)
+        return variables
+
+    def _hoist_expression(self, expression, loops):
+        # The nodes are listed with their parents first. Each one is invariant
+        # in the outermost loop that does not modify its variables, and in the
+        # ones inside it. The ones that are invariant in loops further out
+        # than their parents keep their values.
+        if expression.__class__ is Variable:
+            return
+        nodes = [expression]
+        parents = [None]
+        index = 0
+        while index < len(nodes):
+            node = nodes[index]
+            if node._folded is None:
+                for operand in node._operands():
+                    nodes.append(operand)
+                    parents.append(index)
+            index += 1
+        names = [set() for node in nodes]
+        for index in xrange(len(nodes) - 1, 0, -1):
+            node = nodes[index]
+            if node.__class__ is Variable:
+                names[index].add(node.getName())
+            names[parents[index]].update(names[index])
+        owners = []
+        for index, node in enumerate(nodes):
+            owner = None
+            for depth, (loop, modified) in enumerate(loops):
+                if names[index].isdisjoint(modified):
+                    owner = depth
+                    break
+            owners.append(owner)
+            if owner is None or node._folded is not None \
+               or not node._operands():
+                continue
+            parent = parents[index]
+            if parent is None or owners[parent] is None or \
+               owner < owners[parent]:
+                loops[owner][0].addInvariant(node)
+                self._hoisted += 1
+
+    ############################################################################
+    ############################## Flattening ##################################
+    ############################################################################
+
+    def _flatten(self, expression):
+        # Chains of associative operations (sums, products, unions,
+        # intersections, conjunctions and disjunctions) are evaluated in one
+        # step over all of their operands.
+        stack = [expression]
+        while stack:
+            node = stack.pop()
+            if node._folded is not None:
+                continue
+            if isinstance(node, SameTypeBinaryExpression):
+                stack.extend(node.flatten())
+            else:
+                stack.extend(node._operands())
+
+    ############################################################################
+    ############################# Range analysis ###############################
+    ############################################################################
+
+    # Integers are bounded by intervals, (low, high) pairs, and sets by the
+    # interval of their elements, or None if they are known to be empty.
+    # Values that are not bounded (as the ones of variables, which may be
+    # read from the input) take the full range, as they were checked when
+    # stored. The result of a node that keeps its check fits in 32 bits too,
+    # or its evaluation fails, so it is bounded by the full range at most.
+
+    def _check_ranges(self, ast):
+        # The instructions are visited with the ranges of the counters of the
+        # for loops around them. Declarations shadow the counters.
+        stack = [(ast, {})]
+        while stack:
+            node, counters = stack.pop()
+            if isinstance(node, Expression):
+                self._range(node, counters)
+            elif node.__class__ is Block:
+                inner = counters
+                for declaration in node._declarations or ():
+                    for variable in declaration._variables:
+                        if variable.getName() in inner:
+                            if inner is counters:
+                                inner = dict(counters)
+                            del inner[variable.getName()]
+                for child in reversed(node._children()):
+                    stack.append((child, inner))
+            elif node.__class__ is ForLoop:
+                # The counter takes the elements of the set, which were
+                # checked when the set was built.
+                elements = self._range(node._set, counters)
+                self._count(node, True)
+                if node._instruction is not None:
+                    inner = dict(counters)
+                    inner[node._variable.getName()] = elements or FULL
+                    stack.append((node._instruction, inner))
+            elif node.__class__ is Assignment:
+                # Integers and booleans fit once evaluated. The checks of sets
+                # are kept.
+                self._range(node._value, counters)
+                if not node._value.getType().isSet():
+                    self._count(node, True)
+            elif node.__class__ is Input:
+                self._checks += 1
+            else:
+                for child in reversed(node._children()):
+                    stack.append((child, counters))
+
+    def _count(self, node, fits):
+        self._checks += 1
+        if fits:
+            node.skipOverflowCheck()
+            self._removed += 1
+
+    def _range(self, expression, counters):
+        """
+        Bounds the values of the nodes of expression in postorder, skipping
+        the checks of the ones that fit, and returns the bound of expression.
+        """
+        nodes = []
+        stack = [expression]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            if node._folded is None:
+                stack.extend(node._operands())
+        ranges = []
+        for node in reversed(nodes):
+            if node._folded is not None:
+                ranges.append(self._folded_range(node._folded))
+                continue
+            count = len(node._operands())
+            operands = ranges[len(ranges) - count:]
+            del ranges[len(ranges) - count:]
+            ranges.append(self._node_range(node, operands, counters))
+        return ranges[-1]
+
+    def _folded_range(self, value):
+        if value.__class__ is frozenset:
+            if not value:
+                return None
+            return (min(value), max(value))
+        if value.__class__ is bool:
+            return None
+        return (value, value)
+
+    def _node_range(self, node, operands, counters):
+        node_class = node.__class__
+        if node_class is Set:
+            return self._set_range(node, operands)
+        if node_class is Number:
+            # Only the numbers that do not fit are left unfolded.
+            self._count(node, False)
+            return FULL
+        type_class = node.getType()
+        if type_class.isBool():
+            return None
+        if not (type_class.isInt() or type_class.isSet()):
+            # The elements of set literals are not checked, so nothing is
+            # known of their nodes.
+            if node_class in INTEGER_OPERATIONS or \
+               node_class in ELEMENT_OPERATIONS:
+                self._count(node, False)
+            return FULL
+        if node_class is Variable:
+            if type_class.isInt():
+                return counters.get(node.getName(), FULL)
+            return FULL
+        operation = INTEGER_OPERATIONS.get(node_class)
+        if operation is not None:
+            return self._checked_range(node, operation(*operands))
+        operation = ELEMENT_OPERATIONS.get(node_class)
+        if operation is not None:
+            integer, elements = operands
+            if elements is None:
+                self._count(node, True)
+                return None
+            return self._checked_range(node, operation(integer, elements))
+        operation = SET_OPERATIONS.get(node_class)
+        if operation is not None:
+            return operation(*operands)
+        return FULL
+
+    def _set_range(self, node, operands):
+        if node._packed is not None:
+            return (min(node._packed), max(node._packed))
+        if not operands:
+            return None
+        # Integer elements were checked (or proven to fit) by their own nodes,
+        # but the elements are not checked statically, and may be of any type.
+        for element in node._operands():
+            if element._folded is None:
+                integer = element.getType().isInt()
+            else:
+                integer = element._folded.__class__ in (int, long)
+            if not integer:
+                self._count(node, False)
+                return FULL
+        self._count(node, True)
+        return (min([low for low, high in operands]),
+                max([high for low, high in operands]))
+
+    def _checked_range(self, node, bound):
+        low, high = bound
+        fits = MIN_INT <= low and high <= MAX_INT
+        self._count(node, fits)
+        if fits:
+            return bound
+        low, high = max(low, MIN_INT), min(high, MAX_INT)
+        if low > high:
+            return FULL
+        return (low, high)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# parallel_lexer.py
+#
+# Parallel lexer for very large Setlan programs. The input is
+# split in chunks at line breaks, the chunks are lexed in a
+# pool of processes with the rules of the lexical
+# specifications module, and their tokens and lexical errors
+# are joined back in order. Line and column numbers are those
+# of the whole input, so the result is the same as the one of
+# the sequential lexer (lexer.py).
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+import multiprocessing
+
+from array import array
+from functools import partial
+from itertools import izip
+
+from ply import lex
+
+from config import SetlanConfig
+
+from exceptions import (
+    SetlanInputNotDefinedException,
+    SetlanTokensNotDefinedException,
+    SetlanLexicalErrors
+    )
+
+from token_specs import SetlanToken
+
+################################################################################
+################################ Pool workers ##################################
+################################################################################
+
+# Lexer and input of each worker process, set once when the pool starts. Forked
+# workers inherit the input (even a memory mapped one) without copying it.
+_worker = {}
+
+
+def _init_worker(module_name, data):
+    module = __import__(module_name, fromlist=['tokens'])
+    _worker['lexer'] = lex.lex(module=module)
+    _worker['types'] = dict([(name, index)
+                             for index, name in enumerate(module.tokens)])
+    _worker['data'] = data
+
+
+def _lex_chunk(chunk):
+    """
+    Lexes the region [start, end) of the input, which starts a line numbered
+    lineno. Returns its tokens, by columns (the indexes of their types in the
+    tokens list, their values, lines and columns), which are much cheaper to
+    send back than token records, and its lexical errors.
+    """
+    start, end, lineno = chunk
+    lexer = _worker['lexer']
+    # Only the chunk is copied, as PLY's lexer copies the rest of its input
+    # on every lexical error.
+    lexer.input(_worker['data'][start:end])
+    lexer.lineno = lineno
+    lexer.line_start = 0
+    lexer.errors = []
+    type_index = _worker['types']
+    types = array('B')
+    values = []
+    linenos = array('l')
+    colnos = array('l')
+    token = lexer.token()
+    while token is not None:
+        types.append(type_index[token.type])
+        values.append(token.value)
+        linenos.append(token.lineno)
+        colnos.append(token.colno)
+        token = lexer.token()
+    return (types, values, linenos, colnos), lexer.errors
+
+################################################################################
+############################### Parallel lexer #################################
+################################################################################
+
+
+class SetlanParallelLexer(SetlanConfig):
+    """
+    Lexer with the same interface as SetlanLexer, which lexes the input in
+    chunks, in parallel. Every line break is a safe place to split the input:
+    neither string literals nor comments can span lines, so no token does.
+    Tokens are handed out as soon as the chunks before them are lexed, and
+    the lexical errors of every chunk are raised together, in a
+    SetlanLexicalErrors exception, when the end of the input is reached.
+    """
+
+    def __init__(self, module=None, inputString=None, workers=None,
+                 chunk_size=None, *args, **kwargs):
+        super(SetlanParallelLexer, self).__init__()
+        if module is None or not hasattr(module, 'tokens'):
+            error = "A module with the lexical specifications must be provided."
+            raise SetlanTokensNotDefinedException(error)
+        self._module = module
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self._workers = workers
+        if chunk_size is None:
+            chunk_size = self.PARALLEL_LEX_CHUNK_SIZE
+        self._chunk_size = chunk_size
+        self._input = None
+        self._stream = None
+        self.lineno = 1
+        self.lexpos = 0
+        if inputString is not None:
+            self.input(inputString)
+
+    def __unicode__(self):
+        return "SetlanParallelLexer(%s)" % self._module.__name__
+
+    def __iter__(self):
+        return self.tokens()
+
+    def input(self, inputString):
+        self._input = inputString
+        self._stream = self.tokens()
+
+    def token(self):
+        """
+        Returns the next token, or None at the end of the input.
+        """
+        if self._input is None:
+            raise SetlanInputNotDefinedException("No input was provided.")
+        return next(self._stream, None)
+
+    def tokens(self):
+        """
+        Generator of the tokens of the whole input, independent from token().
+        """
+        if self._input is None:
+            raise SetlanInputNotDefinedException("No input was provided.")
+        return self._lex(self._input)
+
+    def getTokenList(self):
+        return list(self.tokens())
+
+    def _chunks(self, data):
+        """
+        Generator of the (start, end, lineno) regions of data, of about
+        chunk_size bytes each, ending after a line break.
+        """
+        start = 0
+        lineno = 1
+        length = len(data)
+        while start < length:
+            end = data.find('\n', start + self._chunk_size)
+            if end < 0:
+                end = length
+            else:
+                end += 1
+            yield (start, end, lineno)
+            # Mapped inputs have no count(), so the chunk is sliced.
+            lineno += data[start:end].count('\n')
+            start = end
+
+    def _lex(self, data):
+        token_names = list(self._module.tokens)
+        type_name = token_names.__getitem__
+        identifier = token_names.index('TkId')
+        new_token = partial(tuple.__new__, SetlanToken)
+        errors = []
+        pool = multiprocessing.Pool(self._workers, _init_worker,
+                                    (self._module.__name__, data))
+        try:
+            for columns, chunk_errors in pool.imap(_lex_chunk,
+                                                   self._chunks(data)):
+                types, values, linenos, colnos = columns
+                errors.extend(chunk_errors)
+                # Identifiers interned by a worker are unpickled as new
+                # strings, so they are interned again to be shared by every
+                # chunk.
+                values = [intern(value) if kind == identifier else value
+                          for kind, value in izip(types, values)]
+                tokens = map(new_token, izip(map(type_name, types), values,
+                                             linenos, colnos))
+                if tokens:
+                    self.lineno = linenos[-1]
+                for token in tokens:
+                    yield token
+        finally:
+            pool.terminate()
+        self.lexpos = len(data)
+        if errors:
+            raise SetlanLexicalErrors(errors)
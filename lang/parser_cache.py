@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# parser_cache.py
+#
+# Persistent cache for the LALR tables generated by ply.yacc
+# from the Setlan grammar. Tables are stored in a cache
+# directory, keyed by a hash of the grammar specification, so
+# they are only rebuilt when the grammar actually changes.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+import os
+import types
+import hashlib
+
+from stat import S_IWGRP, S_IWOTH
+
+from ply import yacc
+
+from config import SetlanConfig
+
+
+class SetlanParserCache(SetlanConfig):
+    """
+    Builds PLY parsers for a grammar module, reusing the LALR tables stored
+    in a cache directory whenever the grammar has not changed.
+
+    Tables are pickles, and unpickling runs code, so the cache directory is
+    created private to its user (PARSER_CACHE_MODE), and tables are only
+    loaded when neither they nor the directory can be written by other users.
+    """
+
+    TABLE_PREFIX = 'parsetab-'
+    TABLE_SUFFIX = '.pickle'
+
+    def __init__(self, module, cache_dir=None, *args, **kwargs):
+        """
+        Params:
+            module    :
+                type : python module with the grammar specification
+                       (tokens, precedence, start and p_* functions).
+            cache_dir :
+                type : string. Directory where tables are stored. If not
+                       given, the environment variable SETLAN_CACHE_DIR is
+                       used, and then SetlanConfig.PARSER_CACHE_DIR.
+        """
+        super(SetlanParserCache, self).__init__()
+        self._module = module
+        if cache_dir is None:
+            cache_dir = os.environ.get(self.PARSER_CACHE_ENV,
+                                       self.PARSER_CACHE_DIR)
+        self._cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self._grammar_hash = None
+
+    def __unicode__(self):
+        return "SetlanParserCache(%s)" % self.getTablePath()
+
+    def getCacheDir(self):
+        return self._cache_dir
+
+    def grammarHash(self):
+        """
+        Hash of everything in the grammar module that affects the generated
+        tables: tokens, precedence, start symbol and the productions declared
+        in the p_* functions' docstrings. The PLY version is included too, as
+        the pickled table format depends on it.
+        """
+        if self._grammar_hash is None:
+            module = self._module
+            digest = hashlib.sha1()
+            digest.update(yacc.__version__)
+            digest.update(repr(sorted(getattr(module, 'tokens', []))))
+            digest.update(repr(getattr(module, 'precedence', ())))
+            digest.update(repr(getattr(module, 'start', None)))
+            for name in sorted(dir(module)):
+                if name.startswith('p_') and name != 'p_error':
+                    function = getattr(module, name)
+                    digest.update(name)
+                    digest.update(function.__doc__ or '')
+            self._grammar_hash = digest.hexdigest()
+        return self._grammar_hash
+
+    def getTablePath(self):
+        name = "%s%s%s" % (
+            self.TABLE_PREFIX,
+            self.grammarHash(),
+            self.TABLE_SUFFIX
+            )
+        return os.path.join(self._cache_dir, name)
+
+    def getParser(self):
+        """
+        Returns a parser for the grammar module. Cached tables are loaded
+        without writing debug files nor validating the grammar again; if they
+        are missing, they are generated and stored in the cache.
+        """
+        table_path = self.getTablePath()
+        if self._trusted_path(self._cache_dir) and \
+           self._trusted_path(table_path):
+            try:
+                return yacc.yacc(
+                    module=self._module,
+                    debug=False,
+                    optimize=True,
+                    picklefile=table_path,
+                    errorlog=yacc.NullLogger()
+                    )
+            except Exception:
+                # A corrupt or outdated table: it is generated again.
+                self._remove(table_path)
+        return self._build(table_path)
+
+    def _trusted_path(self, path):
+        """
+        Whether the given path exists, is owned by the current user, and
+        neither its group nor others can write it.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return (stat.st_uid == os.getuid() and
+                not stat.st_mode & (S_IWGRP | S_IWOTH))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _build(self, table_path):
+        """
+        Generates the tables and stores them atomically: they are pickled to a
+        new file in a private temporary directory inside the cache directory,
+        which is then renamed to its final name, so concurrent processes never
+        read a half written table. The file must not exist beforehand, as
+        yacc tries to read the tables from it first.
+        """
+        # Only needed on a cache miss, and slow to import.
+        import shutil
+        import tempfile
+        try:
+            if not os.path.isdir(self._cache_dir):
+                os.makedirs(self._cache_dir, self.PARSER_CACHE_MODE)
+            tmp_dir = tempfile.mkdtemp(
+                prefix=self.TABLE_PREFIX,
+                suffix='.tmp',
+                dir=self._cache_dir
+                )
+        except (IOError, OSError):
+            # The cache is not writable: build the tables in memory only. An
+            # empty table module is given, or yacc would import any parsetab
+            # module found in the path and use its tables.
+            return yacc.yacc(
+                module=self._module,
+                debug=False,
+                tabmodule=types.ModuleType('setlan_no_parsetab'),
+                write_tables=False
+                )
+        tmp_path = os.path.join(tmp_dir, os.path.basename(table_path))
+        try:
+            parser = yacc.yacc(
+                module=self._module,
+                debug=False,
+                picklefile=tmp_path
+                )
+            os.rename(tmp_path, table_path)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._remove_stale_tables(table_path)
+        return parser
+
+    def _remove_stale_tables(self, table_path):
+        """
+        Removes tables generated for previous versions of the grammar.
+        """
+        current = os.path.basename(table_path)
+        try:
+            entries = os.listdir(self._cache_dir)
+        except OSError:
+            return
+        for entry in entries:
+            if (entry != current and entry.startswith(self.TABLE_PREFIX) and
+                entry.endswith(self.TABLE_SUFFIX)):
+                self._remove(os.path.join(self._cache_dir, entry))
@@ -0,0 +1,461 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# pratt_parser.py
+#
+# Hand written parser for the language Setlan. Instructions
+# are parsed by recursive descent and expressions by
+# precedence climbing, following the precedence table from
+# syntax_specs.py. It builds the same AST than the PLY parser
+# and reports syntax errors through the same p_error function,
+# without using PLY at all. Nesting is handled with explicit
+# stacks instead of Python recursion, so programs of any depth
+# (nested blocks, parentheses or prefix operators) are parsed,
+# as with the PLY parser.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+from types import GeneratorType
+
+from config import SetlanConfig
+
+from type import IntegerType, BooleanType, SetType
+
+from ast import *
+
+from syntax_specs import precedence, p_error
+
+# Node built for each binary operator token. Their precedence levels and
+# associativity are taken from syntax_specs.precedence.
+binary_operators = {
+    'TkPlus'      : Sum,
+    'TkMinus'     : Subtraction,
+    'TkTimes'     : Times,
+    'TkDiv'       : Division,
+    'TkMod'       : Modulus,
+    'TkUnion'     : Union,
+    'TkDiff'      : Difference,
+    'TkInter'     : Intersection,
+    'TkSPlus'     : SetSum,
+    'TkSMinus'    : SetSubtraction,
+    'TkSTimes'    : SetTimes,
+    'TkSDiv'      : SetDivision,
+    'TkSMod'      : SetModulus,
+    'TkGreat'     : GreaterThan,
+    'TkGreatOrEq' : GreaterOrEqual,
+    'TkLess'      : LessThan,
+    'TkLessOrEq'  : LessOrEqual,
+    'TkEquals'    : Equals,
+    'TkNotEq'     : NotEquals,
+    'TkAnd'       : And,
+    'TkOr'        : Or,
+    'TkIsIn'      : IsIn
+}
+
+# Node built for each prefix operator token, and the name its precedence has
+# in syntax_specs.precedence (the unary minus uses %prec UMINUS).
+unary_operators = {
+    'TkMinus'  : (Minus, 'UMINUS'),
+    'TkNot'    : (Not, 'TkNot'),
+    'TkGetMax' : (GetMax, 'TkGetMax'),
+    'TkGetMin' : (GetMin, 'TkGetMin'),
+    'TkSize'   : (GetSize, 'TkSize')
+}
+
+# Tokens that can start an operand, besides the prefix operators.
+operands = ('TkId', 'TkNum', 'TkTrue', 'TkFalse', 'TkOPar', 'TkOBrace')
+
+# Kinds of the entries of the stack of _expression: prefix and binary
+# operators waiting for their (right) operand, and open parentheses and sets.
+UNARY, BINARY, PAREN, SET = range(4)
+
+types = {
+    'TkInt'  : IntegerType,
+    'TkBool' : BooleanType,
+    'TkSet'  : SetType
+}
+
+
+class SetlanPrattParser(SetlanConfig):
+    """
+    Parser with the same interface as the ones built by ply.yacc: parse()
+    pulls the tokens from the given lexer and returns the Setlan AST.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(SetlanPrattParser, self).__init__()
+        levels = {}
+        for level, rule in enumerate(precedence):
+            for name in rule[1:]:
+                levels[name] = (level + 1, rule[0])
+        self._binary = {}
+        for name, node_class in binary_operators.iteritems():
+            level, assoc = levels[name]
+            self._binary[name] = (level, assoc, node_class)
+        self._unary = {}
+        for name, (node_class, prec_name) in unary_operators.iteritems():
+            level, assoc = levels[prec_name]
+            self._unary[name] = (level, assoc, node_class)
+        self._instructions = {
+            'TkId'      : self._assignment,
+            'TkOBrace'  : self._block,
+            'TkScan'    : self._input,
+            'TkPrint'   : self._output,
+            'TkPrintLn' : self._output,
+            'TkIf'      : self._conditional,
+            'TkFor'     : self._for,
+            'TkWhile'   : self._while,
+            'TkRepeat'  : self._repeat
+        }
+        self._lexer = None
+        self._token = None
+
+    def __unicode__(self):
+        return "SetlanPrattParser"
+
+    def parse(self, lexer=None, *args, **kwargs):
+        """
+        Parses the tokens provided by lexer. Keyword arguments meant for PLY's
+        parsers, like tracking, are accepted and ignored.
+        """
+        self._lexer = lexer
+        self._token = lexer.token()
+        try:
+            return self._program()
+        finally:
+            self._lexer = None
+            self._token = None
+
+    def parseBlock(self, lexer):
+        """
+        Parses the tokens provided by lexer as a single block instruction,
+        which must span the whole input. Used to parse again only a region of
+        a program.
+        """
+        self._lexer = lexer
+        self._token = lexer.token()
+        try:
+            if not self._is('TkOBrace'):
+                self._error()
+            block = self._instruction()
+            if self._token is not None:
+                self._error()
+            return block
+        finally:
+            self._lexer = None
+            self._token = None
+
+    def parseInstructions(self, lexer):
+        """
+        Parses the tokens provided by lexer as a list of instructions, each one
+        followed by a semicolon, as they appear inside a block.
+        """
+        self._lexer = lexer
+        self._token = lexer.token()
+        try:
+            instructions = []
+            while self._token is not None:
+                instructions.append(self._instruction())
+                self._expect('TkSColon')
+            return instructions
+        finally:
+            self._lexer = None
+            self._token = None
+
+    ############################################################################
+    ################################ Helpers ###################################
+    ############################################################################
+
+    def _advance(self):
+        token = self._token
+        self._token = self._lexer.token()
+        return token
+
+    def _is(self, type):
+        return self._token is not None and self._token.type == type
+
+    def _expect(self, type):
+        if self._token is None or self._token.type != type:
+            self._error()
+        return self._advance()
+
+    def _error(self):
+        p_error(self._token)
+
+    def _position(self, token):
+        return (token.lineno, token.lexpos)
+
+    ############################################################################
+    ############################## Instructions ################################
+    ############################################################################
+
+    def _program(self):
+        token = self._expect('TkProgram')
+        instruction = self._instruction()
+        if self._token is not None:
+            self._error()
+        return Setlan(instruction, position=self._position(token))
+
+    def _instruction(self):
+        """
+        Parses an instruction. The rules of instructions that hold others are
+        generators: they yield None to have the next instruction parsed and
+        sent back to them, and then yield their own node. The rules waiting
+        for a nested instruction are kept in an explicit stack.
+        """
+        stack = []
+        value = self._rule()
+        while True:
+            if value.__class__ is GeneratorType:
+                stack.append(value)
+                request = value.next()
+            elif stack:
+                request = stack[-1].send(value)
+            else:
+                return value
+            while request is not None:
+                stack.pop()
+                if not stack:
+                    return request
+                request = stack[-1].send(request)
+            value = self._rule()
+
+    def _rule(self):
+        """
+        Node of the instruction starting at the current token, or the
+        generator of its rule.
+        """
+        if self._token is None:
+            self._error()
+        rule = self._instructions.get(self._token.type)
+        if rule is None:
+            self._error()
+        return rule()
+
+    def _assignment(self):
+        token = self._advance()
+        position = self._position(token)
+        self._expect('TkAssign')
+        value = self._expression()
+        return Assignment(Variable(token.value, position=position), value,
+                          position=position)
+
+    def _block(self):
+        token = self._advance()
+        declarations = []
+        if self._is('TkUsing'):
+            self._advance()
+            declarations.append(self._declaration())
+            self._expect('TkSColon')
+            while not self._is('TkIn'):
+                declarations.append(self._declaration())
+                self._expect('TkSColon')
+            self._advance()
+        instructions = []
+        while not self._is('TkCBrace'):
+            instruction = yield None
+            instructions.append(instruction)
+            self._expect('TkSColon')
+        self._advance()
+        yield Block(declarations, instructions,
+                    position=self._position(token))
+
+    def _declaration(self):
+        if self._token is None or self._token.type not in types:
+            self._error()
+        token = self._advance()
+        position = self._position(token)
+        type_class = types[token.type]()
+        variable = self._expect('TkId')
+        variables = [Variable(variable.value,
+                              position=self._position(variable))]
+        while self._is('TkComma'):
+            self._advance()
+            variable = self._expect('TkId')
+            variables.append(Variable(variable.value,
+                                      position=self._position(variable)))
+        return VariableDeclaration(type_class, variables, position=position)
+
+    def _input(self):
+        token = self._advance()
+        variable = self._expect('TkId')
+        return Input(
+            Variable(variable.value, position=self._position(variable)),
+            position=self._position(token)
+            )
+
+    def _output(self):
+        token = self._advance()
+        printables = [self._printable()]
+        while self._is('TkComma'):
+            self._advance()
+            printables.append(self._printable())
+        if token.type == 'TkPrintLn':
+            return Output(printables, position=self._position(token),
+                          sufix="\n")
+        return Output(printables, position=self._position(token))
+
+    def _printable(self):
+        if self._is('TkString'):
+            token = self._advance()
+            return String(token.value, position=self._position(token))
+        return self._expression()
+
+    def _conditional(self):
+        token = self._advance()
+        self._expect('TkOPar')
+        condition = self._expression()
+        self._expect('TkCPar')
+        instruction = yield None
+        alt_instruction = None
+        if self._is('TkElse'):
+            self._advance()
+            alt_instruction = yield None
+        yield Conditional(condition, instruction, alt_instruction,
+                          position=self._position(token))
+
+    def _for(self):
+        token = self._advance()
+        variable = self._expect('TkId')
+        if self._is('TkMin'):
+            ordering = True
+        elif self._is('TkMax'):
+            ordering = False
+        else:
+            self._error()
+        self._advance()
+        set_exp = self._expression()
+        self._expect('TkDo')
+        instruction = yield None
+        yield ForLoop(
+            Variable(variable.value, position=self._position(variable)),
+            ordering, set_exp, instruction, position=self._position(token)
+            )
+
+    def _while(self):
+        token = self._advance()
+        self._expect('TkOPar')
+        condition = self._expression()
+        self._expect('TkCPar')
+        self._expect('TkDo')
+        instruction = yield None
+        yield RepeatWhileLoop(None, condition, instruction,
+                              position=self._position(token))
+
+    def _repeat(self):
+        token = self._advance()
+        prev_instruction = yield None
+        self._expect('TkWhile')
+        self._expect('TkOPar')
+        condition = self._expression()
+        self._expect('TkCPar')
+        instruction = None
+        if self._is('TkDo'):
+            self._advance()
+            instruction = yield None
+        yield RepeatWhileLoop(prev_instruction, condition, instruction,
+                              position=self._position(token))
+
+    ############################################################################
+    ############################### Expressions ################################
+    ############################################################################
+
+    def _expression(self):
+        """
+        Parses an expression by precedence climbing. The operators waiting for
+        their right operand, and the parentheses and set literals still open,
+        are kept in a stack, each one with the least precedence level of the
+        binary operators that its operand can take; the operands parsed so
+        far are kept in another one, with the position of their first token.
+        Binary nodes take the position of the first token of their left
+        operand, as PLY does when tracking positions.
+        """
+        binary = self._binary
+        unary = self._unary
+        pending = []
+        parsed = []
+        while True:
+            # An operand, maybe after prefix operators and openings.
+            token = self._token
+            if token is None:
+                self._error()
+            type = token.type
+            position = self._position(token)
+            operator = unary.get(type)
+            if operator is not None:
+                level, assoc, node_class = operator
+                self._advance()
+                if assoc != 'right':
+                    level += 1
+                pending.append((level, UNARY, node_class, position))
+                continue
+            if type not in operands:
+                self._error()
+            self._advance()
+            if type == 'TkOPar':
+                pending.append((0, PAREN, None, position))
+                continue
+            elif type == 'TkOBrace':
+                if not self._is('TkCBrace'):
+                    pending.append((0, SET, [], position))
+                    if self._is('TkComma'):
+                        # The first element can be omitted, as in the grammar.
+                        self._advance()
+                    continue
+                self._advance()
+                operand = Set([], position=position)
+            elif type == 'TkId':
+                operand = Variable(token.value, position=position)
+            elif type == 'TkNum':
+                operand = Number(token.value, position=position)
+            elif type == 'TkTrue':
+                operand = TrueValue(position=position)
+            else:
+                operand = FalseValue(position=position)
+            parsed.append((operand, position))
+            # What follows an operand: binary operators, which need another
+            # one, or the end of the expression, of parentheses or of sets.
+            while True:
+                operator = None
+                if self._token is not None:
+                    operator = binary.get(self._token.type)
+                while pending and pending[-1][1] in (UNARY, BINARY):
+                    min_level, kind, node_class, position = pending[-1]
+                    if operator is not None and operator[0] >= min_level:
+                        break
+                    pending.pop()
+                    right = parsed.pop()[0]
+                    if kind == UNARY:
+                        parsed.append((node_class(right, position=position),
+                                       position))
+                        continue
+                    left, position = parsed.pop()
+                    level, assoc, node_class = node_class
+                    parsed.append((node_class(left, right,
+                                              position=position),
+                                   position))
+                    if (assoc == 'nonassoc' and operator is not None and
+                        operator[0] == level):
+                        self._error()
+                if operator is not None:
+                    level, assoc, node_class = operator
+                    self._advance()
+                    min_level = level if assoc == 'right' else level + 1
+                    pending.append((min_level, BINARY, operator, None))
+                    break
+                if not pending:
+                    return parsed.pop()[0]
+                min_level, kind, elements, position = pending[-1]
+                if kind == PAREN:
+                    self._expect('TkCPar')
+                    pending.pop()
+                    # Parenthesized operands start at their parenthesis.
+                    parsed[-1] = (parsed[-1][0], position)
+                    continue
+                elements.append(parsed.pop()[0])
+                if self._is('TkComma'):
+                    self._advance()
+                    break
+                self._expect('TkCBrace')
+                pending.pop()
+                parsed.append((Set(elements, position=position), position))
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# program_cache.py
+#
+# Persistent cache of statically checked Setlan programs. The
+# checked AST and its symbol table are stored compressed in a
+# cache directory, keyed by a hash of the source code and of
+# the interpreter itself, so unchanged programs are executed
+# without being lexed, parsed nor checked again. The cache
+# size is bounded, evicting the least recently used entries.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+import os
+import sys
+import zlib
+import hashlib
+import types
+import cPickle
+import copy_reg
+
+from stat import S_IWGRP, S_IWOTH
+
+from config import SetlanConfig
+
+
+def _reduce_method(method):
+    # AST nodes keep the bound method implementing their operation (_op).
+    # They are pickled by name and looked up again on their node when loaded.
+    return (getattr, (method.im_self, method.im_func.__name__))
+
+copy_reg.pickle(types.MethodType, _reduce_method)
+
+
+class SetlanProgramCache(SetlanConfig):
+    """
+    Stores and retrieves checked programs. Entries are written atomically
+    (to a temporary file renamed to its final name), so any number of
+    processes can share the cache directory. Reading an entry refreshes its
+    modification time, which is used as the access time for eviction.
+
+    Entries are pickles, and unpickling runs code, so the cache directory is
+    created private to its user (PROGRAM_CACHE_MODE), and entries owned by
+    other users or writable by them are never loaded.
+    """
+
+    ENTRY_PREFIX = 'program-'
+    ENTRY_SUFFIX = '.stlc'
+
+    # Extension of the modules of the interpreter. The source of every one of
+    # them (the front end that builds the trees, as well as the modules whose
+    # classes end up pickled) is part of the key, so entries never outlive the
+    # code that wrote them, and modules added later are never left out.
+    INTERPRETER_MODULE_SUFFIX = '.py'
+
+    _interpreter_hash = None
+
+    def __init__(self, cache_dir=None, max_size=None, *args, **kwargs):
+        """
+        Params:
+            cache_dir :
+                type : string. Base cache directory, as for SetlanParserCache.
+                       Programs are stored in its PROGRAM_CACHE_SUBDIR
+                       subdirectory.
+            max_size  :
+                type : int. Maximum size of the cache in bytes. If not given,
+                       the environment variable SETLAN_PROGRAM_CACHE_SIZE is
+                       used, and then SetlanConfig.PROGRAM_CACHE_SIZE.
+        """
+        super(SetlanProgramCache, self).__init__()
+        if cache_dir is None:
+            cache_dir = os.environ.get(self.PARSER_CACHE_ENV,
+                                       self.PARSER_CACHE_DIR)
+        self._cache_dir = os.path.join(
+            os.path.abspath(os.path.expanduser(cache_dir)),
+            self.PROGRAM_CACHE_SUBDIR
+            )
+        if max_size is None:
+            max_size = self.str2int(os.environ.get(
+                self.PROGRAM_CACHE_SIZE_ENV, ''
+                ))
+            if max_size is None:
+                max_size = self.PROGRAM_CACHE_SIZE
+        self._max_size = max_size
+
+    def __unicode__(self):
+        return "SetlanProgramCache(%s)" % self._cache_dir
+
+    def getCacheDir(self):
+        return self._cache_dir
+
+    def interpreterHash(self):
+        """
+        Hash of the interpreter version, the python version (the pickle
+        format depends on it) and the source of every module of the lang
+        package.
+        """
+        cls = self.__class__
+        if cls._interpreter_hash is None:
+            digest = hashlib.sha1()
+            digest.update(self.VERSION)
+            digest.update(sys.version)
+            directory = os.path.dirname(os.path.abspath(__file__))
+            for name in self._interpreter_modules(directory):
+                try:
+                    with open(os.path.join(directory, name), 'rb') as module:
+                        digest.update(name)
+                        digest.update(module.read())
+                except IOError:
+                    digest.update(name)
+            cls._interpreter_hash = digest.hexdigest()
+        return cls._interpreter_hash
+
+    def _interpreter_modules(self, directory):
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+        return sorted([name for name in names
+                       if name.endswith(self.INTERPRETER_MODULE_SUFFIX)])
+
+    def programKey(self, inputString):
+        digest = hashlib.sha1(self.interpreterHash())
+        digest.update(inputString)
+        return digest.hexdigest()
+
+    def getEntryPath(self, inputString):
+        name = "%s%s%s" % (
+            self.ENTRY_PREFIX,
+            self.programKey(inputString),
+            self.ENTRY_SUFFIX
+            )
+        return os.path.join(self._cache_dir, name)
+
+    def load(self, inputString):
+        """
+        Returns the (ast, symtable) pair stored for the program, or None if
+        it is not cached. Unreadable entries are discarded.
+        """
+        entry_path = self.getEntryPath(inputString)
+        try:
+            with open(entry_path, 'rb') as entry:
+                # The opened file is checked, so it can not be replaced in
+                # between.
+                if not self._trusted(os.fstat(entry.fileno())):
+                    return None
+                data = entry.read()
+        except (IOError, OSError):
+            return None
+        try:
+            program = cPickle.loads(zlib.decompress(data))
+        except Exception:
+            self._remove(entry_path)
+            return None
+        try:
+            os.utime(entry_path, None)
+        except OSError:
+            pass
+        return program
+
+    def store(self, inputString, ast, symtable):
+        """
+        Stores a checked program. Failures (a read only cache, an AST too
+        deep to be pickled) are ignored: the cache is only an optimization.
+        """
+        try:
+            data = zlib.compress(
+                cPickle.dumps((ast, symtable), cPickle.HIGHEST_PROTOCOL),
+                1
+                )
+        except (RuntimeError, cPickle.PicklingError, TypeError):
+            return False
+        if len(data) > self._max_size:
+            return False
+        entry_path = self.getEntryPath(inputString)
+        # Only needed on a cache miss, and slow to import.
+        import tempfile
+        try:
+            if not os.path.isdir(self._cache_dir):
+                os.makedirs(self._cache_dir, self.PROGRAM_CACHE_MODE)
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=self.ENTRY_PREFIX,
+                suffix='.tmp',
+                dir=self._cache_dir
+                )
+        except (IOError, OSError):
+            return False
+        try:
+            with os.fdopen(fd, 'wb') as entry:
+                entry.write(data)
+            os.rename(tmp_path, entry_path)
+        except (IOError, OSError):
+            self._remove(tmp_path)
+            return False
+        self._evict()
+        return True
+
+    def _trusted(self, stat):
+        """
+        Whether an entry with the given stat can be loaded: it is owned by the
+        current user, and neither its group nor others can write it.
+        """
+        return (stat.st_uid == os.getuid() and
+                not stat.st_mode & (S_IWGRP | S_IWOTH))
+
+    def clear(self):
+        """
+        Removes every entry of the cache.
+        """
+        for entry_path, size, mtime in self._entries():
+            self._remove(entry_path)
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self._cache_dir)
+        except OSError:
+            return entries
+        for name in names:
+            if name.startswith(self.ENTRY_PREFIX) and name.endswith(
+                self.ENTRY_SUFFIX):
+                entry_path = os.path.join(self._cache_dir, name)
+                try:
+                    stat = os.stat(entry_path)
+                except OSError:
+                    # Removed by another process in the meantime.
+                    continue
+                entries.append((entry_path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until the cache fits in its
+        maximum size.
+        """
+        entries = self._entries()
+        total = sum([size for entry_path, size, mtime in entries])
+        if total <= self._max_size:
+            return
+        entries.sort(key=lambda entry: entry[2])
+        for entry_path, size, mtime in entries:
+            if total <= self._max_size:
+                break
+            self._remove(entry_path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
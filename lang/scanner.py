@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# scanner.py
+#
+# Table driven scanner for the language Setlan. An alternative
+# to the PLY lexer built from lexical_specs.py: the whole input
+# is matched in a single pass of one compiled pattern, and the
+# tokens are resolved through lookup tables instead of calling
+# a function per token rule.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+import re
+import sys
+
+from config import SetlanConfig
+
+from exceptions import (
+    SetlanInputNotDefinedException,
+    SetlanLexicalErrors,
+    SetlanLexicalError,
+    SetlanValueError
+    )
+
+from token_specs import reserved, SetlanToken
+
+################################################################################
+############################# Scanner tables ###################################
+################################################################################
+
+# Operators and punctuation. Alternatives are tried from the longest to the
+# shortest, which is also the order given to the rules in lexical_specs.py.
+operators = {
+    '{'   : 'TkOBrace',
+    '}'   : 'TkCBrace',
+    '('   : 'TkOPar',
+    ')'   : 'TkCPar',
+    ','   : 'TkComma',
+    ';'   : 'TkSColon',
+    '<+>' : 'TkSPlus',
+    '<->' : 'TkSMinus',
+    '<*>' : 'TkSTimes',
+    '</>' : 'TkSDiv',
+    '<%>' : 'TkSMod',
+    '++'  : 'TkUnion',
+    '+'   : 'TkPlus',
+    '-'   : 'TkMinus',
+    '*'   : 'TkTimes',
+    '/='  : 'TkNotEq',
+    '/'   : 'TkDiv',
+    '%'   : 'TkMod',
+    '\\'  : 'TkDiff',
+    '><'  : 'TkInter',
+    '>?'  : 'TkGetMax',
+    '<?'  : 'TkGetMin',
+    '$?'  : 'TkSize',
+    '=='  : 'TkEquals',
+    '>='  : 'TkGreatOrEq',
+    '<='  : 'TkLessOrEq',
+    '>'   : 'TkGreat',
+    '<'   : 'TkLess',
+    '='   : 'TkAssign',
+    '@'   : 'TkIsIn'
+}
+
+# Blanks are consumed in front of each token, instead of being matched as
+# tokens of their own. The end of the input is matched to consume the blanks
+# at the end.
+master_pattern = re.compile(r'[ \t]*(?:%s)' % '|'.join([
+    r'(?P<id>[a-zA-Z][a-zA-Z0-9_]*)',
+    r'(?P<op>%s)' % '|'.join([
+        re.escape(op) for op in sorted(operators, key=len, reverse=True)
+        ]),
+    r'(?P<num>[0-9]+)',
+    r'(?P<newline>\n+)',
+    r'(?P<string>"(?:[^"\\\n\r]|\\.)*")',
+    r'(?P<comment>\#.*)',
+    r'(?P<end>\Z)',
+    r'(?P<error>.)'
+    ]))
+
+################################################################################
+########################## End of Scanner tables ###############################
+################################################################################
+
+
+class SetlanScanner(SetlanConfig):
+    """
+    Scanner with the same interface as SetlanLexer. It produces the same
+    stream of tokens as the PLY lexer, but as SetlanToken records.
+    """
+
+    def __init__(self, inputString=None, *args, **kwargs):
+        super(SetlanScanner, self).__init__()
+        self._input = None
+        self._start = 0
+        self._end = None
+        self._stream = None
+        self.lineno = 1
+        self.lexpos = 0
+        if inputString is not None:
+            self.input(inputString)
+
+    def __unicode__(self):
+        return "SetlanScanner"
+
+    def __iter__(self):
+        return self.tokens()
+
+    def input(self, inputString, start=0, end=None):
+        """
+        Sets the input to be scanned. If start or end are given, only that
+        region of inputString is scanned, numbering its lines and columns as
+        they are in the whole input.
+        """
+        self._input = inputString
+        self._start = start
+        self._end = end
+        self._stream = self._scan(inputString, start, end)
+
+    def token(self):
+        """
+        Returns the next token, or None at the end of the input.
+        """
+        if self._input is None:
+            raise SetlanInputNotDefinedException("No input was provided.")
+        return next(self._stream, None)
+
+    def tokens(self):
+        """
+        Generator of the tokens of the whole input, independent from token().
+        """
+        if self._input is None:
+            raise SetlanInputNotDefinedException("No input was provided.")
+        return self._scan(self._input, self._start, self._end)
+
+    def getTokenList(self):
+        return list(self.tokens())
+
+    def _scan(self, data, start=0, end=None):
+        get_reserved = reserved.get
+        get_operator = operators.__getitem__
+        new_token = tuple.__new__
+        errors = []
+        if end is None:
+            end = len(data)
+        # Mapped inputs have no count(), but are only scanned from the start.
+        lineno = data.count('\n', 0, start) + 1 if start else 1
+        line_start = data.rfind('\n', 0, start) + 1
+        for match in master_pattern.finditer(data, start, end):
+            kind = match.lastgroup
+            if kind == 'id':
+                value = intern(match.group(kind))
+                token = new_token(SetlanToken, (get_reserved(value, 'TkId'),
+                    value, lineno, match.start(kind) - line_start + 1))
+            elif kind == 'op':
+                value = match.group(kind)
+                token = new_token(SetlanToken, (get_operator(value),
+                    value, lineno, match.start(kind) - line_start + 1))
+            elif kind == 'num':
+                colno = match.start(kind) - line_start + 1
+                value = match.group(kind)
+                try:
+                    value = int(value)
+                except ValueError:
+                    message = "In line %d, column %d: Number %s is too large! MaxInt value assigned instead." % (lineno, colno, value)
+                    errors.append(SetlanValueError(message))
+                    value = sys.maxint
+                token = new_token(SetlanToken, ('TkNum', value, lineno, colno))
+            elif kind == 'newline':
+                line_start = match.end()
+                lineno += line_start - match.start(kind)
+                continue
+            elif kind == 'string':
+                token = new_token(SetlanToken, ('TkString', match.group(kind),
+                    lineno, match.start(kind) - line_start + 1))
+            elif kind == 'error':
+                position = (lineno, match.start(kind) - line_start + 1)
+                message = "In line %d, column %d: Unexpected character '%s'." % (position + (match.group(kind),))
+                errors.append(SetlanLexicalError(message, position=position))
+                continue
+            else:
+                continue
+            self.lineno = lineno
+            yield token
+        self.lineno = lineno
+        self.lexpos = end
+        if errors:
+            raise SetlanLexicalErrors(errors)
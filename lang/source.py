@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# source.py
+#
+# Source code of Setlan programs, loaded from their files. It
+# is either read into a string or memory mapped, so very large
+# (machine generated) programs are lexed straight from the
+# mapped file, without copying it into memory.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+import mmap
+
+from config import SetlanConfig
+
+
+class SetlanSource(SetlanConfig):
+    """
+    Source code of a program. getText() returns it as a string or, when
+    mapped, as a read only mmap object, which both lexer backends scan as a
+    string: regular expressions, slicing, find() and rfind() work on it
+    without copying the file.
+    """
+
+    def __init__(self, filename, mapped=False, *args, **kwargs):
+        """
+        Reads (or maps, if mapped) the given file. IOErrors are propagated.
+        """
+        super(SetlanSource, self).__init__()
+        self._filename = filename
+        self._text = None
+        self._mapped = False
+        with open(filename, 'rb' if mapped else 'r') as source_file:
+            if mapped:
+                try:
+                    self._text = mmap.mmap(source_file.fileno(), 0,
+                                           access=mmap.ACCESS_READ)
+                    self._mapped = True
+                except ValueError:
+                    # Empty files can not be mapped.
+                    self._text = source_file.read()
+            else:
+                self._text = source_file.read()
+
+    def __unicode__(self):
+        return "SetlanSource(%s)" % self._filename
+
+    def __len__(self):
+        return len(self._text)
+
+    def getFilename(self):
+        return self._filename
+
+    def getText(self):
+        return self._text
+
+    def isMapped(self):
+        return self._mapped
+
+    def getLine(self, lineno):
+        """
+        Text of the given line (numbered from 1), without its line break, or
+        None if there is no such line.
+        """
+        return self.getLines([lineno]).get(lineno)
+
+    def getLines(self, linenos):
+        """
+        Dictionary with the text of each of the given lines that exists,
+        without their line breaks. The text is scanned once, up to the last
+        line asked for, and only those lines are copied, so it is cheap on
+        mapped files too. Used to show the offending lines of errors.
+        """
+        text = self._text
+        lines = {}
+        start = 0
+        current = 1
+        for lineno in sorted(set(linenos)):
+            while current < lineno:
+                start = text.find('\n', start) + 1
+                if start == 0:
+                    return lines
+                current += 1
+            end = text.find('\n', start)
+            if end < 0:
+                end = len(text)
+            lines[lineno] = text[start:end].rstrip('\r')
+        return lines
+
+    def close(self):
+        """
+        Releases the text, unmapping the file if it was mapped.
+        """
+        if self._mapped:
+            self._text.close()
+            self._mapped = False
+        self._text = None
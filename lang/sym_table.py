@@ -10,9 +10,9 @@
 # ------------------------------------------------------------
 from config import SetlanConfig
 
-from exceptions import (SetlanScopeError, SetlanStaticErrors)
+from exceptions import SetlanScopeError
 
-from type import Type
+from type import UNDEFINED
 
 class VariableInfo(object):
     """Container for the information stored for each variable in a SymTable."""
@@ -85,6 +85,12 @@ class SymTable(SetlanConfig):
         self._children = []
         if father is not None: father._birth(self)
         self._father = father
+        # While the body of a for loop is checked, its scope keeps the name of
+        # its counter and the modifications of it found, and every scope keeps
+        # its loopStates().
+        self._loop_counter = None
+        self._loop_errors = None
+        self._loop_states = None
 
     def __repr__(self):
         return self.__str__()
@@ -131,6 +137,75 @@ class SymTable(SetlanConfig):
         string += "\n%sEnd of Scope" % self._get_indentation(level)
         return string
         
+    def _report(self, error, diagnostics):
+        """
+        Adds a scope error to the diagnostics context of the static checks
+        being run. Without one (while executing a program, which was already
+        checked) there is nothing to report.
+        """
+        if diagnostics is not None:
+            diagnostics.add_error(error)
+
+    def openLoop(self, counter):
+        """
+        Makes this the scope of a for loop whose counter, named counter, must
+        not be modified in the body being checked.
+        """
+        self._loop_counter = counter
+        self._loop_errors = []
+        self._loop_states = None
+
+    def closeLoop(self):
+        """
+        Ends the checks of the body of the for loop of this scope, returning
+        the errors found for it.
+        """
+        errors = self._loop_errors
+        self._loop_counter = None
+        self._loop_errors = None
+        self._loop_states = None
+        return errors
+
+    def takeLoopErrors(self):
+        """
+        Returns the errors found so far for the for loop of this scope.
+        """
+        errors = self._loop_errors
+        self._loop_errors = []
+        return errors
+
+    def addLoopErrors(self, errors):
+        self._loop_errors.extend(errors)
+
+    def loopStates(self):
+        """
+        (scope, read only) pairs of the for loops being checked around this
+        scope, innermost first: the scope of each loop, and whether the name
+        of its counter refers to a read only variable here (it does not when
+        a block in between declares a variable with that name). They are
+        computed once per scope, from the ones of its father, so checking a
+        modification takes a time proportional to the number of loops.
+        """
+        if self._loop_states is None:
+            states = []
+            if self._loop_counter is not None:
+                states.append((self, True))
+            if self._father is not None:
+                get = self._scope.get
+                for loop, read_only in self._father.loopStates():
+                    info = get(loop._loop_counter)
+                    if info is not None:
+                        read_only = info.isReadOnly()
+                    states.append((loop, read_only))
+            self._loop_states = states
+        return self._loop_states
+
+    def releaseLoopStates(self):
+        """
+        Forgets the loopStates() of this scope, once its checks are done.
+        """
+        self._loop_states = None
+
     def _birth(self, child):
         """
         Creates the reference from the father to its children
@@ -144,8 +219,7 @@ class SymTable(SetlanConfig):
         if name in self._scope:
             error  = "In line %d, column %d, " % position
             error += "variable '%s' was already defined." % name
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanScopeError(error))
+            self._report(SetlanScopeError(error), kwargs.get('diagnostics'))
         value = None
         if kwargs.get('read_only', False):
             value = VariableInfo(type_class, read_only=True)
@@ -154,65 +228,68 @@ class SymTable(SetlanConfig):
         value.setValue(kwargs.get('value', type_class.getDefault()))
         self._scope[name] = value
 
-    def delete(self, name, position):
+    def delete(self, name, position, diagnostics=None):
         """
         Deletes a symbol from this SymTable (WHY IS THIS NECESSARY???)
         """
         if name in self._scope:
             del self._scope[name]
         elif self._father is not None:
-            self._father.delete(name, position)
+            self._father.delete(name, position, diagnostics)
         else:
             error  = "In line %d, column %d, " % position
             error += "trying to delete variable '%s' from the current " % name
             error += "scope, but it has not been defined."
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanScopeError(error))
+            self._report(SetlanScopeError(error), diagnostics)
 
-    def update(self, name, value, position):
+    def update(self, name, value, position, diagnostics=None, checked=True):
         """
-        Updates the value of a symbol in this SymTable
+        Updates the value of a symbol in this SymTable, checking that it fits
+        in 32 bits unless checked is False.
         """
-        if name in self._scope:
-            previous = self._scope[name]
-            previous.setValue(self.checkOverflow(value, position))
-            self._scope[name] = previous
-        elif self._father is not None:
-            self._father.update(name, value, position)
-        else:
-            error  = "In line %d, column %d, " % position
-            error += "trying to update variable '%s' from the current " % name
-            error += "scope, but it has not been defined."
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanScopeError(error))
+        table = self
+        while table is not None:
+            info = table._scope.get(name)
+            if info is not None:
+                if checked:
+                    value = self.checkOverflow(value, position)
+                info.setValue(value)
+                return
+            table = table._father
+        error  = "In line %d, column %d, " % position
+        error += "trying to update variable '%s' from the current " % name
+        error += "scope, but it has not been defined."
+        self._report(SetlanScopeError(error), diagnostics)
 
     def contains(self, name):
         """
         Checks if a given name is in this SymTable.
         """
-        if name in self._scope:
-            return True
-        elif self._father is not None:
-            return self._father.contains(name)
-        else:
-            return False
-
-    def lookup(self, name, position):
+        table = self
+        while table is not None:
+            if name in table._scope:
+                return True
+            table = table._father
+        return False
+
+    def lookup(self, name, position, diagnostics=None):
         """
         Retrieves the type and value associated with a given name if it is in
         this SymTable, otherwise, raise a SetlanScopeError exception. 
+        Enclosing scopes are walked iteratively, with a single dictionary probe
+        per scope.
         """
-        if name in self._scope:
-            return self._scope[name]
-        elif self._father is not None:
-            return self._father.lookup(name, position)
-        else:
-            error  = "In line %d, column %d, " % position
-            error += "trying to use variable '%s', " % name
-            error += "but it has not been defined in current scope."
-            errors_acc = SetlanStaticErrors.Instance()
-            errors_acc.add_error(SetlanScopeError(error))
-            return VariableInfo(Type(position=position))
+        table = self
+        while table is not None:
+            info = table._scope.get(name)
+            if info is not None:
+                return info
+            table = table._father
+        error  = "In line %d, column %d, " % position
+        error += "trying to use variable '%s', " % name
+        error += "but it has not been defined in current scope."
+        self._report(SetlanScopeError(error), diagnostics)
+        return VariableInfo(UNDEFINED)
 
 
 
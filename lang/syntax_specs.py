@@ -11,7 +11,7 @@
 # ------------------------------------------------------------
 from exceptions import SetlanSyntaxError
 
-from lexical_specs import tokens
+from token_specs import tokens
 
 from type import *
 
@@ -48,6 +48,35 @@ precedence = (
 ################### End of Precedence and associative rules ####################
 ################################################################################
 
+################################################################################
+############################### Position helpers ###############################
+################################################################################
+
+# The parser is run without tracking=True, so PLY only knows the positions of
+# terminals. Rules that need the position where a nonterminal starts get it
+# from the node it produced, unless the position was copied to it explicitly
+# with mark_position (which is needed when the nonterminal starts with a token
+# that is not part of its node, like parentheses).
+
+def start_position(p, n):
+    """
+    Position (line, column) where the symbol p[n] starts.
+    """
+    symbol = p.slice[n]
+    if hasattr(symbol, 'lexpos'):
+        return (symbol.lineno, symbol.lexpos)
+    return p[n]._position
+
+def mark_position(p, n):
+    """
+    Makes the symbol being reduced start where the symbol p[n] starts.
+    """
+    p.slice[0].lineno, p.slice[0].lexpos = start_position(p, n)
+
+################################################################################
+############################ End of Position helpers ###########################
+################################################################################
+
 ################################################################################
 ################################ Grammar rules #################################
 ################################################################################
@@ -96,11 +125,14 @@ def p_VariableDeclarations_lambda(p):
     '''
     p[0] = p[1]
 
+# List productions append to the list built by the production they extend,
+# which no other symbol refers to, so lists are built in linear time.
 def p_VariableDeclarationList_list(p):
     '''
     VariableDeclarationList : VariableDeclarationList VariableDeclaration TkSColon
     '''
-    p[0] = p[1] + [p[2]]
+    p[1].append(p[2])
+    p[0] = p[1]
 
 def p_VariableDeclarationList(p):
     '''
@@ -113,35 +145,39 @@ def p_VariableDeclaration(p):
     '''
     VariableDeclaration : Type VariableList
     '''
-    p[0] = VariableDeclaration(p[1], p[2], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = VariableDeclaration(p[1], p[2], position=start_position(p, 1))
 
 
 def p_Type_int(p):
     '''
     Type : TkInt
     '''
-    p[0] = IntegerType(position=(p.lineno(1), p.lexpos(1)))
+    p[0] = IntegerType()
+    mark_position(p, 1)
 
 
 def p_Type_bool(p):
     '''
     Type : TkBool
     '''
-    p[0] = BooleanType(position=(p.lineno(1), p.lexpos(1)))
+    p[0] = BooleanType()
+    mark_position(p, 1)
 
 
 def p_Type_set(p):
     '''
     Type : TkSet
     '''
-    p[0] = SetType(position=(p.lineno(1), p.lexpos(1)))
+    p[0] = SetType()
+    mark_position(p, 1)
 
 
 def p_VariableList_list(p):
     '''
     VariableList : VariableList TkComma TkId
     '''
-    p[0] = p[1] + [Variable(p[3], position=(p.lineno(3), p.lexpos(3)))]
+    p[1].append(Variable(p[3], position=(p.lineno(3), p.lexpos(3))))
+    p[0] = p[1]
 
 
 def p_VariableList(p):
@@ -154,7 +190,8 @@ def p_InstructionList_list(p):
     '''
     InstructionsList : InstructionsList Instruction TkSColon
     '''
-    p[0] = p[1] + [p[2]]
+    p[1].append(p[2])
+    p[0] = p[1]
 
 def p_InstructionList(p):
     '''
@@ -191,7 +228,8 @@ def p_PrintableList_list(p):
     '''
     PrintableList : PrintableList TkComma Printable
     '''
-    p[0] = p[1] + [p[3]]
+    p[1].append(p[3])
+    p[0] = p[1]
 
 def p_PrintableList(p):
     '''
@@ -282,6 +320,7 @@ def p_Expression_parenthesized(p):
     '''
     Expression : TkOPar Expression TkCPar
     '''
+    mark_position(p, 1)
     p[0] = p[2]
 
 
@@ -295,133 +334,133 @@ def p_BinaryExpression_Sum(p):
     '''
     BinaryExpression : Expression TkPlus Expression
     '''
-    p[0] = Sum(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = Sum(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Subtraction(p):
     '''
     BinaryExpression : Expression TkMinus Expression
     '''
-    p[0] = Subtraction(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = Subtraction(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Times(p):
     '''
     BinaryExpression : Expression TkTimes Expression
     '''
-    p[0] = Times(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = Times(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Division(p):
     '''
     BinaryExpression : Expression TkDiv Expression
     '''
-    p[0] = Division(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = Division(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Modulus(p):
     '''
     BinaryExpression : Expression TkMod Expression
     '''
-    p[0] = Modulus(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = Modulus(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Union(p):
     '''
     BinaryExpression : Expression TkUnion Expression
     '''
-    p[0] = Union(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = Union(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Difference(p):
     '''
     BinaryExpression : Expression TkDiff Expression
     '''
-    p[0] = Difference(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = Difference(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Intersection(p):
     '''
     BinaryExpression : Expression TkInter Expression
     '''
-    p[0] = Intersection(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = Intersection(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_SSum(p):
     '''
     BinaryExpression : Expression TkSPlus Expression
     '''
-    p[0] = SetSum(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = SetSum(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_SSubtraction(p):
     '''
     BinaryExpression : Expression TkSMinus Expression
     '''
-    p[0] = SetSubtraction(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = SetSubtraction(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_STimes(p):
     '''
     BinaryExpression : Expression TkSTimes Expression
     '''
-    p[0] = SetTimes(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = SetTimes(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_SDivision(p):
     '''
     BinaryExpression : Expression TkSDiv Expression
     '''
-    p[0] = SetDivision(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = SetDivision(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_SModulus(p):
     '''
     BinaryExpression : Expression TkSMod Expression
     '''
-    p[0] = SetModulus(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = SetModulus(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Boolean_GreaterThan(p):
     '''
     BinaryExpression : Expression TkGreat Expression
     '''
-    p[0] = GreaterThan(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = GreaterThan(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Boolean_GreaterOrEqual(p):
     '''
     BinaryExpression : Expression TkGreatOrEq Expression
     '''
-    p[0] = GreaterOrEqual(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = GreaterOrEqual(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Boolean_LessThan(p):
     '''
     BinaryExpression : Expression TkLess Expression
     '''
-    p[0] = LessThan(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = LessThan(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Boolean_LessOrEqual(p):
     '''
     BinaryExpression : Expression TkLessOrEq Expression
     '''
-    p[0] = LessOrEqual(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = LessOrEqual(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Boolean_Equals(p):
     '''
     BinaryExpression : Expression TkEquals Expression
     '''
-    p[0] = Equals(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = Equals(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Boolean_NotEquals(p):
     '''
     BinaryExpression : Expression TkNotEq Expression
     '''
-    p[0] = NotEquals(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = NotEquals(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Boolean_And(p):
     '''
     BinaryExpression : Expression TkAnd Expression
     '''
-    p[0] = And(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = And(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Boolean_Or(p):
     '''
     BinaryExpression : Expression TkOr Expression
     '''
-    p[0] = Or(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = Or(p[1], p[3], position=start_position(p, 1))
 
 def p_BinaryExpression_Boolean_IsIn(p):
     '''
     BinaryExpression : Expression TkIsIn Expression
     '''
-    p[0] = IsIn(p[1], p[3], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = IsIn(p[1], p[3], position=start_position(p, 1))
 
 def p_UnaryExpression_UMinus(p):
     '''
@@ -475,19 +514,21 @@ def p_Literal_Set(p):
     '''
     Literal : Set
     '''
-    p[0] = Set(p[1], position=(p.lineno(1), p.lexpos(1)))
+    p[0] = Set(p[1], position=start_position(p, 1))
 
 def p_Set(p):
     '''
     Set : TkOBrace ExpressionList TkCBrace
     '''
+    mark_position(p, 1)
     p[0] = p[2]
 
 def p_ExpressionList_list(p):
     '''
     ExpressionList : ExpressionList TkComma Expression
     '''
-    p[0] = p[1] + [p[3]]
+    p[1].append(p[3])
+    p[0] = p[1]
 
 def p_ExpressionList_single(p):
     '''
@@ -514,8 +555,10 @@ def p_lambda(p):
 # Error handling
 def p_error(p):
     error = ""
+    position = None
     if p is None:
         error = "Unexpected End Of File (EOF)."
     else:
-        error = "Unexpected %s." % p
-    raise SetlanSyntaxError(error)
\ No newline at end of file
+        error = "Unexpected %s." % (p,)
+        position = (p.lineno, p.colno)
+    raise SetlanSyntaxError(error, position=position)
\ No newline at end of file
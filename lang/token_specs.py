@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# token_specs.py
+#
+# Setlan language token names, reserved words and the compact
+# token record, shared by the lexer and scanner backends and
+# by the parsers. It has no dependencies, so importing it
+# does not load PLY.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+from operator import itemgetter
+
+reserved = {
+    'program' : 'TkProgram',
+    'int'     : 'TkInt',
+    'bool'    : 'TkBool',
+    'set'     : 'TkSet',
+    'using'   : 'TkUsing',
+    'in'      : 'TkIn',
+    'scan'    : 'TkScan',
+    'print'   : 'TkPrint',
+    'println' : 'TkPrintLn',
+    'if'      : 'TkIf',
+    'else'    : 'TkElse',
+    'for'     : 'TkFor',
+    'do'      : 'TkDo',
+    'min'     : 'TkMin',
+    'max'     : 'TkMax',
+    'repeat'  : 'TkRepeat',
+    'while'   : 'TkWhile',
+    'or'      : 'TkOr',
+    'and'     : 'TkAnd',
+    'not'     : 'TkNot',
+    'true'    : 'TkTrue',
+    'false'   : 'TkFalse'
+}
+
+tokens = [
+    'TkId',            # Variable Identifier
+    'TkNum',           # Integer inmediate numbers
+    'TkString',        # Strings: "This is a string"
+    'TkOBrace',        # {
+    'TkCBrace',        # }
+    'TkComma',         # ,
+    'TkAssign',        # =
+    'TkSColon',        # ;
+    'TkOPar',          # (
+    'TkCPar',          # )
+    'TkPlus',          # +
+    'TkMinus',         # - and unary minus (as in -42)
+    'TkTimes',         # *
+    'TkDiv',           # /
+    'TkMod',           # %
+    'TkUnion',         # ++
+    'TkDiff',          # \
+    'TkInter',         # ><
+    'TkSPlus',         # <+>
+    'TkSMinus',        # <->
+    'TkSTimes',        # <*>
+    'TkSDiv',          # </>
+    'TkSMod',          # <%>
+    'TkGetMin',        # <?
+    'TkGetMax',        # >?
+    'TkSize',          # $?
+    'TkGreat',         # >
+    'TkGreatOrEq',     # >=
+    'TkLess',          # <
+    'TkLessOrEq',      # <=
+    'TkEquals',        # ==
+    'TkNotEq',         # /=
+    'TkIsIn'           # @
+] + list(reserved.values())
+
+
+class SetlanToken(tuple):
+    """
+    Compact token record, produced by both lexer backends: a (type, value,
+    lineno, colno) tuple with named accessors and no instance dictionary. As
+    ply.yacc takes the positions of the tokens from lexpos, it holds their
+    column. Identifiers are interned, so every token and AST node with the
+    same name shares a single string.
+    """
+    __slots__ = ()
+
+    # ply.yacc attaches the lexer to tokens on syntax errors, unless they
+    # already have one.
+    lexer = None
+
+    def __new__(cls, type, value, lineno, colno):
+        return tuple.__new__(cls, (type, value, lineno, colno))
+
+    type   = property(itemgetter(0))
+    value  = property(itemgetter(1))
+    lineno = property(itemgetter(2))
+    lexpos = property(itemgetter(3))
+    colno  = property(itemgetter(3))
+
+    def __str__(self):
+        # Only needed to print the token list, and it loads PLY's lexer.
+        from lib.LexerWrapper import Token
+        return str(Token(self))
+
+    def __repr__(self):
+        return self.__str__()
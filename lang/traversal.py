@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# ------------------------------------------------------------
+# traversal.py
+#
+# Traversal engine of Setlan ASTs. The static checks of
+# instructions run on run(), with an explicit stack of the nodes
+# being visited, and expressions are checked over their nodes in
+# postorder, so programs of any depth (long chains of operators,
+# deeply nested blocks) use a bounded amount of Python stack.
+# Programs are executed from a stack of tasks instead (see
+# Setlan.execute), which needs no generator per instruction run.
+#
+# Author:
+# Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
+# ------------------------------------------------------------
+import sys
+
+from types import GeneratorType
+
+
+def run(node, method, state, *args):
+    """
+    Calls node.method(state, *args) and returns its result.
+
+    Methods of nodes with children can be generators: to visit a child, they
+    yield a (child, state) pair, and the result of child.method(state, *args)
+    is sent back to them. The first value they yield that is not a pair is
+    their own result, and they are not resumed after it (the result of a
+    generator that just ends is None). Errors raised while visiting a child
+    are raised where the child was yielded.
+    """
+    result = getattr(node, method)(state, *args)
+    if result.__class__ is not GeneratorType:
+        return result
+    stack = []
+    task = result
+    value = None
+    error = None
+    while True:
+        try:
+            if error is None:
+                request = task.send(value)
+            else:
+                request = task.throw(*error)
+                error = None
+        except StopIteration:
+            request = None
+        except Exception:
+            if not stack:
+                raise
+            error = sys.exc_info()
+            task = stack.pop()
+            continue
+        if request.__class__ is tuple:
+            child, child_state = request
+            try:
+                value = getattr(child, method)(child_state, *args)
+            except Exception:
+                error = sys.exc_info()
+                continue
+            if value.__class__ is GeneratorType:
+                stack.append(task)
+                task = value
+                value = None
+            continue
+        if not stack:
+            return request
+        task = stack.pop()
+        value = request
+
@@ -2,7 +2,10 @@
 # ------------------------------------------------------------
 # type.py
 #
-# Setlan type representation classes
+# Setlan type representation classes. Types are flyweights:
+# they have no state but their class, so there is a single
+# canonical instance of each one, shared by every node and
+# variable of that type.
 #
 # Author:
 # Victor De Ponte, 05-38087, <rdbvictor19@gmail.com>
@@ -10,11 +13,29 @@
 from config import SetlanConfig
 
 class Type(SetlanConfig):
+    """
+    Constructing a type returns the canonical instance of its class. Types do
+    not keep the position where they were written (the nodes do), so the
+    position argument is accepted but ignored.
+    """
+
+    _instances = {}
+
+    _default = None
+
+    def __new__(cls, *args, **kwargs):
+        instance = Type._instances.get(cls)
+        if instance is None:
+            instance = super(Type, cls).__new__(cls)
+            Type._instances[cls] = instance
+        return instance
 
     def __init__(self, *args, **kwargs):
-        super(Type, self).__init__(args, kwargs)
-        self._position = kwargs.get('position', None)
-        self._default = None
+        pass
+
+    def __reduce__(self):
+        # Copies and unpickled trees share the canonical instances too.
+        return (self.__class__, ())
 
     def __eq__(self, other):
         """Override the default Equals behavior"""
@@ -32,11 +53,7 @@ class Type(SetlanConfig):
         """
         Override the default hash behavior (that returns the id or the object)
         """
-        dictionary = {
-            "class" : self.__class__,
-            "default" : self._default
-        }
-        return hash(tuple(sorted(dictionary.items())))
+        return hash(self.__class__)
 
     def __unicode__(self):
         return "undefined"
@@ -44,9 +61,6 @@ class Type(SetlanConfig):
     def __str__(self):
         return self.__unicode__()
 
-    def getPosition(self):
-        return self._position
-
     def getDefault(self):
         return self._default
 
@@ -75,10 +89,7 @@ class Type(SetlanConfig):
 
 class IntegerType(Type):
 
-    def __init__(self, *args, **kwargs):
-        super(IntegerType, self).__init__(args, kwargs)
-        self._position = kwargs.get('position', None)
-        self._default = 0
+    _default = 0
 
     def __unicode__(self):
         return "Integer"
@@ -89,10 +100,7 @@ class IntegerType(Type):
 
 class BooleanType(Type):
 
-    def __init__(self, *args, **kwargs):
-        super(BooleanType, self).__init__(args, kwargs)
-        self._position = kwargs.get('position', None)
-        self._default = False
+    _default = False
 
     def __unicode__(self):
         return "Boolean"
@@ -103,13 +111,18 @@ class BooleanType(Type):
 
 class SetType(Type):
 
-    def __init__(self, *args, **kwargs):
-        super(SetType, self).__init__(args, kwargs)
-        self._position = kwargs.get('position', None)
-        self._default = set([])
+    def getDefault(self):
+        # A new empty set each time, as the instance is shared.
+        return set([])
 
     def __unicode__(self):
         return "Set"
 
     def isSet(self):
-        return True
\ No newline at end of file
+        return True
+
+# Canonical instances, for the code that does not need to construct them.
+UNDEFINED = Type()
+INTEGER = IntegerType()
+BOOLEAN = BooleanType()
+SET = SetType()